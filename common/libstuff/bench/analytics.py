@@ -0,0 +1,233 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+import pandas
+from pydantic import BaseModel
+
+from libstuff.bench.artifacts import ArtifactRef, ArtifactStore
+from libstuff.bench.plots import (
+    Histogram,
+    HistogramParams,
+    LatencyPrecision,
+    OpSummary,
+    Plots,
+    Timeline,
+    TimelineParams,
+    compact_samples,
+)
+from libstuff.bench.warp import parse_benchdata
+
+T = TypeVar("T")
+
+
+class AnalyticsError(Exception):
+    pass
+
+
+class AnalyzedSamples(BaseModel):
+    ref: ArtifactRef
+    summary: Dict[str, OpSummary]
+
+
+#
+# Worker side. Each worker process keeps its own artifact store handle and
+# recently used runs' plots, up to its share of the pool's cache bytes, so
+# repeated requests for a run don't rebuild its per-op index. Samples never
+# cross process boundaries: they are written to, and memory-mapped from,
+# the artifact store.
+#
+
+_store: Optional[ArtifactStore] = None
+_latency: LatencyPrecision = LatencyPrecision.FLOAT32
+_cache_bytes: int = 0
+# plots, and their size when last used, by digest.
+_plots: "OrderedDict[str, Tuple[Plots, int]]" = OrderedDict()
+_plots_bytes: int = 0
+
+
+def _init_worker(
+    root: Path, latency: LatencyPrecision, cache_bytes: int
+) -> None:
+    global _store, _latency, _cache_bytes
+    _store = ArtifactStore(root)
+    _latency = latency
+    _cache_bytes = cache_bytes
+
+
+def _worker_store() -> ArtifactStore:
+    assert _store is not None
+    return _store
+
+
+def _cache_plots(digest: str, plots: Plots) -> None:
+    """
+    Keep `plots`, once used, measuring them anew as they grow with use; drop
+    least recently used plots, even these, until within the cache bytes.
+    """
+    global _plots_bytes
+    if digest in _plots:
+        _plots_bytes -= _plots.pop(digest)[1]
+    size = plots.size
+    _plots[digest] = (plots, size)
+    _plots_bytes += size
+    while _plots_bytes > _cache_bytes and len(_plots) > 0:
+        _plots_bytes -= _plots.popitem(last=False)[1][1]
+
+
+def _with_plots(digest: str, fn: Callable[[Plots], T]) -> T:
+    cached = _plots.get(digest)
+    plots = Plots(_worker_store().get(digest)) if cached is None else cached[0]
+    res = fn(plots)
+    _cache_plots(digest, plots)
+    return res
+
+
+def _store_samples(data: pandas.DataFrame) -> AnalyzedSamples:
+    plots = Plots(compact_samples(data, _latency))
+    ref = _worker_store().put(plots.data)
+    summary = plots.get_summary()
+    _cache_plots(ref.digest, plots)
+    return AnalyzedSamples(ref=ref, summary=summary)
+
+
+def _ingest(path: Path) -> AnalyzedSamples:
+    return _store_samples(parse_benchdata(path))
+
+
+def _import_json(json_data: str) -> AnalyzedSamples:
+    return _store_samples(pandas.read_json(json_data))
+
+
+def _histograms(digest: str, params: HistogramParams) -> Dict[str, Histogram]:
+    return _with_plots(
+        digest, lambda plots: plots.get_latency_histogram_per_op(params)
+    )
+
+
+def _summary(digest: str) -> Dict[str, OpSummary]:
+    return _with_plots(digest, lambda plots: plots.get_summary())
+
+
+def _timeline(digest: str, params: TimelineParams) -> Dict[str, Timeline]:
+    return _with_plots(digest, lambda plots: plots.get_timeline(params))
+
+
+class AnalyticsPool:
+    """
+    Pool of worker processes for CPU-bound benchmark analytics: ingesting
+    benchdata, importing legacy results, and computing summaries,
+    histograms and timelines. Keeps that work off the event loop, and lets
+    runs be analysed in parallel, one per worker.
+
+    Tasks only exchange artifact references and compact results with the
+    workers; samples are shared through the artifact store, compacted as
+    they are stored, with latencies in `latency` precision. Workers keep
+    recently used runs' samples in memory, together up to `cache_bytes`,
+    each up to its share of those.
+    """
+
+    _artifacts: ArtifactStore
+    _workers: int
+    _latency: LatencyPrecision
+    _cache_bytes: int
+    _executor: Optional[ProcessPoolExecutor]
+    logger: logging.Logger
+
+    def __init__(
+        self,
+        artifacts: ArtifactStore,
+        workers: Optional[int] = None,
+        latency: LatencyPrecision = LatencyPrecision.FLOAT32,
+        cache_bytes: int = 768 * 1024**2,
+        logger: logging.Logger = logging.getLogger(),
+    ) -> None:
+        self._artifacts = artifacts
+        self._workers = workers if workers is not None else os.cpu_count() or 1
+        self._latency = latency
+        self._cache_bytes = cache_bytes
+        self._executor = None
+        self.logger = logger
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn, rather than fork a process running threads and an event
+        # loop.
+        return ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                self._artifacts.root,
+                self._latency,
+                self._cache_bytes // self._workers,
+            ),
+        )
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = self._create_executor()
+
+    async def stop(self) -> None:
+        if self._executor is None:
+            return
+        executor = self._executor
+        self._executor = None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, partial(executor.shutdown, wait=True, cancel_futures=True)
+        )
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._executor is None:
+            raise AnalyticsError("analytics pool not running.")
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, partial(fn, *args))
+        except BrokenProcessPool:
+            # a worker died, e.g. killed for running out of memory; replace
+            # the pool so later tasks don't fail too.
+            self.logger.error("analytics worker died, restarting pool.")
+            if self._executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create_executor()
+            raise AnalyticsError("analytics worker died.")
+
+    async def ingest(self, path: Path) -> AnalyzedSamples:
+        """Parse the benchdata at `path` and store its samples."""
+        return await self._run(_ingest, path)
+
+    async def import_json(self, json_data: str) -> AnalyzedSamples:
+        """Store samples kept as JSON, as before there were artifacts."""
+        return await self._run(_import_json, json_data)
+
+    async def histograms(
+        self, digest: str, params: HistogramParams
+    ) -> Dict[str, Histogram]:
+        return await self._run(_histograms, digest, params)
+
+    async def summary(self, digest: str) -> Dict[str, OpSummary]:
+        return await self._run(_summary, digest)
+
+    async def timeline(
+        self, digest: str, params: TimelineParams
+    ) -> Dict[str, Timeline]:
+        return await self._run(_timeline, digest, params)
+
+    @property
+    def artifacts(self) -> ArtifactStore:
+        return self._artifacts
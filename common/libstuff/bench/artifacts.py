@@ -0,0 +1,169 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# pyright: reportUnknownMemberType=false
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy
+import pandas
+from pydantic import BaseModel, ValidationError
+
+
+class ArtifactError(Exception):
+    pass
+
+
+class NoSuchArtifactError(ArtifactError):
+    pass
+
+
+class ArtifactRef(BaseModel):
+    digest: str
+    rows: int
+    size: int
+
+
+class _ColumnMeta(BaseModel):
+    name: str
+    # categories of a categorical column, whose codes are stored instead of
+    # its values; None for columns stored as is.
+    categories: Optional[List[str]]
+
+
+class _ArtifactMeta(BaseModel):
+    version: int
+    rows: int
+    columns: List[_ColumnMeta]
+
+
+_META_FILE = "columns.json"
+_VERSION = 1
+_COLUMN_NAME = re.compile("^[A-Za-z0-9_]+$")
+
+
+class ArtifactStore:
+    """
+    Content-addressed store of data frames, kept as one `.npy` file per
+    column under `<root>/<digest[:2]>/<digest>/`.
+
+    Numeric, boolean and datetime columns are stored as is. Any other
+    column is stored as a categorical: its codes, plus its categories in the
+    artifact's metadata. Frames are loaded with their columns memory-mapped,
+    so loading costs little more than opening the files, and the page cache
+    is shared by everyone loading the same artifact.
+    """
+
+    _root: Path
+
+    def __init__(self, root: Path) -> None:
+        self._root = root.resolve()
+        self._root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, digest: str) -> Path:
+        if re.match("^[0-9a-f]{64}$", digest) is None:
+            raise ArtifactError(f"invalid artifact digest '{digest}'.")
+        return self._root.joinpath(digest[:2], digest)
+
+    def put(self, frame: pandas.DataFrame) -> ArtifactRef:
+        """
+        Store `frame`, unless an identical frame is already stored, and
+        obtain a reference to it. Blocks on I/O.
+        """
+        h = hashlib.sha256()
+        columns: List[_ColumnMeta] = []
+        tmpdir = Path(tempfile.mkdtemp(dir=self._root, prefix=".tmp-"))
+        try:
+            for name in frame.columns:
+                if not isinstance(name, str) or not _COLUMN_NAME.match(name):
+                    raise ArtifactError(f"invalid column name '{name}'.")
+                col = frame[name]
+                categories: Optional[List[str]] = None
+                if isinstance(col.dtype, pandas.CategoricalDtype) or (
+                    col.dtype.kind not in "biufcmM"
+                ):
+                    # missing values get code -1.
+                    cat = pandas.Categorical(col)
+                    categories = [str(c) for c in cat.categories]
+                    arr = numpy.asarray(cat.codes)
+                else:
+                    arr = col.to_numpy()
+
+                numpy.save(tmpdir.joinpath(f"{name}.npy"), arr)
+                h.update(name.encode("utf-8"))
+                h.update(str(arr.dtype).encode("utf-8"))
+                h.update(json.dumps(categories).encode("utf-8"))
+                h.update(numpy.ascontiguousarray(arr).tobytes())
+                columns.append(_ColumnMeta(name=name, categories=categories))
+
+            meta = _ArtifactMeta(
+                version=_VERSION, rows=len(frame), columns=columns
+            )
+            tmpdir.joinpath(_META_FILE).write_text(meta.json())
+            size = sum(p.stat().st_size for p in tmpdir.iterdir())
+
+            digest = h.hexdigest()
+            path = self._path(digest)
+            path.parent.mkdir(exist_ok=True)
+            try:
+                os.rename(tmpdir, path)
+            except OSError:
+                if not path.exists():
+                    raise
+                # already stored.
+                shutil.rmtree(tmpdir)
+        except BaseException:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+
+        return ArtifactRef(digest=digest, rows=len(frame), size=size)
+
+    def _meta(self, path: Path) -> _ArtifactMeta:
+        try:
+            meta = _ArtifactMeta.parse_file(path.joinpath(_META_FILE))
+        except FileNotFoundError:
+            raise NoSuchArtifactError()
+        except (ValidationError, ValueError) as e:
+            raise ArtifactError(f"malformed artifact at '{path}': {e}")
+        if meta.version != _VERSION:
+            raise ArtifactError(
+                f"unknown artifact version {meta.version} at '{path}'."
+            )
+        return meta
+
+    def get(self, digest: str) -> pandas.DataFrame:
+        """Load artifact `digest`, memory-mapping its columns."""
+        path = self._path(digest)
+        meta = self._meta(path)
+
+        data: Dict[str, object] = {}
+        for col in meta.columns:
+            arr = numpy.load(path.joinpath(f"{col.name}.npy"), mmap_mode="r")
+            if col.categories is None:
+                data[col.name] = arr
+            else:
+                data[col.name] = pandas.Categorical.from_codes(
+                    arr, categories=col.categories  # type: ignore
+                )
+        return pandas.DataFrame(data, copy=False)
+
+    def exists(self, digest: str) -> bool:
+        return self._path(digest).joinpath(_META_FILE).exists()
+
+    def remove(self, digest: str) -> None:
+        shutil.rmtree(self._path(digest), ignore_errors=True)
+
+    @property
+    def root(self) -> Path:
+        return self._root
@@ -7,45 +7,662 @@
 
 # pyright: reportUnknownMemberType=false
 
-from collections import defaultdict
-from typing import Dict, List, Optional
+import math
+from datetime import datetime as dt
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+import numpy
 import pandas
+from pydantic import BaseModel, root_validator, validator
+
+
+class HistogramScale(str, Enum):
+    LINEAR = "linear"
+    LOG = "log"
+
+
+class HistogramParams(BaseModel):
+    bins: int = 50
+    scale: HistogramScale = HistogramScale.LINEAR
+    # bins span [range_min, range_max], in milliseconds; the samples' own
+    # minimum and maximum where not specified.
+    range_min: Optional[float] = None
+    range_max: Optional[float] = None
+    # also ship every sample, sorted.
+    raw: bool = False
 
-from pydantic import BaseModel
+    class Config:
+        frozen = True
+
+    @validator("bins")
+    def _check_bins(cls, value: int) -> int:
+        if value <= 0 or value > 10000:
+            raise ValueError("bins must be in (0, 10000]")
+        return value
+
+    @root_validator(skip_on_failure=True)
+    def _check_range(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        lo, hi = values.get("range_min"), values.get("range_max")
+        if lo is not None and hi is not None and hi < lo:
+            raise ValueError("range_max must not be lower than range_min")
+        if values.get("scale") == HistogramScale.LOG and (
+            lo is not None and lo <= 0
+        ):
+            raise ValueError("log bins require a positive range_min")
+        return values
 
 
 class Histogram(BaseModel):
     op: str
-    data: List[float]
+    count: int
+    scale: HistogramScale
+    # bin i counts samples in [edges[i], edges[i + 1]); the last bin also
+    # includes its upper edge. In milliseconds.
+    edges: List[float]
+    counts: List[int]
+    # samples below and above the binned range.
+    below: int
+    above: int
+    p50: float
+    p90: float
+    p99: float
+    p999: float
+    max: float
+    data: Optional[List[float]] = None
+
+
+_PERCENTILES = numpy.array([0.5, 0.9, 0.99, 0.999])
+
+
+def _percentiles(lat: Any, qs: Any) -> Any:
+    """
+    Percentiles `qs` of sorted, non-empty `lat`, interpolated linearly like
+    numpy.quantile's default, without partitioning `lat` again.
+    """
+    pos = qs * (len(lat) - 1)
+    lo_idx = numpy.floor(pos).astype(numpy.int64)
+    hi_idx = numpy.ceil(pos).astype(numpy.int64)
+    return lat[lo_idx] + (lat[hi_idx] - lat[lo_idx]) * (pos - lo_idx)
+
+
+def histogram(op: str, lat: Any, params: HistogramParams) -> Histogram:
+    """
+    Bin `lat`, sorted, non-empty latencies without NaNs, and obtain their
+    percentiles. These are read off the sorted array, and bin counts are
+    the differences between the edges' positions in it.
+    """
+    n = len(lat)
+    pcts = _percentiles(lat, _PERCENTILES)
+
+    lo = params.range_min if params.range_min is not None else lat[0]
+    hi = params.range_max if params.range_max is not None else lat[-1]
+    if params.scale == HistogramScale.LOG:
+        if params.range_min is None:
+            first = numpy.searchsorted(lat, 0.0, side="right")
+            lo = lat[first] if first < n else 1.0
+        hi = max(hi, lo)
+        edges = numpy.geomspace(lo, hi, params.bins + 1)
+    else:
+        hi = max(hi, lo)
+        edges = numpy.linspace(lo, hi, params.bins + 1)
+
+    bounds = numpy.searchsorted(lat, edges, side="left")
+    bounds[-1] = numpy.searchsorted(lat, edges[-1], side="right")
+
+    return Histogram(
+        op=op,
+        count=n,
+        scale=params.scale,
+        edges=edges.tolist(),
+        counts=numpy.diff(bounds).tolist(),
+        below=int(bounds[0]),
+        above=int(n - bounds[-1]),
+        p50=float(pcts[0]),
+        p90=float(pcts[1]),
+        p99=float(pcts[2]),
+        p999=float(pcts[3]),
+        max=float(lat[-1]),
+        data=lat.tolist() if params.raw else None,
+    )
+
+
+class TimelineParams(BaseModel):
+    # window length, in seconds.
+    window: float = 1.0
+    # at most this many samples per op, picked at random, to plot as a
+    # scatter; none if zero.
+    scatter: int = 0
+
+    class Config:
+        frozen = True
+
+    @validator("window")
+    def _check_window(cls, value: float) -> float:
+        if value <= 0:
+            raise ValueError("window must be positive")
+        return value
+
+    @validator("scatter")
+    def _check_scatter(cls, value: int) -> int:
+        if value < 0 or value > 100000:
+            raise ValueError("scatter must be in [0, 100000]")
+        return value
+
+
+class TimelineScatter(BaseModel):
+    # seconds since the timeline's start, and latency in milliseconds.
+    time: List[float]
+    latency_ms: List[float]
+
+
+class Timeline(BaseModel):
+    """
+    An op's samples bucketed by completion time into windows of `window`
+    seconds, window i starting at `start + i * window`. Latencies of empty
+    windows are None.
+    """
+
+    op: str
+    start: dt
+    window: float
+    ops_per_sec: List[float]
+    bytes_per_sec: List[float]
+    errors: List[int]
+    latency_ms_p50: List[Optional[float]]
+    latency_ms_p99: List[Optional[float]]
+    scatter: Optional[TimelineScatter] = None
+
+
+# keep timelines to a size worth plotting.
+_TIMELINE_MAX_WINDOWS = 100000
+
+
+def _window_percentiles(bucket: Any, lat: Any, nbuckets: int, qs: Any) -> Any:
+    """
+    Percentiles `qs` of the latencies in each bucket, in one go: samples are
+    sorted by bucket and latency, and each bucket's percentiles are read off
+    its slice, like `_percentiles`. NaN for empty buckets.
+    """
+    order = numpy.lexsort((lat, bucket))
+    lat = lat[order]
+    counts = numpy.bincount(bucket, minlength=nbuckets)
+    first = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+    res = numpy.full((len(qs), nbuckets), numpy.nan)
+    full = counts > 0
+    for i, q in enumerate(qs):
+        pos = q * (counts[full] - 1)
+        lo = numpy.floor(pos).astype(numpy.int64)
+        hi = numpy.ceil(pos).astype(numpy.int64)
+        base = first[full]
+        res[i, full] = lat[base + lo] + (lat[base + hi] - lat[base + lo]) * (
+            pos - lo
+        )
+    return res
+
+
+def _or_none(values: Any) -> List[Optional[float]]:
+    return [None if numpy.isnan(v) else float(v) for v in values]
+
+
+class LatencyPrecision(str, Enum):
+    FLOAT32 = "float32"
+    # about 3 significant digits, for latencies up to about 65 s; samples of
+    # runs with longer latencies are kept as float32.
+    FLOAT16 = "float16"
+
+
+# the sample columns Plots uses, and those kept to split samples by; any
+# other column is dropped when compacting samples.
+_SAMPLE_CATEGORIES: List[str] = ["op", "client_id", "endpoint", "error"]
+_SAMPLE_INTEGERS: List[str] = ["thread", "bytes"]
+_SAMPLE_TIMES: List[str] = ["start", "end"]
+
+
+def _to_datetime(col: pandas.Series) -> pandas.Series:
+    """Timestamps as naive UTC datetime64[ns], NaT where not parseable."""
+    if col.dtype.kind == "M" and getattr(col.dtype, "tz", None) is None:
+        return col.astype("datetime64[ns]")
+    return pandas.to_datetime(col, utc=True, errors="coerce").dt.tz_convert(
+        None
+    )
+
+
+def compact_samples(
+    data: pandas.DataFrame, latency: LatencyPrecision = LatencyPrecision.FLOAT32
+) -> pandas.DataFrame:
+    """
+    Samples in the smallest dtypes Plots can work with: categorical strings,
+    the narrowest integers holding their values, timestamps as datetime64
+    nanoseconds, and latencies as `duration_ms`, in float32 or float16.
+    Columns Plots has no use for, e.g. `idx`, `file` and `duration_ns`, are
+    dropped.
+    """
+    out: Dict[str, Any] = {}
+    for name in _SAMPLE_CATEGORIES:
+        if name in data.columns:
+            out[name] = data[name].astype("category")
+    for name in _SAMPLE_INTEGERS:
+        if name in data.columns:
+            col = data[name]
+            out[name] = (
+                pandas.to_numeric(col, downcast="integer")
+                if col.dtype.kind in "iu"
+                else col
+            )
+    for name in _SAMPLE_TIMES:
+        if name in data.columns:
+            out[name] = _to_datetime(data[name])
+
+    if "duration_ms" in data.columns:
+        lat = data["duration_ms"].to_numpy(dtype=numpy.float64)
+    else:
+        lat = data["duration_ns"].to_numpy(dtype=numpy.float64) * 1e-6
+    dtype = numpy.float32
+    if latency == LatencyPrecision.FLOAT16 and (
+        len(lat) == 0 or numpy.nanmax(lat) <= numpy.finfo(numpy.float16).max
+    ):
+        dtype = numpy.float16
+    out["duration_ms"] = lat.astype(dtype)
+    return pandas.DataFrame(out, copy=False)
+
+
+class OpSummary(BaseModel):
+    op: str
+    count: int
+    errors: int
+    bytes: int
+    # None where the op has no valid latencies; the min and the p90 and
+    # p999 also in summaries computed before these were.
+    latency_ms_mean: Optional[float]
+    latency_ms_p50: Optional[float]
+    latency_ms_p99: Optional[float]
+    latency_ms_max: Optional[float]
+    latency_ms_min: Optional[float] = None
+    latency_ms_p90: Optional[float] = None
+    latency_ms_p999: Optional[float] = None
+    # from the op's first start to its last end, in seconds, and the
+    # throughput over it; MiB/s, as warp reports.
+    duration: Optional[float] = None
+    ops_per_sec: Optional[float] = None
+    mib_per_sec: Optional[float] = None
+
+    # summaries stored before were given NaN instead, which is not JSON.
+    @validator(
+        "latency_ms_mean",
+        "latency_ms_p50",
+        "latency_ms_p99",
+        "latency_ms_max",
+        "latency_ms_min",
+        "latency_ms_p90",
+        "latency_ms_p999",
+    )
+    def _nan_to_none(cls, value: Optional[float]) -> Optional[float]:
+        return None if value is not None and math.isnan(value) else value
+
+    @property
+    def is_complete(self) -> bool:
+        return self.ops_per_sec is not None
+
+
+class OpThroughput(BaseModel):
+    op: str
+    count: int
+    bytes: int
+    # from the op's first start to its last end, in seconds.
+    duration: float
+    ops_per_sec: float
+    bytes_per_sec: float
+
+
+class OpSplit(BaseModel):
+    key: str
+    count: int
+    errors: int
+    bytes: int
+    # None where the key's samples have no valid latencies.
+    latency_ms_mean: Optional[float]
 
 
 class Plots:
+    """
+    Analytics over one target's samples. Rows are grouped by op once, on
+    first use, into an index of row positions per op; every view is then
+    derived from that index with numpy, and memoised, so a run's views are
+    only ever computed once while its plots are loaded.
+    """
+
+    # distinct histogram, or timeline, parameters kept per run.
+    _HISTOGRAMS_MAX: int = 16
 
     data: pandas.DataFrame
-    _latency_histogram_per_op: Dict[str, Histogram]
+    _op_index: Optional[Dict[str, Any]]
+    _latencies: Dict[str, Any]
+    _summary: Optional[Dict[str, OpSummary]]
+    _throughput: Optional[Dict[str, OpThroughput]]
+    _splits: Dict[str, Dict[str, Dict[str, OpSplit]]]
+    _histograms: Dict[HistogramParams, Dict[str, Histogram]]
+    _timelines: Dict[TimelineParams, Dict[str, Timeline]]
+
+    def __init__(self, data: pandas.DataFrame) -> None:
+        self.data = data
+        if "duration_ms" not in self.data.columns:
+            self.data["duration_ms"] = self.data["duration_ns"] * 1e-6
+        self._op_index = None
+        self._latencies = {}
+        self._summary = None
+        self._throughput = None
+        self._splits = {}
+        self._histograms = {}
+        self._timelines = {}
+
+    @classmethod
+    def from_json(
+        cls,
+        json_data: str,
+        latency: LatencyPrecision = LatencyPrecision.FLOAT32,
+    ) -> "Plots":
+        """Samples as stored before they were kept as artifacts."""
+        return cls(compact_samples(pandas.read_json(json_data), latency))
 
-    def __init__(self, json_data: str) -> None:
-        self.data = pandas.read_json(json_data)
-        self._latency_histogram_per_op = {}
+    @property
+    def size(self) -> int:
+        """
+        Bytes taken in memory by the samples, and by the index and sorted
+        latencies derived from them so far.
+        """
+        size = int(self.data.memory_usage(deep=True).sum())
+        if self._op_index is not None:
+            size += sum(idx.nbytes for idx in self._op_index.values())
+        size += sum(lat.nbytes for lat in self._latencies.values())
+        return size
+
+    def _index(self) -> Dict[str, Any]:
+        """Row positions of each op's samples, in row order."""
+        if self._op_index is None:
+            codes, uniques = pandas.factorize(self.data["op"], sort=True)
+            order = numpy.argsort(codes, kind="stable")
+            # rows without an op have code -1, and are sorted first.
+            first = int(numpy.count_nonzero(codes < 0))
+            counts = numpy.bincount(codes[codes >= 0], minlength=len(uniques))
+            bounds = first + numpy.concatenate(([0], numpy.cumsum(counts)))
+            self._op_index = {
+                str(op): order[bounds[i] : bounds[i + 1]]
+                for i, op in enumerate(uniques)
+            }
+        return self._op_index
+
+    def _column(self, name: str) -> Optional[Any]:
+        if name not in self.data.columns:
+            return None
+        return self.data[name].to_numpy()
+
+    def _errors(self) -> Optional[Any]:
+        col = self.data.get("error")
+        if col is None:
+            return None
+        return col.notna().to_numpy()
 
     def get_ops(self) -> List[str]:
-        return [x for x in self.data["op"].unique() if isinstance(x, str)]
+        return list(self._index())
 
-    def get_latency_histogram_per_op(self) -> Dict[str, Histogram]:
-        res: Dict[str, Histogram] = {}
-        ops: List[str] = self.get_ops()
-        for op in ops:
-            h: Optional[Histogram] = self.get_latency_histogram_for_op(op)
-            if h is not None:
-                res[op] = h
+    def get_latencies(self, op: str) -> Any:
+        """Op `op`'s latencies in milliseconds, sorted, without NaNs."""
+        lat = self._latencies.get(op)
+        if lat is None:
+            idx = self._index().get(op)
+            if idx is None:
+                return numpy.empty(0)
+            lat = numpy.sort(
+                self.data["duration_ms"].to_numpy(dtype=numpy.float64)[idx]
+            )
+            lat = lat[: numpy.searchsorted(lat, numpy.nan)]  # NaNs sort last.
+            self._latencies[op] = lat
+        return lat
 
+    def get_latencies_for_op(self, op: str) -> List[float]:
+        return self.get_latencies(op).tolist()
+
+    def get_summary(self) -> Dict[str, OpSummary]:
+        if self._summary is not None:
+            return self._summary
+
+        res: Dict[str, OpSummary] = {}
+        errors = self._errors()
+        throughput = self.get_throughput()
+        for op, idx in self._index().items():
+            lat = self.get_latencies(op)
+            pcts: List[Optional[float]] = [None] * len(_PERCENTILES)
+            lo = mean = hi = None
+            if len(lat) > 0:
+                pcts = [float(v) for v in _percentiles(lat, _PERCENTILES)]
+                lo, mean, hi = float(lat[0]), float(lat.mean()), float(lat[-1])
+            tp = throughput[op]
+            res[op] = OpSummary(
+                op=op,
+                count=len(idx),
+                errors=0 if errors is None else int(errors[idx].sum()),
+                bytes=tp.bytes,
+                latency_ms_mean=mean,
+                latency_ms_p50=pcts[0],
+                latency_ms_p99=pcts[2],
+                latency_ms_max=hi,
+                latency_ms_min=lo,
+                latency_ms_p90=pcts[1],
+                latency_ms_p999=pcts[3],
+                duration=tp.duration,
+                ops_per_sec=tp.ops_per_sec,
+                mib_per_sec=tp.bytes_per_sec / 2**20,
+            )
+        self._summary = res
         return res
 
-    def get_latency_histogram_for_op(self, op: str) -> Optional[Histogram]:
-        data: pandas.DataFrame = self.data.query(f"op == '{op}'")
-        if data.empty:
-            return None
+    def get_throughput(self) -> Dict[str, OpThroughput]:
+        if self._throughput is not None:
+            return self._throughput
+
+        res: Dict[str, OpThroughput] = {}
+        nbytes = self._column("bytes")
+        start = self._column("start")
+        end = self._column("end")
+        for op, idx in self._index().items():
+            duration = 0.0
+            if start is not None and end is not None and len(idx) > 0:
+                first = numpy.nanmin(start[idx].astype("datetime64[ns]"))
+                last = numpy.nanmax(end[idx].astype("datetime64[ns]"))
+                duration = max(
+                    float((last - first) / numpy.timedelta64(1, "s")), 0.0
+                )
+            total = 0 if nbytes is None else int(nbytes[idx].sum())
+            res[op] = OpThroughput(
+                op=op,
+                count=len(idx),
+                bytes=total,
+                duration=duration,
+                ops_per_sec=len(idx) / duration if duration > 0 else 0.0,
+                bytes_per_sec=total / duration if duration > 0 else 0.0,
+            )
+        self._throughput = res
+        return res
+
+    def get_split(self, by: str) -> Dict[str, Dict[str, OpSplit]]:
+        """
+        Each op's samples split by the values of column `by`, e.g. per
+        `thread` or per `client_id`.
+        """
+        if by in self._splits:
+            return self._splits[by]
+        if by not in self.data.columns:
+            raise ValueError(f"no such column '{by}'")
+
+        codes, uniques = pandas.factorize(self.data[by], sort=True)
+        nkeys = len(uniques)
+        lat = self.data["duration_ms"].to_numpy(dtype=numpy.float64)
+        nbytes = self._column("bytes")
+        errors = self._errors()
+
+        res: Dict[str, Dict[str, OpSplit]] = {}
+        for op, idx in self._index().items():
+            keys = codes[idx]
+            valid = keys >= 0
+            keys, rows = keys[valid], idx[valid]
+            op_lat = lat[rows]
+            has_lat = ~numpy.isnan(op_lat)
+            count = numpy.bincount(keys, minlength=nkeys)
+            lat_count = numpy.bincount(keys[has_lat], minlength=nkeys)
+            lat_sum = numpy.bincount(
+                keys[has_lat], weights=op_lat[has_lat], minlength=nkeys
+            )
+            err = (
+                numpy.zeros(nkeys, dtype=numpy.int64)
+                if errors is None
+                else numpy.bincount(keys, weights=errors[rows], minlength=nkeys)
+            )
+            byt = (
+                numpy.zeros(nkeys, dtype=numpy.int64)
+                if nbytes is None
+                else numpy.bincount(keys, weights=nbytes[rows], minlength=nkeys)
+            )
+            res[op] = {
+                str(uniques[k]): OpSplit(
+                    key=str(uniques[k]),
+                    count=int(count[k]),
+                    errors=int(err[k]),
+                    bytes=int(byt[k]),
+                    latency_ms_mean=(
+                        float(lat_sum[k] / lat_count[k])
+                        if lat_count[k] > 0
+                        else None
+                    ),
+                )
+                for k in numpy.flatnonzero(count)
+            }
+        self._splits[by] = res
+        return res
+
+    def get_timeline(
+        self, params: TimelineParams = TimelineParams()
+    ) -> Dict[str, Timeline]:
+        """
+        Per-op timelines. Windows are shared by all ops, starting at the
+        first sample's start; each sample counts towards the window it
+        ended in. Timelines are cached per set of parameters.
+        """
+        res = self._timelines.get(params)
+        if res is not None:
+            return res
+
+        start = self._column("start")
+        end = self._column("end")
+        if start is None or end is None or len(self.data) == 0:
+            raise ValueError("samples have no timestamps")
+        start = start.astype("datetime64[ns]").view(numpy.int64)
+        end = end.astype("datetime64[ns]").view(numpy.int64)
+        # NaT views as the minimum int64.
+        valid = (start != numpy.iinfo(numpy.int64).min) & (
+            end != numpy.iinfo(numpy.int64).min
+        )
+        if not valid.any():
+            raise ValueError("samples have no timestamps")
+        t0 = int(start[valid].min())
+        window_ns = int(params.window * 1e9)
+        nwindows = int((end[valid].max() - t0) // window_ns) + 1
+        if nwindows > _TIMELINE_MAX_WINDOWS:
+            raise ValueError(
+                f"{nwindows} windows of {params.window} s, at most "
+                f"{_TIMELINE_MAX_WINDOWS} allowed"
+            )
+        bucket = numpy.zeros(len(end), dtype=numpy.int64)
+        bucket[valid] = (end[valid] - t0) // window_ns
+        bucket = numpy.clip(bucket, 0, nwindows - 1)
+
+        lat = self.data["duration_ms"].to_numpy(dtype=numpy.float64)
+        nbytes = self._column("bytes")
+        errors = self._errors()
+        rng = numpy.random.default_rng(0)
+
+        res = {}
+        for op, idx in self._index().items():
+            idx = idx[valid[idx]]
+            b = bucket[idx]
+            count = numpy.bincount(b, minlength=nwindows)
+            byt = (
+                numpy.zeros(nwindows)
+                if nbytes is None
+                else numpy.bincount(b, weights=nbytes[idx], minlength=nwindows)
+            )
+            err = (
+                numpy.zeros(nwindows)
+                if errors is None
+                else numpy.bincount(b, weights=errors[idx], minlength=nwindows)
+            )
+            has_lat = ~numpy.isnan(lat[idx])
+            pcts = _window_percentiles(
+                b[has_lat],
+                lat[idx][has_lat],
+                nwindows,
+                numpy.array([0.5, 0.99]),
+            )
+
+            scatter: Optional[TimelineScatter] = None
+            if params.scatter > 0:
+                # a uniform sample without replacement, as a reservoir
+                # would hold after seeing every sample, in time order.
+                picked = idx[has_lat]
+                if len(picked) > params.scatter:
+                    picked = numpy.sort(
+                        rng.choice(picked, params.scatter, replace=False)
+                    )
+                scatter = TimelineScatter(
+                    time=((end[picked] - t0) * 1e-9).tolist(),
+                    latency_ms=lat[picked].tolist(),
+                )
+
+            res[op] = Timeline(
+                op=op,
+                start=pandas.Timestamp(t0).to_pydatetime(),
+                window=params.window,
+                ops_per_sec=(count / params.window).tolist(),
+                bytes_per_sec=(byt / params.window).tolist(),
+                errors=err.astype(numpy.int64).tolist(),
+                latency_ms_p50=_or_none(pcts[0]),
+                latency_ms_p99=_or_none(pcts[1]),
+                scatter=scatter,
+            )
+
+        if len(self._timelines) >= self._HISTOGRAMS_MAX:
+            del self._timelines[next(iter(self._timelines))]
+        self._timelines[params] = res
+        return res
+
+    def get_latency_histogram_per_op(
+        self, params: HistogramParams = HistogramParams()
+    ) -> Dict[str, Histogram]:
+        """
+        Latency histograms for each op. Binned histograms are cached per
+        set of parameters; raw samples are never cached, only attached to a
+        copy of the binned histograms when asked for.
+        """
+        binned = params.copy(update={"raw": False})
+        res = self._histograms.get(binned)
+        if res is None:
+            res = {}
+            for op in self._index():
+                lat = self.get_latencies(op)
+                if len(lat) > 0:
+                    res[op] = histogram(op, lat, binned)
+            if len(self._histograms) >= self._HISTOGRAMS_MAX:
+                del self._histograms[next(iter(self._histograms))]
+            self._histograms[binned] = res
+
+        if not params.raw:
+            return res
+        return {
+            op: h.copy(update={"data": self.get_latencies_for_op(op)})
+            for op, h in res.items()
+        }
 
-        hist_data: pandas.Series[float] = data["duration_ms"]
-        dd = hist_data.to_dict(defaultdict(list))
-        return Histogram(op=op, data=list(dd.values()))
+    def get_latency_histogram_for_op(
+        self, op: str, params: HistogramParams = HistogramParams()
+    ) -> Optional[Histogram]:
+        return self.get_latency_histogram_per_op(params).get(op)
@@ -9,18 +9,24 @@ import asyncio
 import logging
 import random
 import string
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, TypeVar
 
 from pydantic import BaseModel
 
 from libstuff import podman
-from libstuff.bench.warp import WarpBenchmark, ProgressCB
+from libstuff.bench.warp import BenchdataCB, WarpBenchmark, ProgressCB
+
+T = TypeVar("T")
 
 
 class BenchmarkRunningError(Exception):
     pass
 
 
+class BenchmarkStoppedError(Exception):
+    pass
+
+
 class BenchmarkParams(BaseModel):
     num_objects: int
     object_size: str
@@ -60,7 +66,9 @@ class BenchmarkRunner:
 
     lock: asyncio.Lock
     is_running: bool
+    is_stopped: bool
     target_cid: Optional[str]
+    warp: Optional[WarpBenchmark]
 
     def __init__(
         self,
@@ -73,27 +81,50 @@ class BenchmarkRunner:
         self.logger = logger
         self.lock = asyncio.Lock()
         self.is_running = False
+        self.is_stopped = False
         self.target_cid = None
+        self.warp = None
 
     async def run(
         self,
         name: str,
         target: BenchmarkTarget,
+        handler: BenchdataCB[T],
         progress_cb: Optional[ProgressCB] = None,
-    ) -> str:
+    ) -> T:
+        """
+        Benchmark `target`, handing the resulting benchdata to `handler`,
+        and obtain whatever it returns.
+        """
         async with self.lock:
+            if self.is_stopped:
+                raise BenchmarkStoppedError()
             if self.is_running:
                 self.logger.debug(f"already running, cid: {self.target_cid}")
                 raise BenchmarkRunningError()
             self.is_running = True
 
-        await self._run_target(name, target)
-        # wait for target to become available
-        # this should be a test on the target's address
-        await asyncio.sleep(10)  # for now give it 10 seconds
-        res = await self._run_warp(target, progress_cb)
-        await self._stop_target()
-        return res
+        try:
+            await self._run_target(name, target)
+            # wait for target to become available
+            # this should be a test on the target's address
+            for _ in range(10):  # for now give it 10 seconds
+                if self.is_stopped:
+                    raise BenchmarkStoppedError()
+                await asyncio.sleep(1)
+            return await self._run_warp(target, handler, progress_cb)
+        finally:
+            await self._stop_target()
+
+    def stop(self) -> None:
+        """
+        Stop benchmarking. A running `run()` stops its target and returns
+        the samples taken so far, if any; later ones raise
+        BenchmarkStoppedError.
+        """
+        self.is_stopped = True
+        if self.warp is not None:
+            self.warp.stop()
 
     async def _run_target(self, name: str, target: BenchmarkTarget) -> None:
 
@@ -129,23 +160,31 @@ class BenchmarkRunner:
             if not self.is_running:
                 self.logger.error("attempting to stop target, but not running.")
                 return
-            await podman.stop(id=self.target_cid)
+            if self.target_cid is not None:
+                await podman.stop(id=self.target_cid)
             self.is_running = False
             self.target_cid = None
 
     async def _run_warp(
-        self, target: BenchmarkTarget, progress_cb: Optional[ProgressCB]
-    ) -> str:
+        self,
+        target: BenchmarkTarget,
+        handler: BenchdataCB[T],
+        progress_cb: Optional[ProgressCB],
+    ) -> T:
         warp = WarpBenchmark(
             self.params.object_size,
             self.params.num_objects,
             self.params.duration,
             self.logger,
         )
+        self.warp = warp
+        if self.is_stopped:
+            raise BenchmarkStoppedError()
         res = await warp.run(
             target.host,
             target.access_key,
             target.secret_key,
+            handler,
             progress_cb,
         )
         return res
@@ -5,19 +5,24 @@
 # the Free Software Foundation, either version 3 of the License, or (at
 # your option) any later version.
 
+# pyright: reportUnknownMemberType=false
+
 import asyncio
 import logging
 import random
 import re
 import shutil
+import signal
 import string
 import tempfile
 from enum import Enum
 from pathlib import Path
-from typing import Callable, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
 
+import numpy
 import pandas
 import zstandard as zstd
+from pandas.api.types import union_categoricals
 from pydantic import BaseModel
 
 
@@ -30,6 +35,12 @@ class WarpBenchmarkState(Enum):
 
 ProgressCB = Callable[[WarpBenchmarkState, float], None]
 
+T = TypeVar("T")
+
+# handles a run's zstd-compressed benchdata file, which is removed once the
+# handler returns.
+BenchdataCB = Callable[[Path], Awaitable[T]]
+
 
 class WarpError(Exception):
     pass
@@ -52,6 +63,78 @@ class WarpResult(BaseModel):
     stat: WarpOperationResult
 
 
+# warp's benchdata columns, and the dtypes we read them as.
+_CSV_DTYPES: Dict[str, str] = {
+    "idx": "uint32",
+    "thread": "uint16",
+    "op": "category",
+    "client_id": "category",
+    "n_objects": "uint32",
+    "bytes": "int64",
+    "endpoint": "category",
+    "file": "category",
+    "error": "category",
+    "duration_ns": "int64",
+}
+# RFC 3339 timestamps, kept as UTC datetime64[ns]. 'end' is not parsed, as
+# it is 'start' plus 'duration_ns'.
+_CSV_TIMES: List[str] = ["start", "first_byte"]
+_CSV_CHUNK_ROWS = 1_000_000
+
+
+def _parse_chunk(chunk: pandas.DataFrame) -> pandas.DataFrame:
+    for col in _CSV_TIMES:
+        if col in chunk.columns:
+            chunk[col] = pandas.to_datetime(
+                chunk[col], utc=True, errors="coerce"
+            ).dt.tz_convert(None)
+    duration = chunk["duration_ns"].to_numpy()
+    if "end" in chunk.columns:
+        chunk["end"] = chunk["start"] + duration.astype("timedelta64[ns]")
+    chunk["duration_ms"] = duration * 1e-6
+    return chunk
+
+
+def _concat_chunks(chunks: List[pandas.DataFrame]) -> pandas.DataFrame:
+    if len(chunks) == 1:
+        return chunks[0]
+    data: Dict[str, object] = {}
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pandas.CategoricalDtype):
+            # each chunk has its own categories.
+            data[col] = union_categoricals([c[col] for c in chunks])
+        else:
+            data[col] = numpy.concatenate([c[col].to_numpy() for c in chunks])
+    return pandas.DataFrame(data, copy=False)
+
+
+def parse_benchdata(
+    path: Path, chunk_rows: int = _CSV_CHUNK_ROWS
+) -> pandas.DataFrame:
+    """
+    Parse the zstd-compressed benchdata CSV at `path`. The file is
+    decompressed as it is parsed, `chunk_rows` rows at a time, so only one
+    chunk's worth of text is in memory at once; the rest is kept in compact
+    dtypes.
+    """
+    chunks: List[pandas.DataFrame] = []
+    with path.open("rb") as source:
+        decomp = zstd.ZstdDecompressor()
+        with decomp.stream_reader(source) as stream:
+            with pandas.read_csv(
+                stream,  # type: ignore
+                delimiter="\t",
+                dtype=_CSV_DTYPES,  # type: ignore
+                chunksize=chunk_rows,
+            ) as reader:
+                for chunk in reader:
+                    chunks.append(_parse_chunk(chunk))
+
+    if len(chunks) == 0:
+        raise WarpError(f"no samples found in '{path}'.")
+    return _concat_chunks(chunks)
+
+
 class WarpBenchmark:
     logger: logging.Logger
     objsize: str
@@ -60,6 +143,8 @@ class WarpBenchmark:
 
     state: WarpBenchmarkState
     progress: float
+    proc: Optional[asyncio.subprocess.Process]
+    is_stopped: bool
 
     def __init__(
         self,
@@ -81,14 +166,17 @@ class WarpBenchmark:
         self.duration = duration
         self.state = WarpBenchmarkState.NONE
         self.progress = 0.0
+        self.proc = None
+        self.is_stopped = False
 
     async def run(
         self,
         host: str,
         access_key: str,
         secret_key: str,
+        handler: BenchdataCB[T],
         progress_cb: Optional[ProgressCB] = None,
-    ) -> str:
+    ) -> T:
 
         bucketname = "".join(
             random.choice(string.ascii_lowercase) for _ in range(16)
@@ -126,38 +214,49 @@ class WarpBenchmark:
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
+        self.proc = proc
+        if self.is_stopped:
+            # stopped while starting.
+            self._interrupt()
         assert proc.stdout is not None
         await asyncio.gather(self._process_output(proc.stdout, progress_cb))
         retcode = await proc.wait()
-        if retcode != 0:
+        benchdata = tmp_benchdata_file.with_suffix(".csv.zst")
+        # once interrupted, warp saves the samples taken so far, and those
+        # are kept like a whole run's would.
+        if retcode != 0 and not (self.is_stopped and benchdata.exists()):
             assert proc.stderr is not None
             err = (await proc.stderr.read()).decode("utf-8")
             self.logger.error(f"error running warp: {err}")
+            shutil.rmtree(tmp_benchdata_dir, ignore_errors=True)
             raise WarpError()
 
-        result = self.parse_csv(tmp_benchdata_file)
-        for dirent in tmp_benchdata_dir.iterdir():
-            dirent.unlink()
-        tmp_benchdata_dir.rmdir()
-        return result
-
-    def parse_csv(self, datafile: Path) -> str:
+        try:
+            return await handler(benchdata)
+        finally:
+            for dirent in tmp_benchdata_dir.iterdir():
+                dirent.unlink()
+            tmp_benchdata_dir.rmdir()
+
+    def _interrupt(self) -> None:
+        if self.proc is not None and self.proc.returncode is None:
+            self.proc.send_signal(signal.SIGINT)
+
+    def stop(self) -> None:
+        """
+        Stop the benchmark, if running. `run()` then hands the samples taken
+        so far to its handler, if warp saved any.
+        """
+        self.is_stopped = True
+        self._interrupt()
+
+    def parse_csv(self, datafile: Path) -> pandas.DataFrame:
         zstd_file = datafile.with_suffix(".csv.zst")
-        csv_file = datafile.with_suffix(".csv")
         assert zstd_file.exists()
-        with zstd_file.open("rb") as source:
-            decomp = zstd.ZstdDecompressor()
-            with csv_file.open("wb") as dest:
-                decomp.copy_stream(source, dest)
-
-        assert csv_file.exists()
-        self.logger.debug(f"reading csv file at {csv_file}")
-        data = pandas.read_csv(csv_file, delimiter="\t")  # type: ignore
-        self.logger.debug(data)
-        data["duration_ms"] = data.apply(  # type: ignore
-            lambda r: r["duration_ns"] * 1e-6, axis=1  # type: ignore
-        )
-        return data.to_json()  # type: ignore
+        self.logger.debug(f"reading benchdata at {zstd_file}")
+        data = parse_benchdata(zstd_file)
+        self.logger.debug(f"read {len(data)} samples")
+        return data
 
     async def _process_output(
         self,
@@ -0,0 +1,45 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+from libstuff.dbm.backend import (
+    DBMEngine,
+    NamespaceUsage,
+    StorageBackend,
+    StorageUsage,
+    open_backend,
+)
+from libstuff.dbm.cache import ModelCacheConfig, ModelCacheStats
+from libstuff.dbm.codec import DBMCodec
+from libstuff.dbm.compress import CompressionConfig, CompressionStats
+from libstuff.dbm.db import DBM, DBMDurability
+from libstuff.dbm.error import DBMError
+from libstuff.dbm.maintenance import (
+    CompactionConfig,
+    CompactionInfo,
+    StorageStats,
+)
+from libstuff.dbm.migrate import migrate
+
+__all__ = [
+    "CompactionConfig",
+    "CompactionInfo",
+    "CompressionConfig",
+    "CompressionStats",
+    "DBM",
+    "DBMCodec",
+    "DBMDurability",
+    "DBMEngine",
+    "DBMError",
+    "ModelCacheConfig",
+    "ModelCacheStats",
+    "NamespaceUsage",
+    "StorageBackend",
+    "StorageStats",
+    "StorageUsage",
+    "migrate",
+    "open_backend",
+]
@@ -0,0 +1,150 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+import abc
+from enum import Enum
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from libstuff.dbm.error import DBMError
+
+
+class DBMEngine(str, Enum):
+    GDBM = "gdbm"
+    SQLITE = "sqlite"
+
+
+class NamespaceUsage(BaseModel):
+    keys: int = 0
+    live_bytes: int = 0
+
+
+class StorageUsage(BaseModel):
+    """
+    Space used by a backend. `live_bytes` is the size of the keys and values
+    currently stored, `free_bytes` an estimate of the space compaction would
+    reclaim. Namespaces are by name, with un-namespaced keys under "".
+    """
+
+    file_bytes: int
+    live_bytes: int
+    free_bytes: int
+    namespaces: Dict[str, NamespaceUsage]
+
+
+def namespace_of(key: str) -> str:
+    ns, sep, _ = key.partition("/")
+    return ns if len(sep) > 0 else ""
+
+
+class StorageBackend(abc.ABC):
+    """
+    Key-value storage engine behind `DBM`.
+
+    Keys are full keys, i.e. `<namespace>/<key>` for namespaced keys. Values
+    are opaque bytes; encoding and decoding them is up to `DBM`. Backends are
+    not expected to be safe for concurrent use, and callers serialize access,
+    except for reads on backends reporting `concurrent_reads`.
+    """
+
+    _path: Path
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def concurrent_reads(self) -> bool:
+        """Whether reads may run concurrently with each other and a writer."""
+        return False
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abc.abstractmethod
+    def put(self, key: str, value: bytes) -> None:
+        pass
+
+    def put_many(self, entries: Iterable[Tuple[str, bytes]]) -> None:
+        self.write_batch(entries)
+
+    @abc.abstractmethod
+    def write_batch(
+        self, entries: Iterable[Tuple[str, Optional[bytes]]]
+    ) -> None:
+        """
+        Apply a batch of writes, in order. A value of None removes the key.
+        The batch is applied atomically: if applying it fails, or the process
+        dies midway, none of its writes take effect.
+        """
+        pass
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def keys(
+        self,
+        ns: Optional[str] = None,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Obtain the full keys within namespace `ns` whose key starts with
+        `prefix`, in ascending order. If `ns` is not specified, `prefix` is
+        matched against the full key. If `start_after` is specified, only
+        full keys greater than it are returned. At most `limit` keys are
+        returned, if specified.
+        """
+        pass
+
+    @abc.abstractmethod
+    def usage(self) -> StorageUsage:
+        pass
+
+    @abc.abstractmethod
+    def compact(self) -> Iterator[None]:
+        """
+        Reclaim the space left behind by removed and overwritten values.
+        Compaction proceeds one step per iteration, each step doing a bounded
+        amount of work; other operations may be issued between steps, but not
+        concurrently with one. Closing the iterator early abandons compaction.
+        """
+        pass
+
+    @abc.abstractmethod
+    def sync(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        pass
+
+
+def open_backend(path: Path, engine: DBMEngine) -> StorageBackend:
+    if engine == DBMEngine.GDBM:
+        from libstuff.dbm.gdbm import GDBMBackend
+
+        return GDBMBackend(path)
+    elif engine == DBMEngine.SQLITE:
+        from libstuff.dbm.sqlite import SQLiteBackend
+
+        return SQLiteBackend(path)
+
+    raise DBMError(f"unknown storage engine: {engine}")
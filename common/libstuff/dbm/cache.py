@@ -0,0 +1,159 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel, Field
+
+
+class ModelCacheConfig(BaseModel):
+    max_entries: int = Field(1024)
+    max_bytes: int = Field(64 * 1024 * 1024)
+
+
+class ModelCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_entries: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+
+_CacheKey = Tuple[str, Type[BaseModel]]
+
+
+class _CacheEntry:
+    value: BaseModel
+    size: int
+
+    def __init__(self, value: BaseModel, size: int) -> None:
+        self.value = value
+        self.size = size
+
+
+class ModelCache:
+    """
+    LRU cache of decoded models, keyed by full key and model type.
+
+    An entry's size is the size of the raw value it was decoded from; the
+    decoded model is larger in memory, but proportionally so. Cached models
+    are shared between readers and must be treated as read-only.
+
+    The cache may be used from several threads. Every invalidation bumps the
+    cache's generation; readers obtain the generation before reading from
+    storage and pass it to `put()`, which then refuses to cache values that
+    may have been invalidated while they were being read.
+    """
+
+    _config: ModelCacheConfig
+    _entries: OrderedDict[_CacheKey, _CacheEntry]
+    _by_key: Dict[str, Set[Type[BaseModel]]]
+    _bytes: int
+    _generation: int
+    _lock: threading.Lock
+
+    _hits: int
+    _misses: int
+    _evictions: int
+    _invalidations: int
+
+    def __init__(self, config: ModelCacheConfig) -> None:
+        self._config = config
+        self._entries = OrderedDict()
+        self._by_key = {}
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str, model: Type[BaseModel]) -> Optional[BaseModel]:
+        with self._lock:
+            entry = self._entries.get((key, model))
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end((key, model))
+            self._hits += 1
+            return entry.value
+
+    def put(
+        self,
+        key: str,
+        model: Type[BaseModel],
+        value: BaseModel,
+        size: int,
+        generation: int,
+    ) -> None:
+        if size > self._config.max_bytes or self._config.max_entries <= 0:
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._drop((key, model))
+            self._entries[(key, model)] = _CacheEntry(value, size)
+            self._by_key.setdefault(key, set()).add(model)
+            self._bytes += size
+
+            while (
+                len(self._entries) > self._config.max_entries
+                or self._bytes > self._config.max_bytes
+            ):
+                (k, m), _ = next(iter(self._entries.items()))
+                self._drop((k, m))
+                self._evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._generation += 1
+            models = self._by_key.get(key)
+            if models is None:
+                return
+            for model in list(models):
+                self._drop((key, model))
+                self._invalidations += 1
+
+    def _drop(self, ckey: _CacheKey) -> None:
+        entry = self._entries.pop(ckey, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        key, model = ckey
+        models = self._by_key[key]
+        models.discard(model)
+        if len(models) == 0:
+            del self._by_key[key]
+
+    @property
+    def stats(self) -> ModelCacheStats:
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> ModelCacheStats:
+        return ModelCacheStats(
+            entries=len(self._entries),
+            bytes=self._bytes,
+            max_entries=self._config.max_entries,
+            max_bytes=self._config.max_bytes,
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            invalidations=self._invalidations,
+        )
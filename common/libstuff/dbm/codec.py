@@ -0,0 +1,147 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+import datetime as dt
+import json
+import struct
+from enum import Enum
+from pathlib import PurePath
+from typing import Any, Type, TypeVar
+from uuid import UUID
+
+import msgpack
+from pydantic import BaseModel
+
+from libstuff.dbm.error import DBMError
+
+# Models encoded with msgpack are framed as
+#
+#   magic (2 bytes) | version (1 byte) | msgpack payload
+#
+# Values encoded as JSON, by the JSON codec or before there were codecs,
+# never start with a NUL byte, so both are told apart on read. The version
+# is bumped whenever the payload's layout changes; readers refuse versions
+# they don't know.
+_MAGIC = b"\x00M"
+_VERSION = 1
+_HEADER = struct.Struct("<2sB")
+
+# msgpack extension types. Datetimes are seconds and microseconds since the
+# epoch, followed by the UTC offset in seconds if the datetime is aware.
+_EXT_DATETIME = 1
+_EXT_DATE = 2
+_EXT_UUID = 3
+
+_EPOCH = dt.datetime(1970, 1, 1)
+_NAIVE = struct.Struct("<qI")
+_AWARE = struct.Struct("<qIi")
+_DATE = struct.Struct("<i")
+
+BM = TypeVar("BM", bound=BaseModel)
+
+
+class DBMCodec(str, Enum):
+    JSON = "json"
+    MSGPACK = "msgpack"
+
+
+def is_msgpack(raw: bytes) -> bool:
+    return raw[:2] == _MAGIC
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, dt.datetime):
+        offset = obj.utcoffset()
+        if offset is None:
+            delta = obj - _EPOCH
+        else:
+            delta = obj.replace(tzinfo=None) - offset - _EPOCH
+        secs = delta.days * 86400 + delta.seconds
+        if offset is None:
+            data = _NAIVE.pack(secs, delta.microseconds)
+        else:
+            data = _AWARE.pack(
+                secs, delta.microseconds, int(offset.total_seconds())
+            )
+        return msgpack.ExtType(_EXT_DATETIME, data)
+    elif isinstance(obj, dt.date):
+        return msgpack.ExtType(_EXT_DATE, _DATE.pack(obj.toordinal()))
+    elif isinstance(obj, UUID):
+        return msgpack.ExtType(_EXT_UUID, obj.bytes)
+    elif isinstance(obj, Enum):
+        return obj.value
+    elif isinstance(obj, (set, frozenset)):
+        return list(obj)
+    elif isinstance(obj, PurePath):
+        return str(obj)
+    elif isinstance(obj, dt.timedelta):
+        return obj.total_seconds()
+    raise TypeError(f"unable to encode type {type(obj)}")
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_DATETIME:
+        if len(data) == _NAIVE.size:
+            secs, usecs = _NAIVE.unpack(data)
+            return _EPOCH + dt.timedelta(seconds=secs, microseconds=usecs)
+        secs, usecs, offset = _AWARE.unpack(data)
+        tz = dt.timezone(dt.timedelta(seconds=offset))
+        utc = _EPOCH + dt.timedelta(seconds=secs, microseconds=usecs)
+        return utc.replace(tzinfo=dt.timezone.utc).astimezone(tz)
+    elif code == _EXT_DATE:
+        return dt.date.fromordinal(_DATE.unpack(data)[0])
+    elif code == _EXT_UUID:
+        return UUID(bytes=data)
+    return msgpack.ExtType(code, data)
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, (dt.datetime, dt.date)):
+        return obj.isoformat()
+    elif isinstance(obj, UUID):
+        return str(obj)
+    raise TypeError(f"unable to encode type {type(obj)}")
+
+
+def encode_model(value: BaseModel, codec: DBMCodec) -> bytes:
+    if codec == DBMCodec.JSON:
+        return value.json().encode("utf-8")
+    payload = msgpack.packb(value.dict(), default=_default)
+    return _HEADER.pack(_MAGIC, _VERSION) + payload
+
+
+def _unpack(key: str, raw: bytes) -> Any:
+    _, version = _HEADER.unpack_from(raw)
+    if version != _VERSION:
+        raise DBMError(f"unknown encoding version {version} for key '{key}'.")
+    try:
+        return msgpack.unpackb(
+            raw[_HEADER.size :], ext_hook=_ext_hook, strict_map_key=False
+        )
+    except (ValueError, msgpack.UnpackException) as e:
+        raise DBMError(f"unable to decode value for key '{key}': {e}")
+
+
+def decode_model(key: str, raw: bytes, model: Type[BM]) -> BM:
+    """
+    Decode `raw` as `model`, whichever codec it was encoded with. Datetimes
+    and UUIDs in msgpack values come back as such, so validating them
+    doesn't mean parsing strings.
+    """
+    if is_msgpack(raw):
+        return model.parse_obj(_unpack(key, raw))
+    return model.parse_raw(raw.decode("utf-8"))
+
+
+def decode_text(key: str, raw: bytes) -> str:
+    """
+    Obtain `raw` as text; models encoded with msgpack are returned as JSON,
+    like they would have been stored with the JSON codec.
+    """
+    if is_msgpack(raw):
+        return json.dumps(_unpack(key, raw), default=_json_default)
+    return raw.decode("utf-8")
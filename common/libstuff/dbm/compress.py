@@ -0,0 +1,196 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import zstandard as zstd
+from pydantic import BaseModel, Field
+
+from libstuff.dbm.error import DBMError
+
+# Compressed values are framed as
+#
+#   magic (2 bytes) | version (1 byte) | dict id (4 bytes, LE) | zstd frame
+#
+# where a dict id of 0 means no dictionary. Values written without
+# compression are JSON or plain strings, which never start with a NUL byte,
+# or msgpack-encoded models, whose own magic differs from ours.
+_MAGIC = b"\x00Z"
+_VERSION = 1
+_HEADER = struct.Struct("<2sBI")
+
+# trained dictionaries are kept at '<DICTIONARY_NS>/<ns>/<timestamp>'.
+DICTIONARY_NS = "dbm-zstd-dict"
+
+
+class CompressionConfig(BaseModel):
+    threshold: int = Field(1024)
+    level: int = Field(3)
+    namespaces: Optional[List[str]] = Field(None)
+
+
+class CompressionStats(BaseModel):
+    values_compressed: int = 0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+    values_decompressed: int = 0
+    decompress_ns: int = 0
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.raw_bytes - self.stored_bytes
+
+    @property
+    def avg_decompress_us(self) -> float:
+        if self.values_decompressed == 0:
+            return 0.0
+        return self.decompress_ns / self.values_decompressed / 1000
+
+
+def is_compressed(raw: bytes) -> bool:
+    return raw[:2] == _MAGIC
+
+
+def _namespace_of(key: str) -> str:
+    ns, sep, _ = key.partition("/")
+    return ns if len(sep) > 0 else ""
+
+
+class ValueCompressor:
+    """
+    Compresses values above a size threshold with zstd, optionally with a
+    per-namespace trained dictionary, and decompresses framed values back.
+
+    Compression only happens on DBM's writer thread. Decompression may run
+    on several reader threads, each with its own decompressors.
+    """
+
+    _config: CompressionConfig
+    _dicts: Dict[int, zstd.ZstdCompressionDict]
+    _ns_dict: Dict[str, int]
+    _compressors: Dict[int, zstd.ZstdCompressor]
+    _local: threading.local
+    _stats: Dict[str, CompressionStats]
+    _stats_lock: threading.Lock
+
+    def __init__(self, config: CompressionConfig) -> None:
+        self._config = config
+        self._dicts = {}
+        self._ns_dict = {}
+        self._compressors = {}
+        self._local = threading.local()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def add_dictionary(self, ns: str, dict_data: bytes) -> int:
+        """
+        Register a dictionary for namespace `ns`, to be used for values
+        written from now on. Returns the dictionary's id.
+        """
+        d = zstd.ZstdCompressionDict(dict_data)
+        dict_id = d.dict_id()
+        if dict_id == 0:
+            raise DBMError(f"invalid dictionary for namespace '{ns}'.")
+        self._dicts[dict_id] = d
+        self._ns_dict[ns] = dict_id
+        return dict_id
+
+    def _wants(self, ns: str, size: int) -> bool:
+        if size < self._config.threshold or ns == DICTIONARY_NS:
+            return False
+        namespaces = self._config.namespaces
+        return namespaces is None or ns in namespaces
+
+    def _compressor(self, dict_id: int) -> zstd.ZstdCompressor:
+        c = self._compressors.get(dict_id)
+        if c is None:
+            d = self._dicts.get(dict_id)
+            c = zstd.ZstdCompressor(level=self._config.level, dict_data=d)
+            self._compressors[dict_id] = c
+        return c
+
+    def _decompressor(self, dict_id: int) -> zstd.ZstdDecompressor:
+        decomps: Optional[Dict[int, zstd.ZstdDecompressor]] = getattr(
+            self._local, "decomps", None
+        )
+        if decomps is None:
+            decomps = {}
+            self._local.decomps = decomps
+        d = decomps.get(dict_id)
+        if d is None:
+            if dict_id != 0 and dict_id not in self._dicts:
+                raise DBMError(f"unknown compression dictionary {dict_id}.")
+            d = zstd.ZstdDecompressor(dict_data=self._dicts.get(dict_id))
+            decomps[dict_id] = d
+        return d
+
+    def _ns_stats(self, ns: str) -> CompressionStats:
+        stats = self._stats.get(ns)
+        if stats is None:
+            stats = CompressionStats()
+            self._stats[ns] = stats
+        return stats
+
+    def compress(self, key: str, raw: bytes) -> bytes:
+        ns = _namespace_of(key)
+        if not self._wants(ns, len(raw)):
+            return raw
+
+        dict_id = self._ns_dict.get(ns, 0)
+        frame = self._compressor(dict_id).compress(raw)
+        value = _HEADER.pack(_MAGIC, _VERSION, dict_id) + frame
+        if len(value) >= len(raw):
+            # not worth it.
+            return raw
+
+        with self._stats_lock:
+            stats = self._ns_stats(ns)
+            stats.values_compressed += 1
+            stats.raw_bytes += len(raw)
+            stats.stored_bytes += len(value)
+        return value
+
+    def decompress(self, key: str, value: bytes) -> bytes:
+        if not is_compressed(value):
+            return value
+
+        start = time.perf_counter_ns()
+        _, version, dict_id = _HEADER.unpack_from(value)
+        if version != _VERSION:
+            raise DBMError(
+                f"unknown compression version {version} for key '{key}'."
+            )
+        try:
+            raw = self._decompressor(dict_id).decompress(value[_HEADER.size :])
+        except zstd.ZstdError as e:
+            raise DBMError(f"unable to decompress value for key '{key}': {e}")
+
+        elapsed = time.perf_counter_ns() - start
+        with self._stats_lock:
+            stats = self._ns_stats(_namespace_of(key))
+            stats.values_decompressed += 1
+            stats.decompress_ns += elapsed
+        return raw
+
+    def train(self, samples: List[bytes], dict_size: int) -> bytes:
+        try:
+            d = zstd.train_dictionary(dict_size, samples)
+        except zstd.ZstdError as e:
+            raise DBMError(f"unable to train dictionary: {e}")
+        return d.as_bytes()
+
+    @property
+    def stats(self) -> Dict[str, CompressionStats]:
+        with self._stats_lock:
+            return {ns: s.copy() for ns, s in self._stats.items()}
+
+    @property
+    def dictionaries(self) -> List[Tuple[str, int]]:
+        return list(self._ns_dict.items())
@@ -0,0 +1,811 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# pyright: reportUnnecessaryIsInstance=false
+
+from __future__ import annotations
+import asyncio
+import datetime as dt
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from enum import Enum
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    AsyncGenerator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
+
+from pydantic import BaseModel, ValidationError
+
+from libstuff.dbm.backend import DBMEngine, StorageBackend, open_backend
+from libstuff.dbm.cache import ModelCache, ModelCacheConfig, ModelCacheStats
+from libstuff.dbm.codec import DBMCodec, decode_model, decode_text, encode_model
+from libstuff.dbm.compress import (
+    DICTIONARY_NS,
+    CompressionConfig,
+    CompressionStats,
+    ValueCompressor,
+)
+from libstuff.dbm.error import DBMError
+from libstuff.dbm.maintenance import (
+    CompactionConfig,
+    CompactionInfo,
+    StorageStats,
+    fragmentation,
+    needs_compaction,
+)
+
+BM = TypeVar("BM", bound=BaseModel)
+T = TypeVar("T")
+
+
+class DBMDurability(str, Enum):
+    """
+    When writes are flushed to stable storage.
+
+    SYNC: on every put and transaction commit.
+    PERIODIC: in the background, every `sync_interval` seconds, if needed.
+    NONE: whenever the storage engine decides to.
+    """
+
+    SYNC = "sync"
+    PERIODIC = "periodic"
+    NONE = "none"
+
+
+class DBM:
+
+    _path: Path
+    _engine: DBMEngine
+    _lock: asyncio.Lock
+    _db: StorageBackend
+    _cache: Optional[ModelCache]
+    _compressor: Optional[ValueCompressor]
+    _codec: DBMCodec
+    _durability: DBMDurability
+    _sync_interval: float
+    _is_dirty: bool
+    _sync_task: Optional[asyncio.Task[None]]
+    _is_closed: bool
+    _writer: ThreadPoolExecutor
+    _readers: Optional[ThreadPoolExecutor]
+    _compaction: Optional[CompactionConfig]
+    _maintenance_task: Optional[asyncio.Task[None]]
+    _compacting: bool
+    _last_compaction: Optional[CompactionInfo]
+    logger: logging.Logger
+
+    class Transaction:
+        """
+        Writes are buffered in memory, visible to this transaction's reads,
+        and applied in one batch when the transaction finishes. Should the
+        transaction's body raise, its writes are discarded.
+        """
+
+        _dbm: DBM
+        _writes: Dict[str, Optional[Union[str, bytes, BaseModel]]]
+        durability: DBMDurability
+
+        def __init__(self, dbm: DBM, durability: DBMDurability):
+            self._dbm = dbm
+            self._writes = {}
+            self.durability = durability
+
+        def get(
+            self,
+            *,
+            ns: Optional[str] = None,
+            key: str,
+        ) -> Optional[str]:
+            _key = self._dbm._get_key(ns, key)
+            if _key in self._writes:
+                value = self._writes[_key]
+                if value is None:
+                    return None
+                return decode_text(_key, self._dbm._encode(value))
+            return self._dbm._get(ns, key)
+
+        def get_model(
+            self, *, ns: Optional[str] = None, key: str, model: Type[BaseModel]
+        ) -> Optional[BaseModel]:
+            _key = self._dbm._get_key(ns, key)
+            if _key in self._writes:
+                value = self._writes[_key]
+                if value is None:
+                    return None
+                raw = self._dbm._encode(value)
+                return self._dbm._decode_model(_key, raw, model)
+            return self._dbm._get_model(ns, key, model)
+
+        def put(
+            self,
+            ns: Optional[str],
+            key: str,
+            value: Union[str, bytes, BaseModel],
+        ) -> bool:
+            _key = self._dbm._get_key(ns, key)
+            if not isinstance(value, (str, bytes, BaseModel)):
+                raise DBMError(f"invalid type on put: {type(value)}")
+            # encoded on commit, off the event loop.
+            self._writes[_key] = value
+            return True
+
+        def rm(self, ns: Optional[str], key: str) -> bool:
+            existed = self.exists(ns, key)
+            self._writes[self._dbm._get_key(ns, key)] = None
+            return existed
+
+        def exists(self, ns: Optional[str], key: str) -> bool:
+            _key = self._dbm._get_key(ns, key)
+            if _key in self._writes:
+                return self._writes[_key] is not None
+            return self._dbm._exists(ns, key)
+
+        @property
+        def writes(self) -> Dict[str, Optional[Union[str, bytes, BaseModel]]]:
+            return self._writes
+
+    def __init__(
+        self,
+        path: Path,
+        engine: DBMEngine = DBMEngine.GDBM,
+        *,
+        cache: Optional[ModelCacheConfig] = None,
+        compression: Optional[CompressionConfig] = None,
+        durability: DBMDurability = DBMDurability.NONE,
+        sync_interval: float = 5.0,
+        readers: int = 4,
+        compaction: Optional[CompactionConfig] = None,
+        codec: DBMCodec = DBMCodec.MSGPACK,
+        logger: logging.Logger = logging.getLogger(),
+    ) -> None:
+        """
+        Open the database at `path`, using storage engine `engine`. If `cache`
+        is specified, models decoded by `get_model()` and `entries()` are kept
+        in an LRU cache bounded by `cache`; cached models are shared between
+        callers and must not be modified. If `compression` is specified,
+        values above its threshold are stored zstd-compressed; compressed and
+        uncompressed values are read back transparently, so compression can
+        be enabled on an existing database. `durability` is the default for
+        puts and transactions; see `DBMDurability`.
+
+        Storage is accessed from a dedicated writer thread, keeping blocking
+        I/O off the event loop. If the engine allows concurrent reads, reads
+        run on up to `readers` reader threads instead, without waiting for
+        the lock; a read concurrent with a write sees either its before or
+        its after.
+
+        If `compaction` is specified, a background task checks the storage's
+        fragmentation periodically and compacts it when needed; see
+        `compact()`.
+
+        Models are written encoded with `codec`. Reads handle values written
+        with any codec, so switching codecs on an existing database is fine;
+        values are re-encoded as they are next written.
+        """
+        # what `__del__` needs, set first in case opening fails.
+        self._is_closed = True
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="dbm-writer"
+        )
+        self._readers = None
+
+        self._path = path.resolve()
+        self._engine = engine
+        self._lock = asyncio.Lock()
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        if self._path.exists() and not self._path.is_file():
+            raise DBMError(
+                f"path '{self._path}' already exists and is not a file."
+            )
+
+        self._db = open_backend(self._path, engine)
+        self._is_closed = False
+        self._cache = None if cache is None else ModelCache(cache)
+        self._compressor = None
+        if compression is not None:
+            self._compressor = ValueCompressor(compression)
+            self._load_dictionaries()
+        self._codec = codec
+        self._durability = durability
+        self._sync_interval = sync_interval
+        self._is_dirty = False
+        self._sync_task = None
+
+        if self._db.concurrent_reads:
+            self._readers = ThreadPoolExecutor(
+                max_workers=readers, thread_name_prefix="dbm-reader"
+            )
+
+        self._compaction = compaction
+        self._maintenance_task = None
+        self._compacting = False
+        self._last_compaction = None
+        self.logger = logger
+
+    def __del__(self) -> None:
+        if not self._is_closed:
+            self._db.close()
+        self._writer.shutdown(wait=False)
+        if self._readers is not None:
+            self._readers.shutdown(wait=False)
+
+    async def close(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+            self._maintenance_task = None
+        async with self._lock:
+            if self._is_closed:
+                return
+            await self._submit(self._writer, self._close)
+            self._is_closed = True
+
+        self._writer.shutdown()
+        if self._readers is not None:
+            self._readers.shutdown()
+
+    def _close(self) -> None:
+        self._db.sync()
+        self._db.close()
+
+    async def _submit(
+        self, executor: ThreadPoolExecutor, fn: Callable[..., T], *args: Any
+    ) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(fn, *args))
+
+    async def _run_exclusive(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Run `fn` on the writer thread, holding the lock. Writes are thus
+        applied one at a time, in the order they were issued.
+        """
+        async with self._lock:
+            res = await self._submit(self._writer, fn, *args)
+        self._maybe_start_tasks()
+        return res
+
+    async def _run_shared(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Run `fn` on a reader thread if the storage engine allows concurrent
+        reads, otherwise on the writer thread after any pending writes.
+        """
+        if self._readers is None:
+            return await self._run_exclusive(fn, *args)
+        return await self._submit(self._readers, fn, *args)
+
+    def _written(self, durability: DBMDurability) -> None:
+        if durability == DBMDurability.SYNC:
+            self._db.sync()
+        elif durability == DBMDurability.PERIODIC:
+            self._is_dirty = True
+
+    def _maybe_start_tasks(self) -> None:
+        """
+        Start background tasks once we know we're running on an event loop,
+        as we may not be when constructed.
+        """
+        if self._is_dirty and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_task_fn())
+        if self._compaction is not None and self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(
+                self._maintenance_task_fn(self._compaction)
+            )
+
+    async def _sync_task_fn(self) -> None:
+        while True:
+            await asyncio.sleep(self._sync_interval)
+            async with self._lock:
+                if self._is_dirty and not self._is_closed:
+                    self._is_dirty = False
+                    await self._submit(self._writer, self._db.sync)
+
+    async def _maintenance_task_fn(self, config: CompactionConfig) -> None:
+        while True:
+            await asyncio.sleep(config.interval)
+            if self._compacting:
+                continue
+            try:
+                usage = await self._run_shared(self._db.usage)
+                if not needs_compaction(usage, config):
+                    continue
+                self.logger.info(
+                    f"compacting database at '{self._path}': "
+                    f"{usage.free_bytes} of {usage.file_bytes} bytes free"
+                )
+                info = await self.compact()
+                self.logger.info(
+                    f"compacted database at '{self._path}' in "
+                    f"{info.duration:.2f}s: {info.file_bytes_before} -> "
+                    f"{info.file_bytes_after} bytes"
+                )
+            except (DBMError, OSError) as e:
+                self.logger.error(f"error maintaining database: {e}")
+
+    async def storage_stats(self) -> StorageStats:
+        """Obtain the storage's space usage, overall and per namespace."""
+        usage = await self._run_shared(self._db.usage)
+        return StorageStats(
+            engine=self._engine,
+            usage=usage,
+            fragmentation=fragmentation(usage),
+            compacting=self._compacting,
+            last_compaction=self._last_compaction,
+        )
+
+    async def compact(self) -> CompactionInfo:
+        """
+        Compact the storage, reclaiming the space left behind by removed and
+        overwritten values. Compaction runs in steps on the writer thread,
+        releasing the lock between steps, so other operations wait for at
+        most one step at a time.
+        """
+        if self._compacting:
+            raise DBMError("compaction already in progress.")
+        self._compacting = True
+        try:
+            started = dt.datetime.now()
+            t_start = time.monotonic()
+            before = await self._run_shared(self._db.usage)
+
+            steps = self._db.compact()
+            done = False
+            try:
+                while not done:
+                    async with self._lock:
+                        if self._is_closed:
+                            raise DBMError("database is closed.")
+                        done = await self._submit(
+                            self._writer, self._compact_step, steps
+                        )
+            finally:
+                if not done and not self._is_closed:
+                    async with self._lock:
+                        await self._submit(self._writer, steps.close)
+
+            after = await self._run_shared(self._db.usage)
+            self._last_compaction = CompactionInfo(
+                started=started,
+                duration=time.monotonic() - t_start,
+                file_bytes_before=before.file_bytes,
+                file_bytes_after=after.file_bytes,
+            )
+            return self._last_compaction
+        finally:
+            self._compacting = False
+
+    def _compact_step(self, steps: Iterator[None]) -> bool:
+        """Run the next compaction step; returns True once done."""
+        try:
+            next(steps)
+        except StopIteration:
+            return True
+        return False
+
+    def _load_dictionaries(self) -> None:
+        assert self._compressor is not None
+        # keys are '<ns>/<timestamp>', so the newest dictionary for a
+        # namespace is registered last.
+        for key in self._db.keys(DICTIONARY_NS):
+            raw = self._db.get(key)
+            if raw is None:
+                continue
+            ns = key[len(DICTIONARY_NS) + 1 :].rpartition("/")[0]
+            self._compressor.add_dictionary(ns, raw)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        value = self._db.get(key)
+        if value is None or self._compressor is None:
+            return value
+        return self._compressor.decompress(key, value)
+
+    def _write(self, key: str, raw: bytes) -> None:
+        if self._compressor is not None:
+            raw = self._compressor.compress(key, raw)
+        self._db.put(key, raw)
+
+    def _get_key(self, ns: Optional[str], key: str) -> str:
+        _ns = None if ns is None else ns.strip()
+        if _ns is not None and len(_ns) == 0:
+            raise DBMError("invalid namespace: can't be empty string.")
+
+        _key = key.strip()
+        if len(_key) == 0:
+            raise DBMError("invalid key: can't be empty string.")
+
+        return _key if _ns is None else f"{_ns}/{_key}"
+
+    async def put(
+        self,
+        *,
+        ns: Optional[str] = None,
+        key: str,
+        value: Union[str, bytes, BaseModel],
+    ) -> bool:
+        return await self._run_exclusive(self._put, ns, key, value)
+
+    def _encode(self, value: Union[str, bytes, BaseModel]) -> bytes:
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        elif isinstance(value, bytes):
+            return value
+        elif isinstance(value, BaseModel):
+            return encode_model(value, self._codec)
+        raise DBMError(f"invalid type on put: {type(value)}")
+
+    def _put(
+        self, ns: Optional[str], key: str, value: Union[str, bytes, BaseModel]
+    ) -> bool:
+        _key = self._get_key(ns, key)
+        raw = self._encode(value)
+        self._write(_key, raw)
+        if self._cache is not None:
+            self._cache.invalidate(_key)
+        self._written(self._durability)
+        return True
+
+    async def get_model(
+        self, *, ns: Optional[str] = None, key: str, model: Type[BM]
+    ) -> Optional[BM]:
+        if self._cache is not None:
+            # avoid a trip to the executor if we have it.
+            cached = self._cache.get(self._get_key(ns, key), model)
+            if cached is not None:
+                return cast(BM, cached)
+        return await self._run_shared(
+            partial(self._get_model, checked=True), ns, key, model
+        )
+
+    async def get(
+        self,
+        *,
+        ns: Optional[str] = None,
+        key: str,
+    ) -> Optional[str]:
+        return await self._run_shared(self._get, ns, key)
+
+    def _get_model(
+        self,
+        ns: Optional[str],
+        key: str,
+        model: Type[BM],
+        *,
+        checked: bool = False,
+    ) -> Optional[BM]:
+        """
+        Read `key` as `model`, from the cache if there. If `checked`, the
+        caller missed the cache already, and it's not looked up again, so
+        each read counts once in its stats.
+        """
+        _key = self._get_key(ns, key)
+        generation = 0
+        if self._cache is not None:
+            generation = self._cache.generation
+            if not checked:
+                cached = self._cache.get(_key, model)
+                if cached is not None:
+                    return cast(BM, cached)
+
+        raw = self._read(_key)
+        if raw is None:
+            return None
+
+        return self._decode_model(_key, raw, model, generation=generation)
+
+    def _decode_model(
+        self,
+        key: str,
+        raw: bytes,
+        model: Type[BM],
+        *,
+        generation: Optional[int] = None,
+    ) -> BM:
+        """
+        Decode `raw` as `model`. The result is cached if `generation`, the
+        cache's generation before `raw` was read, is specified.
+        """
+        try:
+            value = decode_model(key, raw, model)
+        except ValidationError:
+            raise DBMError(
+                f"unable to parse value for key '{key}' as '{type(model)}."
+            )
+        if generation is not None and self._cache is not None:
+            self._cache.put(key, model, value, len(raw), generation)
+        return value
+
+    def _get(self, ns: Optional[str], key: str) -> Optional[str]:
+        _key = self._get_key(ns, key)
+        raw = self._read(_key)
+        if raw is None:
+            return None
+
+        return decode_text(_key, raw)
+
+    async def rm(self, ns: Optional[str], key: str) -> bool:
+        return await self._run_exclusive(self._rm, ns, key)
+
+    def _rm(self, ns: Optional[str], key: str) -> bool:
+        _key = self._get_key(ns, key)
+        removed = self._db.delete(_key)
+        if self._cache is not None:
+            self._cache.invalidate(_key)
+        if removed:
+            self._written(self._durability)
+        return removed
+
+    async def exists(self, *, ns: Optional[str] = None, key: str) -> bool:
+        return await self._run_shared(self._exists, ns, key)
+
+    def _exists(self, ns: Optional[str], key: str) -> bool:
+        _key = self._get_key(ns, key)
+        return self._db.exists(_key)
+
+    async def entries(
+        self,
+        *,
+        ns: Optional[str] = None,
+        prefix: Optional[str] = None,
+        model: Type[BM | str] = str,
+    ) -> Dict[str, Type[BM] | str]:
+
+        _ns, _prefix = self._check_scan_args(ns, prefix)
+        return await self._run_shared(self._entries, _ns, _prefix, model)
+
+    def _check_scan_args(
+        self, ns: Optional[str], prefix: Optional[str]
+    ) -> Tuple[Optional[str], str]:
+        _ns: Optional[str] = None
+        if ns is not None:
+            _ns = ns.strip()
+            if len(_ns) == 0:
+                raise DBMError("invalid namespace: empty string.")
+
+        _prefix: str = ""
+        if prefix is not None:
+            _prefix = prefix.strip()
+            if len(_prefix) == 0:
+                raise DBMError("invalid prefix: empty string.")
+
+        return _ns, _prefix
+
+    def _entries(
+        self,
+        _ns: Optional[str],
+        _prefix: str,
+        model: Type[BM | str],
+    ) -> Dict[str, Type[BM] | str]:
+
+        results_model: Dict[str, model] = {}
+
+        generation = 0
+        if self._cache is not None:
+            generation = self._cache.generation
+
+        for _key in self._db.keys(_ns, _prefix):
+            _key_entry = _key
+            if _ns is not None:
+                _key_entry = _key[len(_ns) + 1 :]
+            if len(_key_entry) == 0:
+                raise DBMError(f"empty key found: '{_key}' (namespace: {_ns})")
+
+            value = self._read_entry(_key, model, generation)
+            if value is None:
+                # removed since we listed the keys.
+                continue
+            results_model[_key_entry] = value
+
+        return results_model  # type: ignore
+
+    async def scan(
+        self,
+        *,
+        ns: Optional[str] = None,
+        prefix: Optional[str] = None,
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+        model: Type[BM | str] = str,
+        keys_only: bool = False,
+        page_size: int = 100,
+    ) -> AsyncIterator[Tuple[str, Optional[BM | str]]]:
+        """
+        Iterate over the entries in namespace `ns` whose key starts with
+        `prefix`, in ascending key order, yielding `(key, value)` tuples.
+        Values are decoded as `model`, unless `keys_only` is set, in which
+        case values are not read and None is yielded instead.
+
+        Entries are read `page_size` at a time, without holding on to the
+        previous pages. Iteration starts after key `start_after`, if
+        specified, so passing the last key seen resumes an earlier scan.
+        At most `limit` entries are yielded, if specified.
+        """
+        _ns, _prefix = self._check_scan_args(ns, prefix)
+        if page_size <= 0:
+            raise DBMError("invalid page size: must be positive.")
+
+        cursor: Optional[str] = None
+        if start_after is not None:
+            cursor = start_after if _ns is None else f"{_ns}/{start_after}"
+
+        remaining = limit
+        while remaining is None or remaining > 0:
+            n = page_size if remaining is None else min(page_size, remaining)
+            keys, page = await self._run_shared(
+                self._scan_page, _ns, _prefix, cursor, n, model, keys_only
+            )
+            for entry in page:
+                yield entry
+            if remaining is not None:
+                remaining -= len(page)
+            if len(keys) < n:
+                break
+            cursor = keys[-1]
+
+    def _scan_page(
+        self,
+        _ns: Optional[str],
+        _prefix: str,
+        start_after: Optional[str],
+        limit: int,
+        model: Type[BM | str],
+        keys_only: bool,
+    ) -> Tuple[List[str], List[Tuple[str, Optional[BM | str]]]]:
+        """
+        Obtain up to `limit` keys after `start_after`, and their entries.
+        Keys removed in the meantime have no entry.
+        """
+        keys = self._db.keys(_ns, _prefix, start_after, limit)
+        page: List[Tuple[str, Optional[BM | str]]] = []
+
+        generation = 0
+        if self._cache is not None:
+            generation = self._cache.generation
+
+        for _key in keys:
+            _key_entry = _key if _ns is None else _key[len(_ns) + 1 :]
+            if keys_only:
+                page.append((_key_entry, None))
+                continue
+            value = self._read_entry(_key, model, generation)
+            if value is not None:
+                page.append((_key_entry, value))
+
+        return keys, page
+
+    def _read_entry(
+        self, _key: str, model: Type[BM | str], generation: int
+    ) -> Optional[BM | str]:
+        if issubclass(model, BaseModel):
+            if self._cache is not None:
+                cached = self._cache.get(_key, model)
+                if cached is not None:
+                    return cast(BM, cached)
+
+            raw = self._read(_key)
+            if raw is None:
+                return None
+            return self._decode_model(
+                _key, raw, model, generation=generation  # type: ignore
+            )
+
+        raw = self._read(_key)
+        return None if raw is None else decode_text(_key, raw)
+
+    @property
+    def cache_stats(self) -> Optional[ModelCacheStats]:
+        return None if self._cache is None else self._cache.stats
+
+    @property
+    def compression_stats(self) -> Optional[Dict[str, CompressionStats]]:
+        """
+        Per-namespace compression statistics, for values written and read
+        since the database was opened.
+        """
+        if self._compressor is None:
+            return None
+        return self._compressor.stats
+
+    async def train_dictionary(
+        self,
+        ns: str,
+        *,
+        max_samples: int = 1000,
+        dict_size: int = 112640,
+    ) -> int:
+        """
+        Train a compression dictionary from up to `max_samples` values in
+        namespace `ns`, to be used for values written to `ns` from now on.
+        Values compressed with earlier dictionaries remain readable. Returns
+        the dictionary's id.
+        """
+        if self._compressor is None:
+            raise DBMError("compression is not enabled.")
+        return await self._run_exclusive(
+            self._train_dictionary, ns, max_samples, dict_size
+        )
+
+    def _train_dictionary(
+        self, ns: str, max_samples: int, dict_size: int
+    ) -> int:
+        assert self._compressor is not None
+        keys = self._db.keys(ns)
+        if len(keys) > max_samples:
+            keys = random.sample(keys, max_samples)
+
+        samples: List[bytes] = []
+        for key in keys:
+            raw = self._read(key)
+            if raw is not None:
+                samples.append(raw)
+
+        dict_data = self._compressor.train(samples, dict_size)
+        dict_id = self._compressor.add_dictionary(ns, dict_data)
+        self._db.put(f"{DICTIONARY_NS}/{ns}/{time.time_ns():020d}", dict_data)
+        self._written(self._durability)
+        return dict_id
+
+    def _commit(self, tx: Transaction) -> None:
+        writes = tx.writes
+        if len(writes) == 0:
+            return
+
+        batch: List[Tuple[str, Optional[bytes]]] = []
+        for key, value in writes.items():
+            if value is None:
+                batch.append((key, None))
+                continue
+            raw = self._encode(value)
+            if self._compressor is not None:
+                raw = self._compressor.compress(key, raw)
+            batch.append((key, raw))
+
+        self._db.write_batch(batch)
+        if self._cache is not None:
+            for key in writes.keys():
+                self._cache.invalidate(key)
+        self._written(tx.durability)
+
+    @asynccontextmanager
+    async def transaction(
+        self, durability: Optional[DBMDurability] = None
+    ) -> AsyncGenerator[Transaction, None]:
+        """
+        Obtain a transaction, holding the database's lock until it finishes.
+        Its writes are applied atomically on exit, with `durability`, or the
+        database's default if not specified.
+
+        Reads within the transaction run inline, on the calling thread; keep
+        them to point lookups.
+        """
+        _durability = durability if durability is not None else self._durability
+        async with self._lock:
+            tx = self.Transaction(self, _durability)
+            yield tx
+            await self._submit(self._writer, self._commit, tx)
+        self._maybe_start_tasks()
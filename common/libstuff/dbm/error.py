@@ -0,0 +1,22 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+from typing import Optional
+
+
+class DBMError(Exception):
+    _msg: str
+
+    def __init__(self, msg: Optional[str] = None) -> None:
+        self._msg = msg if msg is not None else ""
+
+    def __str__(self) -> str:
+        return self._msg
+
+    @property
+    def msg(self) -> str:
+        return self._msg
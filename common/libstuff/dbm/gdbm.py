@@ -0,0 +1,318 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+import bisect
+import heapq
+import itertools
+import os
+import dbm.gnu as dbm
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import msgpack
+
+from libstuff.dbm.backend import (
+    NamespaceUsage,
+    StorageBackend,
+    StorageUsage,
+    namespace_of,
+)
+
+
+class KeyIndex:
+    """
+    Sorted in-memory index of the database's keys, grouped by namespace.
+
+    gdbm keeps its keys in hash order, so finding the keys belonging to a
+    namespace, or matching a prefix, means walking the whole database. We
+    keep the keys sorted per namespace instead, so a namespace or prefix
+    lookup is a binary search followed by a walk over the matching keys only.
+    Keys without a namespace are kept under the empty namespace.
+    """
+
+    _by_ns: Dict[str, List[str]]
+
+    def __init__(self) -> None:
+        self._by_ns = {}
+
+    def __len__(self) -> int:
+        return sum(len(lst) for lst in self._by_ns.values())
+
+    @staticmethod
+    def _split(key: str) -> Tuple[str, str]:
+        ns, sep, rest = key.partition("/")
+        if len(sep) == 0:
+            return "", key
+        return ns, rest
+
+    def add(self, key: str) -> None:
+        ns, k = self._split(key)
+        lst = self._by_ns.setdefault(ns, [])
+        idx = bisect.bisect_left(lst, k)
+        if idx < len(lst) and lst[idx] == k:
+            return
+        lst.insert(idx, k)
+
+    def remove(self, key: str) -> None:
+        ns, k = self._split(key)
+        lst = self._by_ns.get(ns)
+        if lst is None:
+            return
+        idx = bisect.bisect_left(lst, k)
+        if idx < len(lst) and lst[idx] == k:
+            del lst[idx]
+            if len(lst) == 0:
+                del self._by_ns[ns]
+
+    def _range(
+        self, ns: str, prefix: str, start_after: Optional[str]
+    ) -> Iterator[str]:
+        lst = self._by_ns.get(ns)
+        if lst is None:
+            return
+        idx = bisect.bisect_left(lst, prefix)
+
+        if start_after is not None:
+            after: Optional[str] = start_after
+            if len(ns) > 0:
+                head = f"{ns}/"
+                if start_after.startswith(head):
+                    after = start_after[len(head) :]
+                elif start_after < head:
+                    after = None
+                else:
+                    return
+            if after is not None:
+                idx = max(idx, bisect.bisect_right(lst, after))
+
+        while idx < len(lst):
+            k = lst[idx]
+            if not k.startswith(prefix):
+                break
+            yield k if len(ns) == 0 else f"{ns}/{k}"
+            idx += 1
+
+    def keys(
+        self,
+        ns: Optional[str] = None,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Obtain the full keys within namespace `ns` whose key starts with
+        `prefix`, in ascending order. If `ns` is not specified, `prefix` is
+        matched against the full key, and keys from every namespace are
+        considered. Only keys after the full key `start_after` are returned,
+        up to `limit` keys.
+        """
+        it: Iterator[str]
+        if ns is not None:
+            it = self._range(ns, prefix, start_after)
+        else:
+            head, sep, rest = prefix.partition("/")
+            if len(sep) > 0:
+                it = self._range(head, rest, start_after)
+            else:
+                ranges: List[Iterator[str]] = [
+                    self._range("", prefix, start_after)
+                ]
+                for name in self._by_ns.keys():
+                    if len(name) == 0 or not name.startswith(prefix):
+                        continue
+                    ranges.append(self._range(name, "", start_after))
+                it = heapq.merge(*ranges)
+
+        return list(itertools.islice(it, limit))
+
+
+class GDBMBackend(StorageBackend):
+    """
+    gdbm storage. gdbm has no ordered iteration, so we keep a `KeyIndex`
+    alongside it to serve namespace and prefix scans.
+
+    gdbm never returns space to the filesystem; `reorganize()` would, but it
+    rewrites the database in one go, blocking every other operation until
+    it's done. We compact by copying the live entries to a new file a batch
+    at a time instead, mirroring writes to it meanwhile, and then replacing
+    the database with it.
+
+    gdbm has no transactions either. Before applying a batch of writes we
+    store, and sync, an undo record with the batch's keys' prior values; it
+    is removed once the batch is applied. Should applying the batch fail
+    the record is replayed right away, and should the process die midway,
+    when the database is next opened.
+    """
+
+    COMPACT_BATCH = 1000
+    # no `DBM` key starts with a NUL, nor is indexed or compacted.
+    UNDO_KEY = "\x00undo"
+
+    _db: "dbm._gdbm"  # type: ignore
+    _index: KeyIndex
+    _usage: Dict[str, NamespaceUsage]
+    _shadow: Optional[Any]
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._db = dbm.open(path.as_posix(), "c")
+        self._index = KeyIndex()
+        self._usage = {}
+        self._shadow = None
+        self._build_index()
+        if self.UNDO_KEY in self._db:
+            # a batch was interrupted.
+            self._undo(msgpack.unpackb(self._db[self.UNDO_KEY]))
+            del self._db[self.UNDO_KEY]
+            self._db.sync()
+
+    def _build_index(self) -> None:
+        k = self._db.firstkey()
+        while k is not None:
+            key = k.decode("utf-8")
+            if key != self.UNDO_KEY:
+                self._index.add(key)
+                self._account(key, 0, len(k) + len(self._db[k]))
+            k = self._db.nextkey(k)
+
+    def _account(self, key: str, old: int, new: int) -> None:
+        """Account for `key`'s stored size going from `old` to `new`."""
+        ns = namespace_of(key)
+        usage = self._usage.setdefault(ns, NamespaceUsage())
+        usage.live_bytes += new - old
+        usage.keys += int(new > 0) - int(old > 0)
+        if usage.keys == 0:
+            del self._usage[ns]
+
+    def _stored_size(self, key: str) -> int:
+        if key not in self._db:
+            return 0
+        return len(key.encode("utf-8")) + len(self._db[key])
+
+    def get(self, key: str) -> Optional[bytes]:
+        if key not in self._db:
+            return None
+        return self._db[key]
+
+    def put(self, key: str, value: bytes) -> None:
+        old = self._stored_size(key)
+        self._db[key] = value
+        if self._shadow is not None:
+            self._shadow[key] = value
+        self._index.add(key)
+        self._account(key, old, len(key.encode("utf-8")) + len(value))
+
+    def put_many(self, entries: Iterable[Tuple[str, bytes]]) -> None:
+        # bulk loads, e.g. migrations, go without an undo record.
+        for key, value in entries:
+            self.put(key, value)
+
+    def write_batch(
+        self, entries: Iterable[Tuple[str, Optional[bytes]]]
+    ) -> None:
+        batch = list(entries)
+        if len(batch) <= 1:
+            # a single write is as atomic as gdbm gets.
+            for key, value in batch:
+                self._write(key, value)
+            return
+
+        undo = [[key, self.get(key)] for key, _ in batch]
+        self._db[self.UNDO_KEY] = msgpack.packb(undo)
+        self._db.sync()
+        try:
+            for key, value in batch:
+                self._write(key, value)
+        except BaseException:
+            # if undoing fails too, the record is left for `__init__`.
+            self._undo(undo)
+            del self._db[self.UNDO_KEY]
+            raise
+        del self._db[self.UNDO_KEY]
+
+    def _write(self, key: str, value: Optional[bytes]) -> None:
+        if value is None:
+            self.delete(key)
+        else:
+            self.put(key, value)
+
+    def _undo(self, undo: List[List[Any]]) -> None:
+        """Restore prior values, last first, in case a key repeats."""
+        for key, value in reversed(undo):
+            self._write(key, value)
+
+    def delete(self, key: str) -> bool:
+        old = self._stored_size(key)
+        if old == 0:
+            return False
+        del self._db[key]
+        if self._shadow is not None and key in self._shadow:
+            del self._shadow[key]
+        self._index.remove(key)
+        self._account(key, old, 0)
+        return True
+
+    def exists(self, key: str) -> bool:
+        return key in self._db
+
+    def keys(
+        self,
+        ns: Optional[str] = None,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        return self._index.keys(ns, prefix, start_after, limit)
+
+    def usage(self) -> StorageUsage:
+        file_bytes = os.stat(self._path).st_size
+        live_bytes = sum(u.live_bytes for u in self._usage.values())
+        return StorageUsage(
+            file_bytes=file_bytes,
+            live_bytes=live_bytes,
+            # gdbm keeps a hash directory and buckets besides the entries, so
+            # this overestimates what compaction reclaims, by little.
+            free_bytes=max(0, file_bytes - live_bytes),
+            namespaces={k: v.copy() for k, v in self._usage.items()},
+        )
+
+    def compact(self) -> Iterator[None]:
+        tmp = self._path.with_name(f"{self._path.name}.compact")
+        tmp.unlink(missing_ok=True)
+        self._shadow = dbm.open(tmp.as_posix(), "n")
+        try:
+            after: Optional[str] = None
+            while True:
+                keys = self._index.keys(
+                    start_after=after, limit=self.COMPACT_BATCH
+                )
+                for key in keys:
+                    self._shadow[key] = self._db[key]
+                if len(keys) < self.COMPACT_BATCH:
+                    break
+                after = keys[-1]
+                yield
+
+            self._shadow.sync()
+            os.replace(tmp, self._path)
+            self._db.close()
+            self._db = self._shadow
+        except BaseException:
+            self._shadow.close()
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            self._shadow = None
+
+    def sync(self) -> None:
+        self._db.sync()
+
+    def close(self) -> None:
+        if self._shadow is not None:
+            self._shadow.close()
+            self._shadow = None
+        self._db.close()
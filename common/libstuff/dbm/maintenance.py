@@ -0,0 +1,53 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+import datetime as dt
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from libstuff.dbm.backend import DBMEngine, StorageUsage
+
+
+class CompactionConfig(BaseModel):
+    """
+    Every `interval` seconds, the database is compacted if at least
+    `threshold` of its file is free space, and that's at least
+    `min_free_bytes`.
+    """
+
+    interval: float = Field(600.0)
+    threshold: float = Field(0.5)
+    min_free_bytes: int = Field(16 * 1024 * 1024)
+
+
+class CompactionInfo(BaseModel):
+    started: dt.datetime
+    duration: float
+    file_bytes_before: int
+    file_bytes_after: int
+
+
+class StorageStats(BaseModel):
+    engine: DBMEngine
+    usage: StorageUsage
+    fragmentation: float
+    compacting: bool
+    last_compaction: Optional[CompactionInfo]
+
+
+def fragmentation(usage: StorageUsage) -> float:
+    if usage.file_bytes == 0:
+        return 0.0
+    return usage.free_bytes / usage.file_bytes
+
+
+def needs_compaction(usage: StorageUsage, config: CompactionConfig) -> bool:
+    return (
+        usage.free_bytes >= config.min_free_bytes
+        and fragmentation(usage) >= config.threshold
+    )
@@ -0,0 +1,52 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+from typing import Callable, List, Optional, Tuple
+
+from libstuff.dbm.backend import StorageBackend
+
+MigrateProgressCB = Callable[[int, int], None]
+
+
+def migrate(
+    src: StorageBackend,
+    dst: StorageBackend,
+    *,
+    batch_size: int = 1000,
+    progress_cb: Optional[MigrateProgressCB] = None,
+) -> int:
+    """
+    Copy every key from `src` to `dst`, in batches of `batch_size` keys.
+    Existing keys in `dst` are overwritten. Returns the number of keys
+    copied.
+    """
+    keys = src.keys()
+    total = len(keys)
+    batch: List[Tuple[str, bytes]] = []
+    copied = 0
+
+    for key in keys:
+        value = src.get(key)
+        if value is None:
+            # removed while we were copying.
+            continue
+        batch.append((key, value))
+        if len(batch) >= batch_size:
+            dst.put_many(batch)
+            copied += len(batch)
+            batch = []
+            if progress_cb is not None:
+                progress_cb(total, copied)
+
+    if len(batch) > 0:
+        dst.put_many(batch)
+        copied += len(batch)
+        if progress_cb is not None:
+            progress_cb(total, copied)
+
+    dst.sync()
+    return copied
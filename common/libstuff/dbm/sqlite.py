@@ -0,0 +1,190 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from libstuff.dbm.backend import NamespaceUsage, StorageBackend, StorageUsage
+
+
+def _prefix_range(prefix: str) -> Tuple[str, Optional[str]]:
+    """
+    Obtain the `[lower, upper)` key range covering every key starting with
+    `prefix`. `upper` is None if the range is unbounded.
+    """
+    if len(prefix) == 0:
+        return "", None
+    last = ord(prefix[-1])
+    if last == 0x10FFFF:
+        return prefix, None
+    return prefix, prefix[:-1] + chr(last + 1)
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    SQLite storage, in WAL mode. Keys live in a `WITHOUT ROWID` table whose
+    primary key is the full key, so namespace and prefix scans are range
+    scans over the primary key's b-tree and cost as much as the result set.
+
+    Each thread gets its own connection, so that readers can proceed
+    concurrently with each other and with the writer.
+    """
+
+    _local: threading.local
+    _conns: List[sqlite3.Connection]
+    _conns_lock: threading.Lock
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " key TEXT PRIMARY KEY NOT NULL,"
+            " value BLOB NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self._path.as_posix(),
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    @property
+    def concurrent_reads(self) -> bool:
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn.execute(
+            "SELECT value FROM kv WHERE key = ?", (key,)
+        ).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def put(self, key: str, value: bytes) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+            (key, value),
+        )
+
+    def write_batch(
+        self, entries: Iterable[Tuple[str, Optional[bytes]]]
+    ) -> None:
+        self._conn.execute("BEGIN")
+        try:
+            for key, value in entries:
+                if value is None:
+                    self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                        (key, value),
+                    )
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def delete(self, key: str) -> bool:
+        cur = self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+        return cur.rowcount > 0
+
+    def exists(self, key: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM kv WHERE key = ?", (key,)
+        ).fetchone()
+        return row is not None
+
+    def keys(
+        self,
+        ns: Optional[str] = None,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        full_prefix = prefix if ns is None else f"{ns}/{prefix}"
+        lower, upper = _prefix_range(full_prefix)
+
+        query = "SELECT key FROM kv WHERE key >= ?"
+        args: List[Union[str, int]] = [lower]
+        if upper is not None:
+            query += " AND key < ?"
+            args.append(upper)
+        if start_after is not None:
+            query += " AND key > ?"
+            args.append(start_after)
+        query += " ORDER BY key"
+        if limit is not None:
+            query += " LIMIT ?"
+            args.append(limit)
+
+        cur = self._conn.execute(query, args)
+        if upper is None:
+            return [row[0] for row in cur if row[0].startswith(lower)]
+        return [row[0] for row in cur]
+
+    def usage(self) -> StorageUsage:
+        namespaces: Dict[str, NamespaceUsage] = {}
+        cur = self._conn.execute(
+            "SELECT"
+            " CASE WHEN instr(key, '/') > 0"
+            "  THEN substr(key, 1, instr(key, '/') - 1) ELSE '' END AS ns,"
+            " count(*),"
+            " sum(length(CAST(key AS BLOB)) + length(value))"
+            " FROM kv GROUP BY ns"
+        )
+        for ns, keys, live_bytes in cur:
+            namespaces[ns] = NamespaceUsage(keys=keys, live_bytes=live_bytes)
+
+        page_size = self._pragma("page_size")
+        file_bytes = os.stat(self._path).st_size
+        wal = self._path.with_name(f"{self._path.name}-wal")
+        if wal.exists():
+            file_bytes += os.stat(wal).st_size
+
+        return StorageUsage(
+            file_bytes=file_bytes,
+            live_bytes=sum(u.live_bytes for u in namespaces.values()),
+            free_bytes=self._pragma("freelist_count") * page_size,
+            namespaces=namespaces,
+        )
+
+    def _pragma(self, name: str) -> int:
+        row = self._conn.execute(f"PRAGMA {name}").fetchone()
+        return int(row[0])
+
+    def compact(self) -> Iterator[None]:
+        # in WAL mode readers keep reading while VACUUM rewrites the
+        # database; only the writer waits for it.
+        self._conn.execute("VACUUM")
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        yield from ()
+
+    def sync(self) -> None:
+        # with 'synchronous=NORMAL' commits reach the WAL but are not synced;
+        # a full checkpoint syncs the WAL and moves it into the database.
+        self._conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self) -> None:
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
@@ -7,7 +7,10 @@
 
 import asyncio
 import logging
+import os
 import re
+import signal
+import time
 from pathlib import Path
 from typing import Callable, Dict, List, Optional, Tuple
 
@@ -15,6 +18,8 @@ from libstuff import podman
 from pydantic import BaseModel, Field
 
 _HELPER_FILE = "run-s3tests-helper.sh"
+# seconds the tests have to exit once terminated, before they're killed.
+_KILL_GRACE = 10.0
 
 ProgressCB = Callable[[int, int], None]
 
@@ -27,6 +32,50 @@ def _get_helper_path() -> Path:
     return helper
 
 
+def _signal_group(pgid: int, sig: int) -> bool:
+    """Send `sig` to process group `pgid`; False if there's none left."""
+    try:
+        os.killpg(pgid, sig)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _group_running(pgid: int) -> bool:
+    """
+    Whether any process of group `pgid` is still running. Zombies don't
+    count: they're done, only waiting to be reaped, e.g. by init once
+    orphaned.
+    """
+    proc = Path("/proc")
+    if not proc.is_dir():
+        return _signal_group(pgid, 0)
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = entry.joinpath("stat").read_text()
+        except OSError:
+            # gone meanwhile.
+            continue
+        # fields after the command, which is in parentheses: state, ppid,
+        # pgrp, ...
+        fields = stat[stat.rfind(")") + 2 :].split()
+        if len(fields) > 2 and fields[2] == str(pgid) and fields[0] != "Z":
+            return True
+    return False
+
+
+async def _wait_group(pgid: int, timeout: float) -> bool:
+    """Wait for process group `pgid` to be done; False if it isn't."""
+    deadline = time.monotonic() + timeout
+    while _group_running(pgid):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.1)
+    return True
+
+
 class S3TestsError(Exception):
     pass
 
@@ -155,12 +204,7 @@ class S3TestsRunner:
             is_running = await podman.is_running(self.cid)
             if not is_running:
                 self.logger.error("container died!!")
-                assert self.s3tests_proc.stderr is not None
-                assert self.s3tests_proc.stdout is not None
-                self.s3tests_killed = True
-                self.s3tests_proc.terminate()
-                # workaround for https://bugs.python.org/issue43884
-                self.s3tests_proc._transport.close()  # type: ignore
+                await self._kill_s3tests()
                 success = False
                 break
 
@@ -168,6 +212,38 @@ class S3TestsRunner:
 
         return success
 
+    async def _kill_s3tests(self) -> None:
+        """
+        Terminate the tests: the helper, and nosetests, which it runs in a
+        subshell; all of them in the helper's process group. Those left
+        after `_KILL_GRACE` seconds are killed.
+        """
+        self.s3tests_killed = True
+        proc = self.s3tests_proc
+        if proc is None:
+            return
+        # the helper may be gone already, but not the tests.
+        if _signal_group(proc.pid, signal.SIGTERM):
+            if not await _wait_group(proc.pid, _KILL_GRACE):
+                self.logger.info(f"killing s3tests run {self.name}")
+                _signal_group(proc.pid, signal.SIGKILL)
+                if not await _wait_group(proc.pid, 1.0):
+                    self.logger.error(
+                        f"s3tests run {self.name} processes survived "
+                        f"being killed, process group {proc.pid}."
+                    )
+        if proc.returncode is None:
+            # workaround for https://bugs.python.org/issue43884
+            proc._transport.close()  # type: ignore
+
+    async def stop(self) -> None:
+        """
+        Stop running the tests, if running. `run()` then stops the container
+        and returns the results of the tests run so far.
+        """
+        self.logger.info(f"stopping s3tests run {self.name}")
+        await self._kill_s3tests()
+
     def _get_cmd(
         self,
         s3testsconf: TestsConfig,
@@ -216,24 +292,29 @@ class S3TestsRunner:
             s3testsconf, port=containerconf.host_port, collect=False
         )
 
-        collected = await self.collect(s3testsconf)
-        self.logger.debug(f"collected {len(collected.all)} tests")
-        nfiltered = len(collected.all) - len(collected.filtered)
-        self.logger.debug(
-            f"filtered {nfiltered} tests for a total of "
-            f"{len(collected.filtered)}"
-        )
+        try:
+            collected = await self.collect(s3testsconf)
+            self.logger.debug(f"collected {len(collected.all)} tests")
+            nfiltered = len(collected.all) - len(collected.filtered)
+            self.logger.debug(
+                f"filtered {nfiltered} tests for a total of "
+                f"{len(collected.filtered)}"
+            )
 
-        if len(collected.filtered) == 0:
-            self.logger.info("no tests to run.")
-            return TestRunResult(results=[], errors={})
+            if len(collected.filtered) == 0:
+                self.logger.info("no tests to run.")
+                return TestRunResult(results=[], errors={})
+            if self.s3tests_killed:
+                self.logger.info("stopped before running tests.")
+                return TestRunResult(results=[], errors={})
 
-        self.logger.debug(f"running {len(collected.filtered)}")
-        results = await self._s3tests_run(
-            s3testsconf.suite, run_cmd, collected.filtered, progress_cb
-        )
-        self.s3tests_done = True
-        return results
+            self.logger.debug(f"running {len(collected.filtered)}")
+            return await self._s3tests_run(
+                s3testsconf.suite, run_cmd, collected.filtered, progress_cb
+            )
+        finally:
+            # lets the container monitor finish.
+            self.s3tests_done = True
 
     async def _s3tests_collect(self, suite: str, cmd: List[str]) -> List[str]:
         collected_tests: List[str] = []
@@ -414,9 +495,16 @@ class S3TestsRunner:
             self.logger.debug("finished capturing results.")
 
         cmd = base_cmd + tests
+        # in a process group of their own, to terminate them all at once.
         self.s3tests_proc = await asyncio.create_subprocess_exec(
-            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
         )
+        if self.s3tests_killed:
+            # stopped while starting.
+            await self._kill_s3tests()
         assert self.s3tests_proc.stdout is not None
         assert self.s3tests_proc.stderr is not None
         await asyncio.gather(
@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+import asyncio
+import dbm.gnu as gdbm
+import json
+import platform
+import random
+import statistics
+import string
+import tempfile
+import time
+from datetime import datetime as dt
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+import click
+from libstuff.dbm import (
+    DBM,
+    CompressionConfig,
+    DBMCodec,
+    DBMEngine,
+    open_backend,
+)
+from pydantic import BaseModel
+
+_SCALES: List[int] = [10_000, 100_000, 1_000_000]
+
+_NS_LARGE = "s3tests-results-errors"
+_NS_SMALL = "s3tests-config"
+
+
+def _random_name(n: int = 24) -> str:
+    return "test_" + "".join(random.choices(string.ascii_lowercase, k=n))
+
+
+def _populate(path: Path, num_keys: int) -> Tuple[str, int]:
+    """
+    Populate a gdbm file at `path` with `num_keys` keys, most of them in a
+    large namespace shaped like s3tests' errors, plus a small namespace with
+    a handful of keys. Returns a run uuid used as prefix in the large
+    namespace and how many keys are under it.
+    """
+    value = b'{"name": "test", "trace": [], "log": []}'
+    target_run = str(uuid4())
+    target_keys = 300
+    num_small = 10
+
+    db = gdbm.open(path.as_posix(), "nf")
+    for _ in range(num_small):
+        db[f"{_NS_SMALL}/{uuid4()}"] = value
+    for _ in range(target_keys):
+        db[f"{_NS_LARGE}/{target_run}/{_random_name()}"] = value
+
+    remaining = num_keys - num_small - target_keys
+    run = str(uuid4())
+    for i in range(remaining):
+        if i % target_keys == 0:
+            run = str(uuid4())
+        db[f"{_NS_LARGE}/{run}/{_random_name()}"] = value
+    db.sync()
+    db.close()
+    return target_run, target_keys
+
+
+def _full_walk(path: Path, ns: str, prefix: Optional[str]) -> int:
+    """Scan the way DBM did before the key index: walk every key."""
+    db = gdbm.open(path.as_posix(), "r")
+    _ns = f"{ns}/"
+    n = 0
+    k = db.firstkey()
+    while k is not None:
+        key = k.decode("utf-8")
+        k = db.nextkey(k)
+        if not key.startswith(_ns):
+            continue
+        if prefix is not None and not key[len(_ns) :].startswith(prefix):
+            continue
+        db[key].decode("utf-8")
+        n += 1
+    db.close()
+    return n
+
+
+def _timeit(fn: Callable[[], int], runs: int) -> Tuple[float, int]:
+    best = float("inf")
+    n = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        n = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, n
+
+
+async def _scan(num_keys: int, runs: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir).joinpath("bench.db")
+        target_run, target_keys = _populate(path, num_keys)
+        prefix = f"{target_run}/"
+
+        walk_ns_ms, walk_ns_n = _timeit(
+            lambda: _full_walk(path, _NS_SMALL, None), runs
+        )
+        walk_pfx_ms, walk_pfx_n = _timeit(
+            lambda: _full_walk(path, _NS_LARGE, prefix), runs
+        )
+
+        start = time.perf_counter()
+        db = DBM(path)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        async def _timeit_async(
+            ns: str, prefix: Optional[str]
+        ) -> Tuple[float, int]:
+            best = float("inf")
+            n = 0
+            for _ in range(runs):
+                start = time.perf_counter()
+                n = len(await db.entries(ns=ns, prefix=prefix))
+                best = min(best, time.perf_counter() - start)
+            return best * 1000, n
+
+        idx_ns_ms, idx_ns_n = await _timeit_async(_NS_SMALL, None)
+        idx_pfx_ms, idx_pfx_n = await _timeit_async(_NS_LARGE, prefix)
+        del db
+
+        assert walk_ns_n == idx_ns_n
+        assert walk_pfx_n == idx_pfx_n == target_keys
+
+        click.echo(f"keys: {num_keys} (open + index build: {open_ms:.1f} ms)")
+        click.echo(
+            f"  namespace scan ({idx_ns_n} keys): "
+            f"walk {walk_ns_ms:.2f} ms, index {idx_ns_ms:.2f} ms"
+        )
+        click.echo(
+            f"  prefix scan ({idx_pfx_n} keys): "
+            f"walk {walk_pfx_ms:.2f} ms, index {idx_pfx_ms:.2f} ms"
+        )
+
+
+class _ErrorEntry(BaseModel):
+    name: str
+    trace: List[str]
+    log: List[str]
+
+
+async def _measure_lag(
+    scan: Callable[[], Awaitable[int]], tick_ms: float = 1.0
+) -> Tuple[float, int, List[float]]:
+    """
+    Run `scan` while a ticker, standing in for API requests, wakes every
+    `tick_ms` and records how late it woke up. Returns the scan's duration
+    in ms, how many entries it returned, and the ticker's lag in ms.
+    """
+    lags: List[float] = []
+    done = False
+
+    async def _ticker() -> None:
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(tick_ms / 1000)
+            lag = (time.perf_counter() - start) * 1000 - tick_ms
+            lags.append(max(lag, 0.0))
+
+    ticker = asyncio.create_task(_ticker())
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    n = await scan()
+    scan_ms = (time.perf_counter() - start) * 1000
+    done = True
+    await ticker
+    return scan_ms, n, lags
+
+
+def _lag_report(name: str, scan_ms: float, n: int, lags: List[float]) -> None:
+    p99 = 0.0
+    if len(lags) > 1:
+        p99 = statistics.quantiles(lags, n=100, method="inclusive")[98]
+    click.echo(
+        f"  {name}: scan {scan_ms:.1f} ms ({n} entries), "
+        f"loop lag max {max(lags, default=0.0):.1f} ms, p99 {p99:.1f} ms"
+    )
+
+
+async def _lag(engine: DBMEngine, num_keys: int, value_size: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir).joinpath("bench.db")
+        backend = open_backend(path, engine)
+        entry = _ErrorEntry(
+            name="test", trace=["x" * 80] * (value_size // 80), log=[]
+        )
+        value = entry.json().encode("utf-8")
+        backend.put_many(
+            (f"{_NS_LARGE}/{uuid4()}/{_random_name()}", value)
+            for _ in range(num_keys)
+        )
+        backend.sync()
+        backend.close()
+
+        db = DBM(path, engine)
+
+        async def _inline() -> int:
+            # what DBM used to do: decode on the event loop.
+            return len(db._entries(_NS_LARGE, "", _ErrorEntry))
+
+        async def _executor() -> int:
+            res = await db.entries(ns=_NS_LARGE, model=_ErrorEntry)
+            return len(res)
+
+        click.echo(f"{engine.value}: {num_keys} keys, {len(value)} bytes each")
+        _lag_report("on event loop", *(await _measure_lag(_inline)))
+        _lag_report("on executor", *(await _measure_lag(_executor)))
+        await db.close()
+
+
+def _bench_samples_json(num_samples: int) -> str:
+    # shaped like the pandas to_json() output of warp's benchdata.
+    cols = {
+        "op": {
+            str(i): random.choice(["GET", "PUT", "STAT"])
+            for i in range(num_samples)
+        },
+        "thread": {str(i): random.randint(0, 20) for i in range(num_samples)},
+        "bytes": {str(i): 10485760 for i in range(num_samples)},
+        "endpoint": {str(i): "127.0.0.1:54780" for i in range(num_samples)},
+        "duration_ns": {
+            str(i): random.randint(10**6, 10**9) for i in range(num_samples)
+        },
+    }
+    return json.dumps(cols)
+
+
+def _error_entry(i: int) -> _ErrorEntry:
+    trace = [
+        "Traceback (most recent call last):",
+        '  File "/usr/lib/python3/site-packages/nose/case.py", line 198',
+        "    self.test(*self.arg)",
+        f'  File "s3tests_boto3/functional/test_s3.py", line {i}, in test_{i}',
+        "    eq(response['ResponseMetadata']['HTTPStatusCode'], 200)",
+        "AssertionError: 403 != 200",
+    ]
+    log = [f"botocore.hooks: DEBUG: Event before-call.s3.Put {i}"] * 40
+    return _ErrorEntry(name=f"test_{i}", trace=trace, log=log)
+
+
+async def _compress(engine: DBMEngine, num_keys: int, threshold: int) -> None:
+    namespaces = {
+        "s3tests-results-errors": lambda i: _error_entry(i).json(),
+        "bench-results": lambda i: _bench_samples_json(2000),
+    }
+    for ns, gen in namespaces.items():
+        values = [gen(i) for i in range(num_keys)]
+        res: List[Tuple[int, float]] = []
+        for compression in (None, CompressionConfig(threshold=threshold)):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = Path(tmpdir).joinpath("bench.db")
+                db = DBM(path, engine, compression=compression)
+                async with db.transaction() as tx:
+                    for i, v in enumerate(values):
+                        tx.put(ns, str(i), v)
+                await db.close()
+
+                backend = open_backend(path, engine)
+                stored = sum(
+                    len(backend.get(k) or b"") for k in backend.keys(ns)
+                )
+                backend.close()
+
+                db = DBM(path, engine, compression=compression)
+                start = time.perf_counter()
+                for i in range(num_keys):
+                    await db.get(ns=ns, key=str(i))
+                read_us = (time.perf_counter() - start) * 1e6 / num_keys
+                await db.close()
+                res.append((stored, read_us))
+
+        (raw, raw_us), (comp, comp_us) = res
+        saved = 100 * (raw - comp) / raw if raw > 0 else 0.0
+        click.echo(
+            f"{ns}: {raw} -> {comp} bytes ({saved:.1f}% saved), "
+            f"read {raw_us:.1f} -> {comp_us:.1f} us/value"
+        )
+
+
+# Shaped like the server's s3tests and bench models, which we can't import
+# from here.
+class _RunResult(BaseModel):
+    uuid: UUID
+    time_start: dt
+    time_end: dt
+    results: Dict[str, str]
+    is_error: bool
+    error_msg: str
+
+
+class _RunSummary(BaseModel):
+    date: dt
+    config_uuid: UUID
+    result_uuid: UUID
+    duration: int
+    passed: int
+    error: int
+    failed: int
+
+
+class _ConfigEntry(BaseModel):
+    uuid: UUID
+    name: str
+    image: str
+    include: List[str]
+
+
+class _BenchResult(BaseModel):
+    uuid: UUID
+    is_error: bool
+    results: Dict[str, str]
+
+
+class _OpResult(BaseModel):
+    engine: DBMEngine
+    scale: int
+    keys: int
+    op: str
+    count: int
+    ops_per_sec: float
+    mean_us: float
+    p50_us: float
+    p90_us: float
+    p99_us: float
+    max_us: float
+
+
+class _SuiteResult(BaseModel):
+    date: dt
+    label: Optional[str]
+    python: str
+    codec: DBMCodec
+    results: List[_OpResult]
+
+
+_SUITE_NS_CONFIG = "s3tests-config"
+_SUITE_NS_CONFIG_NAME = "s3tests-config-by-name"
+_SUITE_NS_RESULTS = "s3tests-results"
+_SUITE_NS_ERRORS = "s3tests-results-errors"
+_SUITE_NS_SUMMARIES = "s3tests-config-results"
+_SUITE_NS_BENCH = "bench-results"
+
+_SUITE_SCALES: List[int] = [10, 100, 1000]
+_SUITE_CONFIGS = 10
+_SUITE_TESTS = 200
+_SUITE_ERRORS = 50
+
+
+class _Dataset:
+    """
+    Synthetic database shaped like the server's: `scale` s3tests runs over
+    a handful of configs, each run with its result, errors and summary, and
+    a bench result every tenth run.
+    """
+
+    configs: List[UUID]
+    runs: List[UUID]
+    names: List[str]
+
+    def __init__(self) -> None:
+        self.configs = []
+        self.runs = []
+        self.names = []
+
+    def config(self, i: int) -> _ConfigEntry:
+        return _ConfigEntry(
+            uuid=uuid4(),
+            name=f"config-{i}",
+            image="ghcr.io/aquarist-labs/s3gw:latest",
+            include=[".*_post_object.*", ".*_bucket_list_.*"],
+        )
+
+    def run(self, config: UUID) -> Tuple[_RunResult, Dict[str, _ErrorEntry]]:
+        outcomes = ["ok"] * 8 + ["ERROR", "FAIL"]
+        res = _RunResult(
+            uuid=uuid4(),
+            time_start=dt.now(),
+            time_end=dt.now(),
+            results={
+                f"s3tests_boto3.functional.test_s3.{_random_name()}": (
+                    random.choice(outcomes)
+                )
+                for _ in range(_SUITE_TESTS)
+            },
+            is_error=False,
+            error_msg="",
+        )
+        errors = {f"test_{i}": _error_entry(i) for i in range(_SUITE_ERRORS)}
+        return res, errors
+
+
+async def _suite_store_run(
+    db: DBM, ds: _Dataset, config: UUID, with_bench: bool
+) -> None:
+    res, errors = ds.run(config)
+    summary = _RunSummary(
+        date=res.time_start,
+        config_uuid=config,
+        result_uuid=res.uuid,
+        duration=60,
+        passed=_SUITE_TESTS - _SUITE_ERRORS,
+        error=_SUITE_ERRORS // 2,
+        failed=_SUITE_ERRORS // 2,
+    )
+    # the way the s3tests manager stores a finished run.
+    async with db.transaction() as tx:
+        tx.put(_SUITE_NS_RESULTS, str(res.uuid), res)
+        for name, entry in errors.items():
+            tx.put(_SUITE_NS_ERRORS, f"{res.uuid}/{name}", entry)
+        tx.put(_SUITE_NS_SUMMARIES, f"{config}/{res.uuid}", summary)
+        if with_bench:
+            bench = _BenchResult(
+                uuid=uuid4(),
+                is_error=False,
+                results={"s3gw": _bench_samples_json(500)},
+            )
+            tx.put(_SUITE_NS_BENCH, str(bench.uuid), bench)
+    ds.runs.append(res.uuid)
+
+
+async def _suite_populate(db: DBM, ds: _Dataset, scale: int) -> List[int]:
+    """Populate `db`, returning each run's transaction latency in ns."""
+    async with db.transaction() as tx:
+        for i in range(_SUITE_CONFIGS):
+            entry = ds.config(i)
+            tx.put(_SUITE_NS_CONFIG, str(entry.uuid), entry)
+            tx.put(_SUITE_NS_CONFIG_NAME, entry.name, str(entry.uuid))
+            ds.configs.append(entry.uuid)
+            ds.names.append(entry.name)
+
+    lats: List[int] = []
+    for i in range(scale):
+        start = time.perf_counter_ns()
+        await _suite_store_run(db, ds, random.choice(ds.configs), i % 10 == 0)
+        lats.append(time.perf_counter_ns() - start)
+    return lats
+
+
+async def _suite_time(
+    count: int, fn: Callable[[int], Awaitable[object]]
+) -> List[int]:
+    lats: List[int] = []
+    for i in range(count):
+        start = time.perf_counter_ns()
+        await fn(i)
+        lats.append(time.perf_counter_ns() - start)
+    return lats
+
+
+def _suite_result(
+    engine: DBMEngine, scale: int, keys: int, op: str, lats: List[int]
+) -> _OpResult:
+    us = [n / 1000 for n in lats]
+    pct = [us[0]] * 99
+    if len(us) > 1:
+        pct = statistics.quantiles(us, n=100, method="inclusive")
+    return _OpResult(
+        engine=engine,
+        scale=scale,
+        keys=keys,
+        op=op,
+        count=len(us),
+        ops_per_sec=len(us) / (sum(us) / 1e6),
+        mean_us=statistics.fmean(us),
+        p50_us=pct[49],
+        p90_us=pct[89],
+        p99_us=pct[98],
+        max_us=max(us),
+    )
+
+
+async def _suite(
+    engine: DBMEngine, scale: int, ops: int, codec: DBMCodec
+) -> List[_OpResult]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir).joinpath("bench.db")
+        db = DBM(path, engine, codec=codec)
+        ds = _Dataset()
+        tx_lats = await _suite_populate(db, ds, scale)
+        keys = len([k async for k, _ in db.scan(keys_only=True)])
+        scans = max(1, ops // 100)
+
+        async def _put(i: int) -> None:
+            entry = ds.config(i)
+            await db.put(ns=_SUITE_NS_CONFIG, key=str(entry.uuid), value=entry)
+
+        async def _get(_: int) -> None:
+            name = random.choice(ds.names)
+            assert await db.get(ns=_SUITE_NS_CONFIG_NAME, key=name) is not None
+
+        async def _get_model(_: int) -> None:
+            run = random.choice(ds.runs)
+            key = f"{run}/test_{random.randrange(_SUITE_ERRORS)}"
+            res = await db.get_model(
+                ns=_SUITE_NS_ERRORS, key=key, model=_ErrorEntry
+            )
+            assert res is not None
+
+        async def _entries_ns(_: int) -> None:
+            await db.entries(ns=_SUITE_NS_SUMMARIES, model=_RunSummary)
+
+        async def _entries_prefix(_: int) -> None:
+            run = random.choice(ds.runs)
+            res = await db.entries(
+                ns=_SUITE_NS_ERRORS, prefix=f"{run}/", model=_ErrorEntry
+            )
+            assert len(res) == _SUITE_ERRORS
+
+        results: List[_OpResult] = [
+            _suite_result(engine, scale, keys, "transaction", tx_lats)
+        ]
+        for op, count, fn in [
+            ("get", ops, _get),
+            ("get_model", ops, _get_model),
+            ("entries_ns", scans, _entries_ns),
+            ("entries_prefix", scans, _entries_prefix),
+            ("put", ops, _put),
+        ]:
+            lats = await _suite_time(count, fn)
+            results.append(_suite_result(engine, scale, keys, op, lats))
+
+        await db.close()
+        return results
+
+
+@click.group()
+def cli() -> None:
+    pass
+
+
+@cli.command()
+@click.option(
+    "-n",
+    "--num-keys",
+    type=int,
+    multiple=True,
+    help="Number of keys in the database (default: 10k, 100k and 1M).",
+)
+@click.option("-r", "--runs", type=int, default=5, help="Runs per scan.")
+def scan(num_keys: Tuple[int, ...], runs: int) -> None:
+    """Compare namespace and prefix scan latency with and without the index."""
+    scales: List[int] = list(num_keys) if len(num_keys) > 0 else _SCALES
+    for n in scales:
+        asyncio.run(_scan(n, runs))
+
+
+@cli.command()
+@click.option(
+    "-e",
+    "--engine",
+    type=click.Choice([e.value for e in DBMEngine]),
+    default=DBMEngine.GDBM.value,
+)
+@click.option("-n", "--num-keys", type=int, default=20_000)
+@click.option(
+    "-s", "--value-size", type=int, default=4096, help="Bytes per value."
+)
+def lag(engine: str, num_keys: int, value_size: int) -> None:
+    """Measure event loop lag during a large scan, inline vs executor."""
+    asyncio.run(_lag(DBMEngine(engine), num_keys, value_size))
+
+
+@cli.command()
+@click.option(
+    "-e",
+    "--engine",
+    type=click.Choice([e.value for e in DBMEngine]),
+    default=DBMEngine.GDBM.value,
+)
+@click.option("-n", "--num-keys", type=int, default=500)
+@click.option("-t", "--threshold", type=int, default=1024)
+def compress(engine: str, num_keys: int, threshold: int) -> None:
+    """Report space saved and read-time cost of compression per namespace."""
+    asyncio.run(_compress(DBMEngine(engine), num_keys, threshold))
+
+
+@cli.command()
+@click.option(
+    "-e",
+    "--engine",
+    type=click.Choice([e.value for e in DBMEngine]),
+    multiple=True,
+    help="Storage engine (default: all).",
+)
+@click.option(
+    "-s",
+    "--scale",
+    type=int,
+    multiple=True,
+    help="Number of s3tests runs in the database (default: 10, 100, 1000).",
+)
+@click.option("-n", "--ops", type=int, default=1000, help="Ops per point op.")
+@click.option(
+    "-c",
+    "--codec",
+    type=click.Choice([c.value for c in DBMCodec]),
+    default=DBMCodec.MSGPACK.value,
+)
+@click.option("-l", "--label", type=str, help="Label for this run's results.")
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write results as JSON to this file.",
+)
+def suite(
+    engine: Tuple[str, ...],
+    scale: Tuple[int, ...],
+    ops: int,
+    codec: str,
+    label: Optional[str],
+    output: Optional[Path],
+) -> None:
+    """
+    Measure throughput and latency percentiles of DBM's operations on a
+    synthetic database shaped like the server's, at several scales.
+
+    Point operations run `ops` times, namespace and prefix scans a hundredth
+    of that. Transactions are those storing each run while populating.
+    """
+    engines = [DBMEngine(e) for e in engine] if len(engine) > 0 else DBMEngine
+    scales = list(scale) if len(scale) > 0 else _SUITE_SCALES
+
+    results: List[_OpResult] = []
+    for e in engines:
+        for n in scales:
+            res = asyncio.run(_suite(e, n, ops, DBMCodec(codec)))
+            click.echo(f"{e.value}: {n} runs, {res[0].keys} keys")
+            for r in res:
+                click.echo(
+                    f"  {r.op:>14}: {r.ops_per_sec:>9.0f} ops/s, "
+                    f"p50 {r.p50_us:>9.1f} us, p90 {r.p90_us:>9.1f} us, "
+                    f"p99 {r.p99_us:>9.1f} us"
+                )
+            results.extend(res)
+
+    if output is not None:
+        suite_res = _SuiteResult(
+            date=dt.now(),
+            label=label,
+            python=platform.python_version(),
+            codec=DBMCodec(codec),
+            results=results,
+        )
+        output.write_text(suite_res.json(indent=2))
+
+
+if __name__ == "__main__":
+    cli()
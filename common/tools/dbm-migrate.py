@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+import sys
+from pathlib import Path
+
+import click
+from libstuff.dbm import DBMEngine, migrate, open_backend
+
+_ENGINES = [e.value for e in DBMEngine]
+
+
+@click.command()
+@click.argument(
+    "src", type=click.Path(file_okay=True, dir_okay=False, exists=True)
+)
+@click.argument("dst", type=click.Path(file_okay=True, dir_okay=False))
+@click.option(
+    "--from",
+    "src_engine",
+    type=click.Choice(_ENGINES),
+    default=DBMEngine.GDBM.value,
+    help="Storage engine of the source database.",
+)
+@click.option(
+    "--to",
+    "dst_engine",
+    type=click.Choice(_ENGINES),
+    default=DBMEngine.SQLITE.value,
+    help="Storage engine of the destination database.",
+)
+@click.option(
+    "-f", "--force", is_flag=True, help="Write to an existing destination."
+)
+@click.option("-b", "--batch-size", type=int, default=1000)
+def main(
+    src: str,
+    dst: str,
+    src_engine: str,
+    dst_engine: str,
+    force: bool,
+    batch_size: int,
+) -> None:
+    """Copy an existing server database into a new storage engine."""
+    srcpath = Path(src).resolve()
+    dstpath = Path(dst).resolve()
+    if srcpath == dstpath:
+        click.echo("error: source and destination are the same file.")
+        sys.exit(1)
+    if dstpath.exists() and not force:
+        click.echo(f"error: '{dstpath}' already exists; use --force.")
+        sys.exit(1)
+
+    source = open_backend(srcpath, DBMEngine(src_engine))
+    dest = open_backend(dstpath, DBMEngine(dst_engine))
+
+    def _progress(total: int, copied: int) -> None:
+        click.echo(f"copied {copied}/{total} keys")
+
+    try:
+        n = migrate(source, dest, batch_size=batch_size, progress_cb=_progress)
+    finally:
+        source.close()
+        dest.close()
+
+    click.echo(f"migrated {n} keys from {srcpath} to {dstpath}")
+
+
+if __name__ == "__main__":
+    main()
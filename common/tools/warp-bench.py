@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+# pyright: reportUnknownMemberType=false
+
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import numpy
+import pandas
+import zstandard as zstd
+from libstuff.bench.plots import LatencyPrecision, compact_samples
+from libstuff.bench.warp import parse_benchdata
+
+_HEADER = (
+    "idx\tthread\top\tclient_id\tn_objects\tbytes\tendpoint\tfile\terror"
+    "\tstart\tfirst_byte\tend\tduration_ns\n"
+)
+
+
+def _gen_benchdata(path: Path, num_rows: int, chunk_rows: int) -> None:
+    """
+    Write a synthetic warp 'mixed' benchdata file, zstd-compressed, with
+    `num_rows` samples spread over 20 threads.
+    """
+    rng = numpy.random.default_rng(0)
+    ops = numpy.array(["GET", "PUT", "STAT", "DELETE"])
+    t0 = numpy.datetime64("2022-10-21T12:00:00", "ns")
+
+    with path.open("wb") as f:
+        with zstd.ZstdCompressor().stream_writer(f) as out:
+            out.write(_HEADER.encode("utf-8"))
+            for first in range(0, num_rows, chunk_rows):
+                n = min(chunk_rows, num_rows - first)
+                idx = numpy.arange(first, first + n)
+                dur = rng.integers(10**6, 10**9, n)
+                start = t0 + (idx * 30_000).astype("timedelta64[ns]")
+                end = start + dur.astype("timedelta64[ns]")
+                ttfb = start + (dur // 2).astype("timedelta64[ns]")
+                chunk = pandas.DataFrame(
+                    {
+                        "idx": idx,
+                        "thread": idx % 20,
+                        "op": ops[rng.integers(0, len(ops), n)],
+                        "client_id": "Bx1Qfs",
+                        "n_objects": 1,
+                        "bytes": 10485760,
+                        "endpoint": "127.0.0.1:54780",
+                        "file": numpy.char.add(
+                            "obj/", (idx % 2500).astype(str)
+                        ),
+                        "error": "",
+                        "start": numpy.datetime_as_string(
+                            start, timezone="UTC"
+                        ),
+                        "first_byte": numpy.datetime_as_string(
+                            ttfb, timezone="UTC"
+                        ),
+                        "end": numpy.datetime_as_string(end, timezone="UTC"),
+                        "duration_ns": dur,
+                    }
+                )
+                out.write(
+                    chunk.to_csv(sep="\t", header=False, index=False).encode(
+                        "utf-8"
+                    )
+                )
+
+
+def _parse_legacy(path: Path) -> pandas.DataFrame:
+    """Parse benchdata the way we used to."""
+    csv_file = path.with_suffix(".csv")
+    with path.open("rb") as source:
+        with csv_file.open("wb") as dest:
+            zstd.ZstdDecompressor().copy_stream(source, dest)
+    data = pandas.read_csv(csv_file, delimiter="\t")
+    data["duration_ms"] = data.apply(
+        lambda r: r["duration_ns"] * 1e-6, axis=1  # type: ignore
+    )
+    csv_file.unlink()
+    return data
+
+
+def _report(name: str, secs: float, data: pandas.DataFrame) -> None:
+    mem = data.memory_usage(deep=True).sum()
+    click.echo(
+        f"  {name}: {secs:.2f} s, {len(data) / secs:,.0f} rows/s, "
+        f"{mem / 2**20:.1f} MiB in memory ({mem / len(data):.1f} B/row)"
+    )
+
+
+@click.group()
+def cli() -> None:
+    pass
+
+
+@cli.command()
+@click.option("-n", "--num-rows", type=int, default=10_000_000)
+@click.option(
+    "-c", "--chunk-rows", type=int, default=1_000_000, help="Rows per chunk."
+)
+@click.option(
+    "--legacy/--no-legacy",
+    default=False,
+    help="Also time the old parser; slow, one Python call per row.",
+)
+def ingest(num_rows: int, chunk_rows: int, legacy: bool) -> None:
+    """Time benchdata ingestion on a synthetic warp file."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir).joinpath("warp-result.csv.zst")
+        start = time.perf_counter()
+        _gen_benchdata(path, num_rows, chunk_rows)
+        click.echo(
+            f"generated {num_rows} rows in "
+            f"{time.perf_counter() - start:.1f} s, "
+            f"{path.stat().st_size / 2**20:.1f} MiB compressed"
+        )
+
+        start = time.perf_counter()
+        data = parse_benchdata(path, chunk_rows)
+        _report("streaming", time.perf_counter() - start, data)
+        del data
+
+        if legacy:
+            start = time.perf_counter()
+            data = _parse_legacy(path)
+            _report("legacy", time.perf_counter() - start, data)
+
+
+def _report_size(name: str, data: pandas.DataFrame) -> None:
+    mem = data.memory_usage(deep=True).sum()
+    click.echo(
+        f"  {name:>12}: {mem / len(data):5.1f} B/sample, "
+        f"{mem / 2**20:7.1f} MiB, {len(data.columns)} columns"
+    )
+
+
+@cli.command()
+@click.option("-n", "--num-rows", type=int, default=1_000_000)
+def samples(num_rows: int) -> None:
+    """Compare the memory taken by samples as kept for analysis."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir).joinpath("warp-result.csv.zst")
+        _gen_benchdata(path, num_rows, 1_000_000)
+        data = parse_benchdata(path)
+
+        click.echo(f"{num_rows} samples")
+        # as results were kept before artifacts, and loaded for plotting.
+        _report_size("json", pandas.read_json(data.to_json()))
+        _report_size("parsed", data)
+        for latency in LatencyPrecision:
+            _report_size(latency.value, compact_samples(data, latency))
+
+
+if __name__ == "__main__":
+    cli()
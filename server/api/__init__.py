@@ -10,6 +10,7 @@ from controllers.context import ServerContext
 from controllers.s3tests.mgr import S3TestsMgr
 from controllers.wq.wq import WorkQueue
 from fastapi import Request
+from libstuff.dbm import DBM
 
 
 class APIServerContext:
@@ -48,7 +49,17 @@ class APIWorkQueue:
         return ctx.workqueue
 
 
+class APIDB:
+    def __init__(self) -> None:
+        pass
+
+    def __call__(self, request: Request) -> DBM:
+        ctx: ServerContext = request.app.state.ctx
+        return ctx.db
+
+
 server_context = APIServerContext()
 s3tests_mgr = APIS3TestsMgr()
 bench_mgr = APIBenchMgr()
 workqueue = APIWorkQueue()
+db = APIDB()
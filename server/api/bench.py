@@ -8,9 +8,9 @@ from datetime import datetime as dt
 from typing import Dict, List, Optional
 from uuid import UUID
 
-from fastapi import Request, Depends, HTTPException, status
+from fastapi import Request, Depends, HTTPException, Query, status
 from fastapi.routing import APIRouter
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 from common.error import NoSuchConfigError, NoSuchRunError
 from controllers.bench.mgr import (
@@ -20,8 +20,16 @@ from controllers.bench.mgr import (
     BenchmarkMgr,
 )
 from api import bench_mgr
-from controllers.bench.results import ResultItem
-from libstuff.bench.plots import Histogram
+from controllers.bench.results import ResultItem, ResultsCacheStats
+from controllers.wq.types import WQPriority
+from libstuff.bench.plots import (
+    Histogram,
+    HistogramParams,
+    HistogramScale,
+    OpSummary,
+    Timeline,
+    TimelineParams,
+)
 
 router: APIRouter = APIRouter(prefix="/bench", tags=["benchmarking"])
 
@@ -41,6 +49,25 @@ class BenchGetResultsHistogramsReply(BaseModel):
     results: Dict[str, Dict[str, Histogram]]
 
 
+class BenchGetResultSummaryReply(BaseModel):
+    date: dt = dt.now()
+    uuid: UUID
+    # per target, per op.
+    summary: Dict[str, Dict[str, OpSummary]]
+
+
+class BenchGetResultTimelineReply(BaseModel):
+    date: dt = dt.now()
+    uuid: UUID
+    # per target, per op.
+    timelines: Dict[str, Dict[str, Timeline]]
+
+
+class BenchGetResultsCacheReply(BaseModel):
+    date: dt = dt.now()
+    stats: ResultsCacheStats
+
+
 class BenchStatusReply(BaseModel):
     date: dt = dt.now()
     available: bool
@@ -60,7 +87,12 @@ class BenchPostConfigReply(BaseModel):
 
 @router.post("/run", response_model=BenchStartReply)
 async def run_bench(
-    request: Request, uuid: UUID, mgr: BenchmarkMgr = Depends(bench_mgr)
+    request: Request,
+    uuid: UUID,
+    priority: WQPriority = WQPriority.NORMAL,
+    submitter: Optional[str] = None,
+    preempt: bool = False,
+    mgr: BenchmarkMgr = Depends(bench_mgr),
 ) -> BenchStartReply:
 
     try:
@@ -68,7 +100,9 @@ async def run_bench(
     except NoSuchConfigError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
-    run_uuid = await mgr.run(config)
+    if submitter is None:
+        submitter = request.client.host if request.client else ""
+    run_uuid = await mgr.run(config, priority, submitter, preempt)
     return BenchStartReply(uuid=run_uuid)
 
 
@@ -84,15 +118,92 @@ async def get_results(
     "/results/histograms", response_model=BenchGetResultsHistogramsReply
 )
 async def get_results_histograms(
-    request: Request, uuid: UUID, mgr: BenchmarkMgr = Depends(bench_mgr)
+    request: Request,
+    uuid: UUID,
+    bins: int = Query(default=50, gt=0, le=10000),
+    scale: HistogramScale = HistogramScale.LINEAR,
+    range_min: Optional[float] = None,
+    range_max: Optional[float] = None,
+    raw: bool = False,
+    mgr: BenchmarkMgr = Depends(bench_mgr),
 ) -> BenchGetResultsHistogramsReply:
     try:
-        res = await mgr.get_histograms(uuid)
+        params = HistogramParams(
+            bins=bins,
+            scale=scale,
+            range_min=range_min,
+            range_max=range_max,
+            raw=raw,
+        )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        )
+
+    try:
+        res = await mgr.get_histograms(uuid, params)
         return BenchGetResultsHistogramsReply(results=res)
     except NoSuchRunError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
 
+@router.get(
+    "/results/{uuid}/summary", response_model=BenchGetResultSummaryReply
+)
+async def get_result_summary(
+    request: Request, uuid: UUID, mgr: BenchmarkMgr = Depends(bench_mgr)
+) -> BenchGetResultSummaryReply:
+    """
+    Obtains ops/s, MiB/s, errors and latency percentiles per op, per target,
+    of run `uuid`.
+    """
+    try:
+        res = await mgr.get_summary(uuid)
+    except NoSuchRunError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return BenchGetResultSummaryReply(uuid=uuid, summary=res)
+
+
+@router.get(
+    "/results/{uuid}/timeline", response_model=BenchGetResultTimelineReply
+)
+async def get_result_timeline(
+    request: Request,
+    uuid: UUID,
+    window: float = Query(default=1.0, gt=0),
+    scatter: int = Query(default=0, ge=0, le=100000),
+    mgr: BenchmarkMgr = Depends(bench_mgr),
+) -> BenchGetResultTimelineReply:
+    """
+    Obtains ops/s, bytes/s, errors and p50/p99 latency per window of
+    `window` seconds, per op, per target, of run `uuid`; plus, if `scatter`
+    is set, up to that many samples' latencies per op.
+    """
+    try:
+        params = TimelineParams(window=window, scatter=scatter)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        )
+
+    try:
+        res = await mgr.get_timeline(uuid, params)
+    except NoSuchRunError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        )
+    return BenchGetResultTimelineReply(uuid=uuid, timelines=res)
+
+
+@router.get("/results/cache", response_model=BenchGetResultsCacheReply)
+async def get_results_cache(
+    request: Request, mgr: BenchmarkMgr = Depends(bench_mgr)
+) -> BenchGetResultsCacheReply:
+    return BenchGetResultsCacheReply(stats=mgr.results_cache_stats)
+
+
 @router.get("/status", response_model=BenchStatusReply)
 async def get_status(
     request: Request, mgr: BenchmarkMgr = Depends(bench_mgr)
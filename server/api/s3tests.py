@@ -15,11 +15,13 @@ from controllers.s3tests.mgr import (
     S3TestsMgr,
     S3TestRunDesc,
     S3TestRunResult,
+    S3TestRunSummary,
     NoSuchConfigError,
     NoSuchRunError,
     S3TestsResultSummary,
 )
-from fastapi import Depends, Request, HTTPException, status
+from controllers.wq.types import WQPriority
+from fastapi import Depends, Query, Request, HTTPException, status
 from fastapi.routing import APIRouter
 from pydantic import BaseModel
 
@@ -35,7 +37,11 @@ class S3TestsBaseReply(BaseModel):
 
 
 class S3TestsResultsReply(S3TestsBaseReply):
-    results: Dict[UUID, S3TestRunResult]
+    results: Dict[UUID, S3TestRunSummary]
+
+
+class S3TestsResultReply(S3TestsBaseReply):
+    result: S3TestRunResult
 
 
 class S3TestsRunReply(S3TestsBaseReply):
@@ -45,6 +51,7 @@ class S3TestsRunReply(S3TestsBaseReply):
 class S3TestsStatusReply(S3TestsBaseReply):
     busy: bool
     current: Optional[S3TestRunDesc]
+    running: List[S3TestRunDesc]
 
 
 class S3TestsRunStatusReply(S3TestsBaseReply):
@@ -55,6 +62,7 @@ class S3TestsRunStatusReply(S3TestsBaseReply):
 
 class S3TestsRunErrorsReply(S3TestsBaseReply):
     errors: Dict[str, ErrorTestResult]
+    next: Optional[str]
 
 
 class S3TestsConfigPostReply(S3TestsBaseReply):
@@ -76,12 +84,26 @@ async def get_results(
     return S3TestsResultsReply(date=dt.now(), results=mgr.results)
 
 
+@router.get("/results/{uuid}", response_model=S3TestsResultReply)
+async def get_result(
+    request: Request, uuid: UUID, mgr: S3TestsMgr = Depends(s3tests_mgr)
+) -> S3TestsResultReply:
+    try:
+        res = await mgr.get_run(uuid)
+    except NoSuchRunError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return S3TestsResultReply(date=dt.now(), result=res)
+
+
 @router.post("/run", response_model=S3TestsRunReply)
 async def run_s3tests(
     request: Request,
     mgr: S3TestsMgr = Depends(s3tests_mgr),
     name: Optional[str] = None,
     uuid: Optional[UUID] = None,
+    priority: WQPriority = WQPriority.NORMAL,
+    submitter: Optional[str] = None,
+    preempt: bool = False,
 ) -> S3TestsRunReply:
 
     entry: Optional[S3TestsConfigItem] = None
@@ -91,7 +113,9 @@ async def run_s3tests(
         raise HTTPException(status.HTTP_404_NOT_FOUND)
     assert entry is not None
 
-    run_uuid = await mgr.run(entry.config)
+    if submitter is None:
+        submitter = request.client.host if request.client else ""
+    run_uuid = await mgr.run(entry.config, priority, submitter, preempt)
     return S3TestsRunReply(date=dt.now(), uuid=run_uuid)
 
 
@@ -103,6 +127,7 @@ async def get_s3tests_status(
     return S3TestsStatusReply(
         busy=mgr.is_busy(),
         current=mgr.current_run,
+        running=mgr.running_runs,
     )
 
 
@@ -114,7 +139,7 @@ async def get_s3tests_run_status(
 ) -> S3TestsRunStatusReply:
 
     try:
-        res = mgr.get_run(uuid)
+        res = await mgr.get_run(uuid)
     except NoSuchRunError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
@@ -133,10 +158,18 @@ async def get_s3tests_run_errors(
     request: Request,
     uuid: UUID,
     name: Optional[str] = None,
+    start_after: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, gt=0),
     mgr: S3TestsMgr = Depends(s3tests_mgr),
 ) -> S3TestsRunErrorsReply:
+    """
+    Obtains errors for run `uuid`, or only for test `name` if specified.
+    Errors can be paged through by specifying `limit`; the reply's `next`,
+    if set, is to be passed as `start_after` to obtain the next page.
+    """
 
     entries: Dict[str, ErrorTestResult] = {}
+    next: Optional[str] = None
 
     if name is not None:
         try:
@@ -146,9 +179,13 @@ async def get_s3tests_run_errors(
 
         entries[res.name] = res
     else:
-        entries = await mgr.get_errors(uuid)
+        entries = await mgr.get_errors(
+            uuid, start_after=start_after, limit=limit
+        )
+        if limit is not None and len(entries) == limit:
+            next = list(entries.keys())[-1]
 
-    return S3TestsRunErrorsReply(errors=entries)
+    return S3TestsRunErrorsReply(errors=entries, next=next)
 
 
 @router.post("/config", response_model=S3TestsConfigPostReply)
@@ -0,0 +1,59 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+from datetime import datetime as dt
+from typing import Dict, Optional
+
+from api import db
+from fastapi import Depends, Request, HTTPException, status
+from fastapi.routing import APIRouter
+from libstuff.dbm import (
+    DBM,
+    CompactionInfo,
+    CompressionStats,
+    DBMError,
+    ModelCacheStats,
+    StorageStats,
+)
+from pydantic import BaseModel
+
+router: APIRouter = APIRouter(prefix="/status", tags=["status"])
+
+
+class StatusStorageReply(BaseModel):
+    date: dt
+    storage: StorageStats
+    cache: Optional[ModelCacheStats]
+    compression: Optional[Dict[str, CompressionStats]]
+
+
+class StatusCompactReply(BaseModel):
+    date: dt
+    compaction: CompactionInfo
+
+
+@router.get("/storage", response_model=StatusStorageReply)
+async def get_storage(
+    request: Request, dbm: DBM = Depends(db)
+) -> StatusStorageReply:
+    return StatusStorageReply(
+        date=dt.now(),
+        storage=await dbm.storage_stats(),
+        cache=dbm.cache_stats,
+        compression=dbm.compression_stats,
+    )
+
+
+@router.post("/storage/compact", response_model=StatusCompactReply)
+async def post_storage_compact(
+    request: Request, dbm: DBM = Depends(db)
+) -> StatusCompactReply:
+    try:
+        info = await dbm.compact()
+    except DBMError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT)
+    return StatusCompactReply(date=dt.now(), compaction=info)
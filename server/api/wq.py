@@ -5,10 +5,15 @@
 # the Free Software Foundation, either version 3 of the License, or (at
 # your option) any later version.
 
+from typing import Optional
+from uuid import UUID
+
 from api import workqueue
+from common.error import NoSuchItemError
 from controllers.wq.status import WorkQueueState, WorkQueueStatus
+from controllers.wq.types import WQPriority
 from controllers.wq.wq import WorkQueue
-from fastapi import Depends, Request
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.routing import APIRouter
 from pydantic import BaseModel
 
@@ -35,3 +40,37 @@ async def get_workqueue_status(
     request: Request, wq: WorkQueue = Depends(workqueue)
 ) -> WorkQueueGetStatusReply:
     return WorkQueueGetStatusReply(status=await wq.status())
+
+
+@router.post("/{uuid}/bump", response_model=WorkQueueGetReply)
+async def bump_workqueue_item(
+    request: Request,
+    uuid: UUID,
+    priority: Optional[WQPriority] = None,
+    first: bool = False,
+    wq: WorkQueue = Depends(workqueue),
+) -> WorkQueueGetReply:
+    """
+    Changes waiting item `uuid`'s priority and, if `first`, moves it ahead
+    of every other waiting item. Replies with the queue's new state.
+    """
+    try:
+        await wq.bump(uuid, priority, first)
+    except NoSuchItemError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return WorkQueueGetReply(status=await wq.state())
+
+
+@router.delete("/{uuid}", response_model=WorkQueueGetReply)
+async def cancel_workqueue_item(
+    request: Request, uuid: UUID, wq: WorkQueue = Depends(workqueue)
+) -> WorkQueueGetReply:
+    """
+    Cancels item `uuid`: drops it from the queue if waiting, or stops it if
+    running, keeping its results so far. Replies with the queue's new state.
+    """
+    try:
+        await wq.cancel(uuid)
+    except NoSuchItemError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return WorkQueueGetReply(status=await wq.state())
@@ -28,3 +28,7 @@ class NoSuchConfigError(ServerError):
 
 class NoSuchRunError(ServerError):
     pass
+
+
+class NoSuchItemError(ServerError):
+    pass
@@ -7,16 +7,19 @@
 
 import asyncio
 import logging
-import random
 import shutil
 from datetime import datetime as dt
-from typing import Dict, List, Optional, cast
+from typing import Dict, List, Optional, Tuple, cast
 from uuid import UUID, uuid4
 
 from common.error import NoSuchConfigError
 from controllers.bench.config import BenchConfigDesc, BenchTarget
 from controllers.bench.progress import BenchTargetsProgress, TargetProgress
-from controllers.bench.results import ResultItem, Results
+from controllers.bench.results import (
+    ResultItem,
+    Results,
+    ResultsCacheStats,
+)
 from controllers.bench.types import (
     BenchConfig,
     BenchDBNS,
@@ -24,25 +27,32 @@ from controllers.bench.types import (
     BenchResult,
     BenchTargetError,
 )
-from controllers.wq.types import WQItemConfigType, WQItemProgressType
+from controllers.wq.resources import WQPorts, WQResources
+from controllers.wq.types import (
+    WQItemConfigType,
+    WQItemProgressType,
+    WQPriority,
+)
 from controllers.wq.wq import WorkQueue, WQItem, WQItemCB, WQItemKind
-from libstuff.bench.plots import Histogram
+from libstuff.bench.analytics import AnalyticsPool, AnalyzedSamples
+from libstuff.bench.artifacts import ArtifactRef
+from libstuff.bench.plots import (
+    Histogram,
+    HistogramParams,
+    OpSummary,
+    Timeline,
+    TimelineParams,
+)
 from libstuff.bench.runner import (
     BenchmarkPorts,
     BenchmarkRunner,
     BenchmarkTarget,
 )
 from libstuff.bench.warp import WarpBenchmarkState
-from libstuff.dbm import DBM
+from libstuff.dbm import DBM, DBMDurability
 from pydantic import BaseModel
 
 
-def _gen_random_host_port() -> int:
-    FIRST_PORT = 54780
-    LAST_PORT = 54880
-    return random.choice(list(range(FIRST_PORT, LAST_PORT)))
-
-
 class BenchRunDesc(BaseModel):
     config: BenchConfig
     progress: BenchProgress
@@ -51,21 +61,27 @@ class BenchRunDesc(BaseModel):
 class WorkItem(WQItem):
     _runner: BenchmarkRunner
     _config: BenchConfigDesc
+    _analytics: AnalyticsPool
 
     _progress_by_target: Dict[str, TargetProgress]
-    _results: Dict[str, str]
+    _samples: Dict[str, ArtifactRef]
+    _summary: Dict[str, Dict[str, OpSummary]]
 
     def __init__(
         self,
         runner: BenchmarkRunner,
         config: BenchConfigDesc,
+        analytics: AnalyticsPool,
         logger: logging.Logger,
+        uuid: Optional[UUID] = None,
     ) -> None:
-        super().__init__(logger)
+        super().__init__(logger, uuid)
         self._runner = runner
         self._config = config
+        self._analytics = analytics
         self._progress_by_target = {}
-        self._results = {}
+        self._samples = {}
+        self._summary = {}
 
     async def _run(self) -> None:
 
@@ -85,13 +101,17 @@ class WorkItem(WQItem):
             )
 
         for target, conf in self._config.config.targets.items():
+            if self.stop_reason is not None:
+                break
             await self._run_target(target, conf)
 
-        await asyncio.sleep(10)
+        if self.stop_reason is None:
+            await asyncio.sleep(10)
 
     async def _run_target(self, target: str, config: BenchTarget) -> None:
 
-        host_port: int = _gen_random_host_port()
+        # targets run one at a time, on the port assigned to the item.
+        host_port: int = self.ports[0]
         target_conf = BenchmarkTarget(
             image=config.image,
             args=config.args,
@@ -108,25 +128,45 @@ class WorkItem(WQItem):
         try:
             progress.time_start = dt.now()
             progress.is_running = True
-            res: str = await self._runner.run(
-                target, target_conf, progress.progress_cb
+            res: AnalyzedSamples = await self._runner.run(
+                target,
+                target_conf,
+                self._analytics.ingest,
+                progress.progress_cb,
             )
             progress.time_end = dt.now()
-            self._results[target] = res
+            self._samples[target] = res.ref
+            self._summary[target] = res.summary
         except Exception as e:
             self.logger.error(f"error running benchmark target {target}: {e}")
             progress.is_error = True
-            progress.error_str = str(e)
+            if progress.error_str is None:
+                # unless stopped, and saying so already.
+                progress.error_str = str(e)
 
         progress.is_done = True
         progress.is_running = False
 
+    @property
+    def resources(self) -> WQResources:
+        # benchmarks measure the host; anything else running would skew
+        # their results.
+        return WQResources(
+            cpu=1.0,
+            exclusive=True,
+            ports=WQPorts(first=54780, last=54880),
+        )
+
     async def _stop(self) -> None:
+        self._runner.stop()
         for target in self._progress_by_target.values():
-            target.is_done = True
-            target.is_running = False
-            if target.time_start is not None and target.time_end is None:
-                target.time_end = dt.now()
+            if target.is_done:
+                continue
+            # the running target still keeps what samples it took.
+            target.is_error = True
+            target.error_str = f"stopped: {self.stop_reason}"
+            if target.time_start is None:
+                target.is_done = True
 
     @property
     def _progress(self) -> WQItemProgressType:
@@ -162,13 +202,18 @@ class WorkItem(WQItem):
             is_error=(len(errors) > 0),
             errors=errors,
             config=self._config.config,
-            results=self._results,
+            samples=self._samples,
+            summary=self._summary,
         )
 
     @property
     def config(self) -> WQItemConfigType:
         return cast(WQItemConfigType, self._config)
 
+    @property
+    def config_uuid(self) -> UUID:
+        return self._config.uuid
+
 
 class BenchmarkMgr:
 
@@ -183,6 +228,7 @@ class BenchmarkMgr:
 
     _db: DBM
     _wq: WorkQueue
+    _analytics: AnalyticsPool
 
     # _work_item: Optional[WorkItem]
     _current: Optional[WorkItem]
@@ -194,9 +240,17 @@ class BenchmarkMgr:
     NS_CONFIG_BY_UUID = BenchDBNS.NS_CONFIG_BY_UUID
     NS_CONFIG_BY_NAME = BenchDBNS.NS_CONFIG_BY_NAME
     NS_RESULTS = BenchDBNS.NS_RESULTS
+    NS_RESULTS_SUMMARY = BenchDBNS.NS_RESULTS_SUMMARY
     NS_CONFIG_RESULTS = BenchDBNS.NS_CONFIG_RESULTS
 
-    def __init__(self, db: DBM, wq: WorkQueue, logger: logging.Logger) -> None:
+    def __init__(
+        self,
+        db: DBM,
+        wq: WorkQueue,
+        analytics: AnalyticsPool,
+        cache_bytes: int,
+        logger: logging.Logger,
+    ) -> None:
         self._lock = asyncio.Lock()
         self._configs_lock = asyncio.Lock()
         self._task = None
@@ -207,9 +261,11 @@ class BenchmarkMgr:
         self._error_str = None
         self._db = db
         self._wq = wq
+        self._wq.register(WQItemKind.BENCH, self._restore_item)
+        self._analytics = analytics
         # self._work_item = None
         self._current = None
-        self._results = Results(db, logger)
+        self._results = Results(db, analytics, cache_bytes, logger)
         self._configs = {}
         self.logger = logger
 
@@ -243,18 +299,30 @@ class BenchmarkMgr:
         return True
 
     async def _load_results(self) -> None:
-
-        tmp = await self._db.entries(ns=self.NS_RESULTS)
-        for res in tmp.keys():
-            self.logger.debug(f"remove key {res}")
-            await self._db.rm(ns=self.NS_RESULTS, key=res)
-
-        entries = cast(
-            Dict[str, BenchResult],
-            await self._db.entries(ns=self.NS_RESULTS, model=BenchResult),
-        )
-        for res in entries.values():
-            await self._results.add(res)
+        """
+        Load every run's summary. Runs stored before there were summaries
+        have theirs written now, so this only ever happens once.
+        """
+        async for _, item in self._db.scan(
+            ns=self.NS_RESULTS_SUMMARY, model=ResultItem
+        ):
+            self._results.add_item(cast(ResultItem, item))
+
+        missing: List[str] = [
+            k
+            async for k, _ in self._db.scan(ns=self.NS_RESULTS, keys_only=True)
+            if UUID(k) not in self._results.results
+        ]
+        for k in missing:
+            res = await self._db.get_model(
+                ns=self.NS_RESULTS, key=k, model=BenchResult
+            )
+            if res is None:
+                continue
+            item = await self._results.add(res)
+            await self._db.put(ns=self.NS_RESULTS_SUMMARY, key=k, value=item)
+        if len(missing) > 0:
+            self.logger.info(f"wrote summaries for {len(missing)} bench runs")
 
     async def _load_configs(self) -> None:
 
@@ -298,8 +366,11 @@ class BenchmarkMgr:
 
         # handle work item results
         res = item.results
-        await self._db.put(ns=self.NS_RESULTS, key=str(uuid), value=res)
-        await self._results.add(res)
+        desc = await self._results.describe(res)
+        async with self._db.transaction(DBMDurability.SYNC) as tx:
+            tx.put(self.NS_RESULTS, str(uuid), res)
+            tx.put(self.NS_RESULTS_SUMMARY, str(uuid), desc)
+        self._results.add_item(desc)
         # self._work_item = None
 
     def is_available(self) -> bool:
@@ -338,17 +409,37 @@ class BenchmarkMgr:
             self._current = _item
             self._is_busy = True
 
-    async def run(self, desc: BenchConfigDesc) -> UUID:
+    def _make_item(
+        self, desc: BenchConfigDesc, uuid: Optional[UUID] = None
+    ) -> Tuple[WorkItem, WQItemCB]:
         cfg: BenchConfig = desc.config
         date = dt.now().strftime("%Y%m%d-%H%M%S")
         run_name = f"benchmark-{date}"
 
         runner = BenchmarkRunner(run_name, cfg.params, self.logger)
-        item = WorkItem(runner, desc, self.logger)
+        item = WorkItem(runner, desc, self._analytics, self.logger, uuid)
         cb: WQItemCB = WQItemCB(
             start=self._handle_started_item, finish=self._handle_finished_item
         )
-        await self._wq.put(item, WQItemKind.BENCH, cb)
+        return item, cb
+
+    async def _restore_item(
+        self, uuid: UUID, config_uuid: UUID
+    ) -> Tuple[WQItem, WQItemCB]:
+        """Recreate queued run `uuid`, after a restart."""
+        return self._make_item(await self.config_get(uuid=config_uuid), uuid)
+
+    async def run(
+        self,
+        desc: BenchConfigDesc,
+        priority: WQPriority = WQPriority.NORMAL,
+        submitter: str = "",
+        preempt: bool = False,
+    ) -> UUID:
+        item, cb = self._make_item(desc)
+        await self._wq.put(
+            item, WQItemKind.BENCH, cb, priority, submitter, preempt
+        )
         return item.uuid
 
     async def config_create(self, cfg: BenchConfig) -> UUID:
@@ -401,10 +492,22 @@ class BenchmarkMgr:
             return self._configs[_uuid]
 
     async def get_histograms(
-        self, uuid: UUID
+        self, uuid: UUID, params: HistogramParams
     ) -> Dict[str, Dict[str, Histogram]]:
-        return await self._results.get_histograms(uuid)
+        return await self._results.get_histograms(uuid, params)
+
+    async def get_summary(self, uuid: UUID) -> Dict[str, Dict[str, OpSummary]]:
+        return await self._results.get_summary(uuid)
+
+    async def get_timeline(
+        self, uuid: UUID, params: TimelineParams
+    ) -> Dict[str, Dict[str, Timeline]]:
+        return await self._results.get_timeline(uuid, params)
 
     @property
     def results(self) -> Dict[UUID, ResultItem]:
         return self._results.results
+
+    @property
+    def results_cache_stats(self) -> ResultsCacheStats:
+        return self._results.cache_stats
@@ -7,10 +7,19 @@
 import asyncio
 from datetime import datetime as dt
 import logging
+from collections import OrderedDict
 from typing import Dict, List, Optional
 from uuid import UUID
-from pydantic import BaseModel
-from libstuff.bench.plots import Histogram, Plots
+from pydantic import BaseModel, Field
+from libstuff.bench.analytics import AnalyticsPool
+from libstuff.bench.artifacts import ArtifactRef
+from libstuff.bench.plots import (
+    Histogram,
+    HistogramParams,
+    OpSummary,
+    Timeline,
+    TimelineParams,
+)
 from controllers.bench.types import (
     BenchConfig,
     BenchDBNS,
@@ -25,9 +34,16 @@ from common.error import NoSuchRunError
 class ResultTargetItem(BaseModel):
     name: str
     ops: List[str]
+    # number of samples.
+    samples: int = Field(0)
 
 
 class ResultItem(BaseModel):
+    """
+    What's kept in memory of each run, and persisted alongside it so that
+    listing runs doesn't require loading them.
+    """
+
     uuid: UUID
     is_error: bool
     errors: List[BenchTargetError]
@@ -36,41 +52,129 @@ class ResultItem(BaseModel):
     ops: List[ResultTargetItem]
 
 
+class ResultsCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    # loads joined while already in flight.
+    shared_loads: int
+    evictions: int
+    evicted_bytes: int
+    expirations: int
+
+
 class PlotEntry:
+    """
+    A run's samples, per target, and the analytics computed from them so
+    far. Samples stay in the artifact store; analytics are computed by the
+    analytics pool.
+    """
+
+    # distinct histogram, or timeline, parameters kept per run.
+    HISTOGRAMS_MAX: int = 16
+
     last_access: dt
-    plots: Dict[str, Plots]
+    samples: Dict[str, ArtifactRef]
+    summary: Dict[str, Dict[str, OpSummary]]
+    histograms: Dict[HistogramParams, Dict[str, Dict[str, Histogram]]]
+    timelines: Dict[TimelineParams, Dict[str, Dict[str, Timeline]]]
 
-    def __init__(self, last_access: dt, plots: Dict[str, Plots]) -> None:
+    def __init__(
+        self,
+        last_access: dt,
+        samples: Dict[str, ArtifactRef],
+        summary: Dict[str, Dict[str, OpSummary]],
+    ) -> None:
         self.last_access = last_access
-        self.plots = plots
+        self.samples = samples
+        self.summary = summary
+        self.histograms = {}
+        self.timelines = {}
+
+    @property
+    def size(self) -> int:
+        """
+        Estimated bytes this run's histograms and timelines take here. Its
+        samples are kept by the analytics workers, in caches of their own.
+        """
+        size = 256 * len(self.summary)
+        for per_target in self.histograms.values():
+            for per_op in per_target.values():
+                for h in per_op.values():
+                    size += 16 * len(h.counts) + 256
+        for per_target in self.timelines.values():
+            for per_op in per_target.values():
+                for t in per_op.values():
+                    size += 160 * len(t.ops_per_sec) + 256
+                    if t.scatter is not None:
+                        size += 64 * len(t.scatter.time)
+        return size
 
 
 class Results:
+    """
+    Benchmark results, and the analytics of recently used runs.
+
+    Runs are loaded on demand, at most once at a time each: concurrent
+    requests for a run share its load, while different runs load
+    concurrently. Loaded runs are kept in an LRU bounded by their estimated
+    size, and dropped once unused for `_PLOTS_TTL` seconds.
+    """
 
     _PLOTS_TTL: int = 600  # 10 minutes
     _GC_INTERVAL: int = 60  # 1 minute
 
     _results: Dict[UUID, ResultItem]
-    _plots_lock: asyncio.Lock
-    _plots: Dict[UUID, PlotEntry]
+    _summaries: Dict[UUID, Dict[str, Dict[str, OpSummary]]]
+    _plots: "OrderedDict[UUID, PlotEntry]"
+    _loading: Dict[UUID, "asyncio.Task[PlotEntry]"]
+    _max_bytes: int
+    _bytes: int
+    _stats: ResultsCacheStats
 
     _db: DBM
+    _analytics: AnalyticsPool
     _gc_task: Optional[asyncio.Task[None]]
     _stopping: bool
     logger: logging.Logger
 
     def __init__(
-        self, db: DBM, logger: logging.Logger = logging.getLogger()
+        self,
+        db: DBM,
+        analytics: AnalyticsPool,
+        max_bytes: int,
+        logger: logging.Logger = logging.getLogger(),
     ) -> None:
         self._results = {}
-        self._plots_lock = asyncio.Lock()
-        self._plots = {}
+        self._summaries = {}
+        self._plots = OrderedDict()
+        self._loading = {}
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._stats = ResultsCacheStats(
+            entries=0,
+            bytes=0,
+            max_bytes=max_bytes,
+            hits=0,
+            misses=0,
+            shared_loads=0,
+            evictions=0,
+            evicted_bytes=0,
+            expirations=0,
+        )
         self._db = db
+        self._analytics = analytics
         self._gc_task = None
         self._stopping = True
         self.logger = logger
 
-    async def add(self, result: BenchResult) -> ResultItem:
+    async def describe(self, result: BenchResult) -> ResultItem:
+        """
+        Describe `result`. Results stored before there were artifacts are
+        imported to obtain their ops.
+        """
         item = ResultItem(
             uuid=result.uuid,
             is_error=result.is_error,
@@ -79,11 +183,36 @@ class Results:
             config=result.config,
             ops=[],
         )
+        for target, summary in result.summary.items():
+            ref = result.samples.get(target)
+            item.ops.append(
+                ResultTargetItem(
+                    name=target,
+                    ops=list(summary),
+                    samples=0 if ref is None else ref.rows,
+                )
+            )
+        if len(result.results) > 0:
+            plot = await self._load_plot(result.uuid, result)
+            for target in result.results.keys():
+                if target not in plot.summary:
+                    continue
+                item.ops.append(
+                    ResultTargetItem(
+                        name=target,
+                        ops=list(plot.summary[target]),
+                        samples=plot.samples[target].rows,
+                    )
+                )
+
+        return item
+
+    def add_item(self, item: ResultItem) -> None:
         self._results[item.uuid] = item
-        plot = await self._add_plot(result)
-        for target, p in plot.plots.items():
-            item.ops.append(ResultTargetItem(name=target, ops=p.get_ops()))
 
+    async def add(self, result: BenchResult) -> ResultItem:
+        item = await self.describe(result)
+        self.add_item(item)
         return item
 
     async def start(self) -> None:
@@ -97,18 +226,24 @@ class Results:
         await self._gc_task
         self._gc_task = None
 
-    async def _gc(self) -> None:
+    def _drop(self, uuid: UUID) -> int:
+        entry = self._plots.pop(uuid)
+        size = entry.size
+        self._bytes -= size
+        return size
+
+    def _gc(self) -> None:
         now = dt.now()
-        async with self._plots_lock:
-            to_delete: List[UUID] = []
-            for uuid, entry in self._plots.items():
-                td = now - entry.last_access
-                if td.seconds >= self._PLOTS_TTL:
-                    self.logger.info(f"drop plots for uuid {uuid}")
-                    to_delete.append(uuid)
+        to_delete: List[UUID] = []
+        for uuid, entry in self._plots.items():
+            td = now - entry.last_access
+            if td.seconds >= self._PLOTS_TTL:
+                self.logger.info(f"drop plots for uuid {uuid}")
+                to_delete.append(uuid)
 
-            for uuid in to_delete:
-                del self._plots[uuid]
+        for uuid in to_delete:
+            self._drop(uuid)
+            self._stats.expirations += 1
 
     async def _gc_task_fn(self) -> None:
         last_gc = dt.now()
@@ -116,52 +251,216 @@ class Results:
             now = dt.now()
             td = now - last_gc
             if td.seconds >= self._GC_INTERVAL:
-                await self._gc()
+                self._gc()
                 last_gc = now
             await asyncio.sleep(1.0)
 
-    async def _add_plot(self, result: BenchResult) -> PlotEntry:
-        async with self._plots_lock:
-            return await self._add_plot_unsafe(result)
+    def _evict(self) -> None:
+        """Drop least recently used runs until within bounds."""
+        while self._bytes > self._max_bytes and len(self._plots) > 1:
+            uuid = next(iter(self._plots))
+            size = self._drop(uuid)
+            self.logger.info(f"evict plots for uuid {uuid}, {size} bytes")
+            self._stats.evictions += 1
+            self._stats.evicted_bytes += size
 
-    async def _add_plot_unsafe(self, result: BenchResult) -> PlotEntry:
-        if result.uuid in self._plots:
-            return self._plots[result.uuid]
+    def _insert(self, uuid: UUID, entry: PlotEntry) -> None:
+        self._plots[uuid] = entry
+        self._bytes += entry.size
+        self._evict()
 
-        plots: Dict[str, Plots] = {}
-        for target, res in result.results.items():
-            plots[target] = Plots(res)
+    def _resize(self, uuid: UUID, entry: PlotEntry, old_size: int) -> None:
+        if self._plots.get(uuid) is not entry:
+            # evicted meanwhile.
+            return
+        self._bytes += entry.size - old_size
+        self._evict()
 
-        entry = PlotEntry(last_access=dt.now(), plots=plots)
-        self._plots[result.uuid] = entry
-        return entry
+    async def _build_plot(self, result: BenchResult) -> PlotEntry:
+        samples: Dict[str, ArtifactRef] = {}
+        summary: Dict[str, Dict[str, OpSummary]] = {}
+        for target, ref in result.samples.items():
+            if not self._analytics.artifacts.exists(ref.digest):
+                self.logger.error(
+                    f"missing samples for {result.uuid}/{target}: "
+                    f"{ref.digest}"
+                )
+                continue
+            samples[target] = ref
+            summary[target] = result.summary.get(target, {})
+        for target, res in result.results.items():
+            # stored before there were artifacts; import them as such, so
+            # they are analysed like any other.
+            try:
+                imported = await self._analytics.import_json(res)
+            except Exception as e:
+                self.logger.error(
+                    f"unable to import samples for {result.uuid}/{target}: "
+                    f"{e}"
+                )
+                continue
+            samples[target] = imported.ref
+            summary[target] = imported.summary
 
-    async def _load_plot(self, uuid: UUID) -> PlotEntry:
-        async with self._plots_lock:
-            if uuid in self._plots:
-                entry = self._plots[uuid]
-                entry.last_access = dt.now()
-                return entry
+        return PlotEntry(last_access=dt.now(), samples=samples, summary=summary)
 
+    async def _do_load_plot(
+        self, uuid: UUID, result: Optional[BenchResult]
+    ) -> PlotEntry:
+        if result is None:
             # load from dbm
-            db_entry: Optional[BenchResult] = await self._db.get_model(
+            result = await self._db.get_model(
                 ns=BenchDBNS.NS_RESULTS, key=str(uuid), model=BenchResult
             )
-            if db_entry is None:
+            if result is None:
                 raise NoSuchRunError()
 
-            return await self._add_plot_unsafe(db_entry)
+        entry = await self._build_plot(result)
+        self._insert(uuid, entry)
+        return entry
+
+    def _done_loading(
+        self, uuid: UUID, task: "asyncio.Task[PlotEntry]"
+    ) -> None:
+        if self._loading.get(uuid) is task:
+            del self._loading[uuid]
+        if not task.cancelled():
+            # retrieve it, in case no one was left waiting.
+            task.exception()
+
+    async def _load_plot(
+        self, uuid: UUID, result: Optional[BenchResult] = None
+    ) -> PlotEntry:
+        entry = self._plots.get(uuid)
+        if entry is not None:
+            self._plots.move_to_end(uuid)
+            entry.last_access = dt.now()
+            self._stats.hits += 1
+            return entry
+
+        task = self._loading.get(uuid)
+        if task is None:
+            self._stats.misses += 1
+            task = asyncio.create_task(self._do_load_plot(uuid, result))
+            self._loading[uuid] = task
+            task.add_done_callback(lambda t: self._done_loading(uuid, t))
+        else:
+            self._stats.shared_loads += 1
+
+        # a waiter going away must not cancel the load for everyone else.
+        return await asyncio.shield(task)
 
     async def get_histograms(
-        self, uuid: UUID
+        self, uuid: UUID, params: HistogramParams
     ) -> Dict[str, Dict[str, Histogram]]:
-        histograms: Dict[str, Dict[str, Histogram]] = {}
         entry = await self._load_plot(uuid)
-        for target, plot in entry.plots.items():
-            histograms[target] = plot.get_latency_histogram_per_op()
+        cached = entry.histograms.get(params)
+        if cached is not None:
+            return cached
 
+        # targets are analysed in parallel, by different workers.
+        targets = list(entry.samples.keys())
+        res = await asyncio.gather(
+            *[
+                self._analytics.histograms(entry.samples[t].digest, params)
+                for t in targets
+            ]
+        )
+        histograms = dict(zip(targets, res))
+        if not params.raw:
+            old_size = entry.size
+            if len(entry.histograms) >= PlotEntry.HISTOGRAMS_MAX:
+                del entry.histograms[next(iter(entry.histograms))]
+            entry.histograms[params] = histograms
+            self._resize(uuid, entry, old_size)
         return histograms
 
+    async def get_timeline(
+        self, uuid: UUID, params: TimelineParams
+    ) -> Dict[str, Dict[str, Timeline]]:
+        """
+        Obtain per-op timelines of run `uuid`, per target. Raises ValueError
+        if its samples lack timestamps, or would need too many windows.
+        """
+        entry = await self._load_plot(uuid)
+        cached = entry.timelines.get(params)
+        if cached is not None:
+            return cached
+
+        targets = list(entry.samples.keys())
+        res = await asyncio.gather(
+            *[
+                self._analytics.timeline(entry.samples[t].digest, params)
+                for t in targets
+            ]
+        )
+        timelines = dict(zip(targets, res))
+        old_size = entry.size
+        if len(entry.timelines) >= PlotEntry.HISTOGRAMS_MAX:
+            del entry.timelines[next(iter(entry.timelines))]
+        entry.timelines[params] = timelines
+        self._resize(uuid, entry, old_size)
+        return timelines
+
+    async def get_summary(self, uuid: UUID) -> Dict[str, Dict[str, OpSummary]]:
+        """
+        Obtain per-op summaries of run `uuid`, per target. These are computed
+        when a run finishes, and stored with it. Runs stored before, as JSON
+        or with summaries lacking some statistics, have theirs computed and
+        stored now, along with any samples imported as artifacts.
+        """
+        summary = self._summaries.get(uuid)
+        if summary is not None:
+            return summary
+
+        result = await self._db.get_model(
+            ns=BenchDBNS.NS_RESULTS, key=str(uuid), model=BenchResult
+        )
+        if result is None:
+            raise NoSuchRunError()
+
+        summary = dict(result.summary)
+        stale = [
+            target
+            for target, ops in summary.items()
+            if not all(s.is_complete for s in ops.values())
+        ]
+        if len(stale) > 0 or len(result.results) > 0:
+            # the database's cached instance is shared, and read-only.
+            result = result.copy(deep=True)
+            changed = False
+            entry = await self._load_plot(uuid, result)
+            for target in stale:
+                ref = entry.samples.get(target)
+                if ref is not None:
+                    summary[target] = await self._analytics.summary(ref.digest)
+                    changed = True
+            for target in list(result.results.keys()):
+                if target not in entry.samples:
+                    # not imported; its JSON is its samples' only copy.
+                    continue
+                summary[target] = entry.summary[target]
+                result.samples[target] = entry.samples[target]
+                del result.results[target]
+                changed = True
+            if changed:
+                result.summary = summary
+                await self._db.put(
+                    ns=BenchDBNS.NS_RESULTS, key=str(uuid), value=result
+                )
+            if len(result.results) > 0:
+                # try importing the rest again next time.
+                return summary
+
+        self._summaries[uuid] = summary
+        return summary
+
+    @property
+    def cache_stats(self) -> ResultsCacheStats:
+        return self._stats.copy(
+            update={"entries": len(self._plots), "bytes": self._bytes}
+        )
+
     @property
     def results(self) -> Dict[UUID, ResultItem]:
         return self._results
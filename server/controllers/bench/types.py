@@ -10,7 +10,9 @@ from uuid import UUID
 
 from controllers.bench.config import BenchConfig
 from controllers.wq.progress import WQItemProgress
-from pydantic import BaseModel
+from libstuff.bench.artifacts import ArtifactRef
+from libstuff.bench.plots import OpSummary
+from pydantic import BaseModel, Field
 
 BenchProgress = WQItemProgress
 
@@ -26,7 +28,12 @@ class BenchResult(BaseModel):
     is_error: bool
     errors: List[BenchTargetError]
     config: BenchConfig
-    results: Dict[str, str]
+    # raw samples per target, in the artifact store, and their summary per
+    # target and op.
+    samples: Dict[str, ArtifactRef] = Field({})
+    summary: Dict[str, Dict[str, OpSummary]] = Field({})
+    # raw samples per target, as JSON, for results stored before artifacts.
+    results: Dict[str, str] = Field({})
 
 
 class BenchDBNS:
@@ -34,4 +41,5 @@ class BenchDBNS:
     NS_CONFIG_BY_UUID = "bench-config"
     NS_CONFIG_BY_NAME = "bench-config-by-name"
     NS_RESULTS = "bench-results"
+    NS_RESULTS_SUMMARY = "bench-results-summary"
     NS_CONFIG_RESULTS = "bench-config-results"
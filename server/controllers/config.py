@@ -8,18 +8,71 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Optional
 
 import yaml
 from common.error import ServerError
-from pydantic import BaseModel, ValidationError
+from libstuff.bench.plots import LatencyPrecision
+from libstuff.dbm import (
+    CompactionConfig,
+    CompressionConfig,
+    DBMCodec,
+    DBMDurability,
+    DBMEngine,
+    ModelCacheConfig,
+)
+from pydantic import BaseModel, Field, ValidationError
 
 
 class ServerConfigError(ServerError):
     pass
 
 
+class ServerDBConfig(BaseModel):
+    path: Path = Field(Path("./server.db"))
+    engine: DBMEngine = Field(DBMEngine.GDBM)
+    codec: DBMCodec = Field(DBMCodec.MSGPACK)
+    cache: Optional[ModelCacheConfig] = Field(None)
+    compression: Optional[CompressionConfig] = Field(None)
+    durability: DBMDurability = Field(DBMDurability.PERIODIC)
+    sync_interval: float = Field(5.0)
+    compaction: Optional[CompactionConfig] = Field(CompactionConfig())
+
+
+class ServerBenchConfig(BaseModel):
+    # where raw benchmark samples are kept.
+    artifacts_path: Path = Field(Path("./bench-artifacts"))
+    # processes analysing results; defaults to the number of CPUs.
+    analytics_workers: Optional[int] = Field(None, gt=0)
+    # precision benchmark latencies are kept in; float16 halves their size
+    # at the cost of about 3 significant digits.
+    latency_precision: LatencyPrecision = Field(LatencyPrecision.FLOAT32)
+    # bound on the estimated memory taken by the runs being analysed, by
+    # the analytics workers and the server together.
+    results_cache_bytes: int = Field(1024**3, gt=0)
+
+
+class ServerWorkQueueConfig(BaseModel):
+    # at most this many items of each kind run at once, as long as the
+    # host's resources allow; benchmarks always run on their own.
+    bench_slots: int = Field(1, gt=0)
+    s3tests_slots: int = Field(2, gt=0)
+    # times an item is started, across server restarts interrupting it,
+    # before it's given up on.
+    max_attempts: int = Field(2, gt=0)
+    # share of the queue each kind gets, relative to the others, when both
+    # have items waiting.
+    bench_weight: float = Field(1.0, gt=0)
+    s3tests_weight: float = Field(1.0, gt=0)
+    # seconds an item must wait for lower priority items put after it to
+    # go ahead of higher priority ones, per priority level between them.
+    aging: float = Field(600.0, gt=0)
+
+
 class ServerConfig(BaseModel):
-    pass
+    db: ServerDBConfig = Field(ServerDBConfig())
+    bench: ServerBenchConfig = Field(ServerBenchConfig())
+    workqueue: ServerWorkQueueConfig = Field(ServerWorkQueueConfig())
 
     @staticmethod
     def parse(conffile: Path) -> ServerConfig:
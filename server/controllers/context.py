@@ -5,13 +5,14 @@
 # the Free Software Foundation, either version 3 of the License, or (at
 # your option) any later version.
 
-from pathlib import Path
-
 from fastapi.logger import logger
+from libstuff.bench.analytics import AnalyticsPool
+from libstuff.bench.artifacts import ArtifactStore
 from libstuff.dbm import DBM
 from controllers.config import ServerConfig
 from controllers.s3tests.mgr import S3TestsMgr
 from controllers.bench.mgr import BenchmarkMgr
+from controllers.wq.types import WQItemKind
 from controllers.wq.wq import WorkQueue
 
 
@@ -22,17 +23,61 @@ class ServerContext:
     _config: ServerConfig
     _wq: WorkQueue
     _db: DBM
+    _artifacts: ArtifactStore
+    _analytics: AnalyticsPool
 
     def __init__(self, config: ServerConfig) -> None:
         self._config = config
-        _dbpath = Path("./server.db").resolve()
-        self._db = DBM(_dbpath)
-        self._wq = WorkQueue(logger)
+        _dbpath = config.db.path.resolve()
+        self._db = DBM(
+            _dbpath,
+            config.db.engine,
+            codec=config.db.codec,
+            cache=config.db.cache,
+            compression=config.db.compression,
+            durability=config.db.durability,
+            sync_interval=config.db.sync_interval,
+            compaction=config.db.compaction,
+            logger=logger,
+        )
+        self._artifacts = ArtifactStore(config.bench.artifacts_path)
+        # the results cache is shared: most of it for samples, kept by the
+        # analytics workers, the rest for the plots the server keeps.
+        cache_bytes = config.bench.results_cache_bytes
+        samples_bytes = cache_bytes * 3 // 4
+        self._analytics = AnalyticsPool(
+            self._artifacts,
+            config.bench.analytics_workers,
+            config.bench.latency_precision,
+            samples_bytes,
+            logger,
+        )
+        self._wq = WorkQueue(
+            self._db,
+            {
+                WQItemKind.BENCH: config.workqueue.bench_slots,
+                WQItemKind.S3TESTS: config.workqueue.s3tests_slots,
+            },
+            config.workqueue.max_attempts,
+            {
+                WQItemKind.BENCH: config.workqueue.bench_weight,
+                WQItemKind.S3TESTS: config.workqueue.s3tests_weight,
+            },
+            config.workqueue.aging,
+            logger,
+        )
 
         self._s3tests = S3TestsMgr(self._db, self._wq)
-        self._bench = BenchmarkMgr(self._db, self._wq, logger)
+        self._bench = BenchmarkMgr(
+            self._db,
+            self._wq,
+            self._analytics,
+            cache_bytes - samples_bytes,
+            logger,
+        )
 
     async def start(self) -> None:
+        self._analytics.start()
         await self._s3tests.start()
         await self._bench.start()
         await self._wq.start()
@@ -41,6 +86,12 @@ class ServerContext:
         await self._wq.stop()
         await self._s3tests.stop()
         await self._bench.stop()
+        await self._analytics.stop()
+        await self._db.close()
+
+    @property
+    def db(self) -> DBM:
+        return self._db
 
     @property
     def s3tests(self) -> S3TestsMgr:
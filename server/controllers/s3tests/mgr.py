@@ -11,18 +11,19 @@ import random
 import string
 from datetime import datetime as dt
 from pathlib import Path
-from typing import Dict, List, Optional, cast
+from typing import Dict, List, Optional, Tuple, cast
 from uuid import UUID, uuid4
 
 from common.error import NoSuchConfigError, NoSuchRunError, ServerError
 from controllers.s3tests.config import S3TestsConfigDesc, S3TestsConfigEntry
 from controllers.s3tests.progress import S3TestRunProgress
 from controllers.wq.progress import WQItemProgress, WQItemProgressType
-from controllers.wq.types import WQItemConfigType
+from controllers.wq.resources import WQPorts, WQResources
+from controllers.wq.types import WQItemConfigType, WQPriority
 from controllers.wq.wq import WorkQueue, WQItem, WQItemCB, WQItemKind
 from fastapi.logger import logger
 from libstuff import git
-from libstuff.dbm import DBM
+from libstuff.dbm import DBM, DBMDurability
 from libstuff.s3tests.runner import (
     CollectedTests,
     ContainerRunConfig,
@@ -56,6 +57,45 @@ class S3TestsConfigItem(BaseModel):
     tests: CollectedTests
 
 
+class S3TestRunSummary(BaseModel):
+    """
+    What's kept in memory of each run, and listed: the run without its
+    per-test results, which are loaded from the database on demand.
+    """
+
+    uuid: UUID
+    time_start: Optional[dt]
+    time_end: Optional[dt]
+    config_uuid: UUID
+    config_name: str
+    is_error: bool
+    error_msg: str
+    total: int
+    passed: int
+    error: int
+    failed: int
+
+    @staticmethod
+    def from_result(res: S3TestRunResult) -> "S3TestRunSummary":
+        counts: Dict[str, int] = {"ok": 0, "error": 0, "fail": 0}
+        for r in res.results.values():
+            if r in counts:
+                counts[r] += 1
+        return S3TestRunSummary(
+            uuid=res.uuid,
+            time_start=res.time_start,
+            time_end=res.time_end,
+            config_uuid=res.config.uuid,
+            config_name=res.config.desc.name,
+            is_error=res.is_error,
+            error_msg=res.error_msg,
+            total=len(res.results),
+            passed=counts["ok"],
+            error=counts["error"],
+            failed=counts["fail"],
+        )
+
+
 class S3TestsResultSummary(BaseModel):
     date: dt
     config_uuid: UUID
@@ -72,13 +112,6 @@ def _gen_random_container_name() -> str:
     return f"s3tests-{ts}-{rnd}"
 
 
-def _gen_random_container_port() -> int:
-    FIRST_PORT = 44780
-    LAST_PORT = 44880
-    ports = list(range(FIRST_PORT, LAST_PORT))
-    return random.choice(ports)
-
-
 class WorkItem(WQItem):
     _runner: S3TestsRunner
     _config: S3TestsConfigEntry
@@ -95,8 +128,9 @@ class WorkItem(WQItem):
         runner: S3TestsRunner,
         config: S3TestsConfigEntry,
         logger: logging.Logger,
+        uuid: Optional[UUID] = None,
     ) -> None:
-        super().__init__(logger)
+        super().__init__(logger, uuid)
         self._runner = runner
         self._config = config
         self._results = TestRunResult(results=[], errors={})
@@ -118,7 +152,7 @@ class WorkItem(WQItem):
             _config = self._config.desc.config
             _cconf = ContainerRunConfig(
                 name=_gen_random_container_name(),
-                host_port=_gen_random_container_port(),
+                host_port=self.ports[0],
                 config=_config.container,
             )
 
@@ -131,8 +165,14 @@ class WorkItem(WQItem):
             self._is_error = True
             self._error_str = str(e)
 
+    @property
+    def resources(self) -> WQResources:
+        # the tests mostly wait on the gateway, in its own container, on
+        # its own port; a few runs can share the host.
+        return WQResources(cpu=0.25, ports=WQPorts(first=44780, last=44880))
+
     async def _stop(self) -> None:
-        pass
+        await self._runner.stop()
 
     @property
     def _progress(self) -> Optional[WQItemProgressType]:
@@ -187,11 +227,15 @@ class WorkItem(WQItem):
         return self._is_done
 
     def is_error(self) -> bool:
-        return self._is_error
+        return self._is_error or self.stop_reason is not None
 
     @property
     def error(self) -> str:
-        return "" if self._error_str is None else self._error_str
+        if self._error_str is not None:
+            return self._error_str
+        if self.stop_reason is not None:
+            return f"stopped: {self.stop_reason}"
+        return ""
 
 
 class S3TestsMgr:
@@ -205,13 +249,15 @@ class S3TestsMgr:
     _wq: WorkQueue
     _s3tests_path: Path
 
-    _current: Optional[WorkItem]
-    _results: Dict[UUID, S3TestRunResult]
+    # runs in progress, in the order they started.
+    _running: Dict[UUID, WorkItem]
+    _results: Dict[UUID, S3TestRunSummary]
     _configs: Dict[UUID, S3TestsConfigItem]
 
     NS_UUID = "s3tests-config"
     NS_NAME = "s3tests-config-by-name"
     NS_TESTS = "s3tests-results"
+    NS_TESTS_SUMMARY = "s3tests-results-summary"
     NS_TESTS_ERRORS = "s3tests-results-errors"
     NS_TESTS_CONFIG_RESULTS = "s3tests-config-results"
 
@@ -222,8 +268,9 @@ class S3TestsMgr:
         self._is_shutting_down = False
         self._db = db
         self._wq = wq
+        self._wq.register(WQItemKind.S3TESTS, self._restore_item)
         self._s3tests_path = Path("./s3tests.git").resolve()
-        self._current = None
+        self._running = {}
         self._results = {}
         self._configs = {}
 
@@ -259,12 +306,31 @@ class S3TestsMgr:
             )
 
     async def _load_results(self) -> None:
-        db_entries = cast(
-            Dict[str, S3TestRunResult],
-            await self._db.entries(ns=self.NS_TESTS, model=S3TestRunResult),
-        )
-        for k, v in db_entries.items():
-            self._results[UUID(k)] = v
+        """
+        Load every run's summary. Runs stored before there were summaries
+        have theirs written now, so this only ever happens once.
+        """
+        async for k, v in self._db.scan(
+            ns=self.NS_TESTS_SUMMARY, model=S3TestRunSummary
+        ):
+            self._results[UUID(k)] = cast(S3TestRunSummary, v)
+
+        missing: List[str] = [
+            k
+            async for k, _ in self._db.scan(ns=self.NS_TESTS, keys_only=True)
+            if UUID(k) not in self._results
+        ]
+        for k in missing:
+            res = await self._db.get_model(
+                ns=self.NS_TESTS, key=k, model=S3TestRunResult
+            )
+            if res is None:
+                continue
+            summary = S3TestRunSummary.from_result(res)
+            await self._db.put(ns=self.NS_TESTS_SUMMARY, key=k, value=summary)
+            self._results[UUID(k)] = summary
+        if len(missing) > 0:
+            logger.info(f"wrote summaries for {len(missing)} s3tests runs")
 
     async def _load_configs(self) -> None:
         db_entries = await self._db.entries(
@@ -306,26 +372,15 @@ class S3TestsMgr:
 
         # handle work item results
         res = item.results
-        await self._db.put(ns=self.NS_TESTS, key=str(uuid), value=res)
-        self._results[uuid] = res
-
-        # handle work item errors
-        #  stores them at 's3tests-results-errors/uuid/testname'
-        errors = item.errors
-        for name, entry in errors.items():
-            key = str(uuid) + "/" + name
-            await self._db.put(ns=self.NS_TESTS_ERRORS, key=key, value=entry)
 
         # store association between config and the results
         config_uuid = item.config_uuid
         k = f"{config_uuid}/{uuid}"
 
-        resdict: Dict[str, int] = {"ok": 0, "error": 0, "fail": 0}
-        for _, r in res.results.items():
-            if r not in resdict:
+        for r in res.results.values():
+            if r not in ("ok", "error", "fail"):
                 logger.error(f"unknown result '{r}'.")
-                continue
-            resdict[r] = resdict[r] + 1
+        run_summary = S3TestRunSummary.from_result(res)
 
         assert res.time_end is not None
         assert res.time_start is not None
@@ -335,16 +390,21 @@ class S3TestsMgr:
             config_uuid=config_uuid,
             result_uuid=uuid,
             duration=dur.seconds,
-            passed=resdict["ok"],
-            error=resdict["error"],
-            failed=resdict["fail"],
-        )
-        await self._db.put(
-            ns=self.NS_TESTS_CONFIG_RESULTS, key=k, value=summary
+            passed=run_summary.passed,
+            error=run_summary.error,
+            failed=run_summary.failed,
         )
 
-        self._work_item = None
-        pass
+        # store the whole run in one go.
+        #  errors are kept at 's3tests-results-errors/uuid/testname'
+        async with self._db.transaction(DBMDurability.SYNC) as tx:
+            tx.put(self.NS_TESTS, str(uuid), res)
+            tx.put(self.NS_TESTS_SUMMARY, str(uuid), run_summary)
+            for name, entry in item.errors.items():
+                tx.put(self.NS_TESTS_ERRORS, f"{uuid}/{name}", entry)
+            tx.put(self.NS_TESTS_CONFIG_RESULTS, k, summary)
+
+        self._results[uuid] = run_summary
 
     async def _tick(self) -> None:
         while not self._is_shutting_down:
@@ -368,44 +428,61 @@ class S3TestsMgr:
         return not self._is_shutting_down and self._task is not None
 
     def is_busy(self) -> bool:
-        return self.is_running() and self._current is not None
+        return self.is_running() and len(self._running) > 0
 
     async def _handle_started_item(self, item: WQItem) -> None:
         _item: WorkItem = cast(WorkItem, item)
         logger.debug(f"starting work item uuid {_item.uuid}")
         async with self._lock:
-            assert not self.is_busy()
-            assert self._current is None
-            self._current = _item
+            assert _item.uuid not in self._running
+            self._running[_item.uuid] = _item
 
     async def _handle_finished_item(self, item: WQItem) -> None:
         _item: WorkItem = cast(WorkItem, item)
         logger.debug(f"finished work item uuid {_item.uuid}")
         async with self._lock:
-            assert self.is_busy()
-            assert self._current is not None
-            assert self._current.uuid == item.uuid
+            assert _item.uuid in self._running
             await self._handle_work_item_results(_item)
-            self._current = None
+            del self._running[_item.uuid]
 
-    async def run(self, cfg: S3TestsConfigEntry) -> UUID:
-        async with self._lock:
-            isodate = dt.now().isoformat()
-            run_name = f"s3tests-{isodate}"
+    def _make_item(
+        self, cfg: S3TestsConfigEntry, uuid: Optional[UUID] = None
+    ) -> Tuple[WorkItem, WQItemCB]:
+        isodate = dt.now().isoformat()
+        run_name = f"s3tests-{isodate}"
 
-            runner: S3TestsRunner = S3TestsRunner(
-                run_name,
-                self._s3tests_path,
-                logger,
-            )
-            item = WorkItem(runner, cfg, logger)
-            cb: WQItemCB = WQItemCB(
-                start=self._handle_started_item,
-                finish=self._handle_finished_item,
-            )
-            await self._wq.put(item, WQItemKind.S3TESTS, cb)
-            return item.uuid
-        pass
+        runner: S3TestsRunner = S3TestsRunner(
+            run_name,
+            self._s3tests_path,
+            logger,
+        )
+        item = WorkItem(runner, cfg, logger, uuid)
+        cb: WQItemCB = WQItemCB(
+            start=self._handle_started_item,
+            finish=self._handle_finished_item,
+        )
+        return item, cb
+
+    async def _restore_item(
+        self, uuid: UUID, config_uuid: UUID
+    ) -> Tuple[WQItem, WQItemCB]:
+        """Recreate queued run `uuid`, after a restart."""
+        entry = await self.config_get(uuid=config_uuid)
+        return self._make_item(entry.config, uuid)
+
+    async def run(
+        self,
+        cfg: S3TestsConfigEntry,
+        priority: WQPriority = WQPriority.NORMAL,
+        submitter: str = "",
+        preempt: bool = False,
+    ) -> UUID:
+        # not under the lock, which the queue's callbacks take.
+        item, cb = self._make_item(cfg)
+        await self._wq.put(
+            item, WQItemKind.S3TESTS, cb, priority, submitter, preempt
+        )
+        return item.uuid
 
     async def config_create(self, desc: S3TestsConfigDesc) -> UUID:
         name = desc.name.strip()
@@ -449,31 +526,45 @@ class S3TestsMgr:
 
             return self._configs[_uuid]
 
-    def get_run(self, uuid: UUID) -> S3TestRunResult:
+    async def get_run(self, uuid: UUID) -> S3TestRunResult:
+        """Obtain run `uuid`, with its per-test results."""
         if uuid in self._results:
-            return self._results[uuid]
-
-        elif self.is_busy():
-            assert self._work_item is not None
-            res = self._work_item.results
-            if res.uuid == uuid:
+            res = await self._db.get_model(
+                ns=self.NS_TESTS, key=str(uuid), model=S3TestRunResult
+            )
+            if res is not None:
                 return res
 
+        elif uuid in self._running:
+            return self._running[uuid].results
+
         raise NoSuchRunError()
 
-    async def get_errors(self, uuid: UUID) -> Dict[str, ErrorTestResult]:
+    async def get_errors(
+        self,
+        uuid: UUID,
+        *,
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, ErrorTestResult]:
+        """
+        Obtain errors for run `uuid`, by test name, in ascending order. If
+        `start_after` is specified, only tests after it are returned; if
+        `limit` is specified, at most `limit` tests are returned.
+        """
         prefix = str(uuid) + "/"
-        res: Dict[str, ErrorTestResult] = cast(
-            Dict[str, ErrorTestResult],
-            await self._db.entries(
-                ns=self.NS_TESTS_ERRORS, prefix=prefix, model=ErrorTestResult
-            ),
-        )
+        after = None if start_after is None else prefix + start_after
         entries: Dict[str, ErrorTestResult] = {}
-        for k, v in res.items():
+        async for k, v in self._db.scan(
+            ns=self.NS_TESTS_ERRORS,
+            prefix=prefix,
+            start_after=after,
+            limit=limit,
+            model=ErrorTestResult,
+        ):
             assert k.startswith(prefix)
             name = k[len(prefix) :]
-            entries[name] = v
+            entries[name] = cast(ErrorTestResult, v)
 
         return entries
 
@@ -507,12 +598,17 @@ class S3TestsMgr:
         return lst
 
     @property
-    def results(self) -> Dict[UUID, S3TestRunResult]:
+    def results(self) -> Dict[UUID, S3TestRunSummary]:
         return self._results
 
     @property
     def current_run(self) -> Optional[S3TestRunDesc]:
-        if not self.is_busy():
-            return None
-        assert self._current is not None
-        return self._current.desc
+        """The first of the runs in progress, if any."""
+        runs = self.running_runs
+        return runs[0] if len(runs) > 0 else None
+
+    @property
+    def running_runs(self) -> List[S3TestRunDesc]:
+        if not self.is_running():
+            return []
+        return [item.desc for item in self._running.values()]
@@ -0,0 +1,84 @@
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+from typing import Any, Dict, List, Optional, Set
+
+from pydantic import BaseModel, Field, root_validator
+
+
+class WQPorts(BaseModel):
+    # host ports in [first, last) an item may bind; `count` of them are
+    # assigned to it while it runs.
+    first: int = Field(gt=0, lt=65536)
+    last: int = Field(gt=0, le=65536)
+    count: int = Field(1, gt=0)
+
+    @root_validator(skip_on_failure=True)
+    def _check_range(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        if values["last"] - values["first"] < values["count"]:
+            raise ValueError("port range too small for count")
+        return values
+
+
+class WQResources(BaseModel):
+    # share of the host's CPUs the item keeps busy.
+    cpu: float = Field(1.0, gt=0, le=1.0)
+    # run with nothing else on the host, e.g. benchmarks, which would both
+    # disturb and be disturbed by anything running alongside.
+    exclusive: bool = False
+    ports: Optional[WQPorts] = None
+
+
+class WQResourceTracker:
+    """Host resources held by running work items."""
+
+    _cpu: float
+    _exclusive: bool
+    _num_items: int
+    _ports: Set[int]
+
+    def __init__(self) -> None:
+        self._cpu = 0.0
+        self._exclusive = False
+        self._num_items = 0
+        self._ports = set()
+
+    def _free_ports(self, ports: Optional[WQPorts]) -> List[int]:
+        if ports is None:
+            return []
+        return [
+            p for p in range(ports.first, ports.last) if p not in self._ports
+        ][: ports.count]
+
+    def fits(self, res: WQResources) -> bool:
+        if self._exclusive:
+            return False
+        if res.exclusive and self._num_items > 0:
+            return False
+        # allow for rounding when adding up shares.
+        if self._cpu + res.cpu > 1.0 + 1e-9:
+            return False
+        return res.ports is None or len(self._free_ports(res.ports)) == (
+            res.ports.count
+        )
+
+    def acquire(self, res: WQResources) -> List[int]:
+        """Take `res`, which must fit; obtain the ports assigned."""
+        assert self.fits(res)
+        ports = self._free_ports(res.ports)
+        self._cpu += res.cpu
+        self._exclusive = res.exclusive
+        self._num_items += 1
+        self._ports.update(ports)
+        return ports
+
+    def release(self, res: WQResources, ports: List[int]) -> None:
+        assert self._num_items > 0
+        self._num_items -= 1
+        self._cpu = max(self._cpu - res.cpu, 0.0) if self._num_items else 0.0
+        self._exclusive = False
+        self._ports.difference_update(ports)
@@ -14,6 +14,7 @@ from controllers.wq.progress import WQItemProgress
 from controllers.wq.types import (
     WQItemConfigType,
     WQItemKind,
+    WQPriority,
 )
 
 
@@ -25,6 +26,9 @@ class WorkQueueStatusItem(BaseModel):
     time_start: Optional[dt]
     time_end: Optional[dt]
     duration: int
+    priority: Optional[WQPriority] = None
+    submitter: Optional[str] = None
+    error: Optional[str] = None
 
 
 class WorkQueueStatusEntry(BaseModel):
@@ -36,9 +40,14 @@ class WorkQueueStatusEntry(BaseModel):
 class WorkQueueState(BaseModel):
     waiting: List[WorkQueueStatusItem]
     finished: List[WorkQueueStatusItem]
+    # the first of the running items, in the order they started.
     current: Optional[WorkQueueStatusItem]
+    running: List[WorkQueueStatusItem]
+    # interrupted by a server restart, and not retried.
+    interrupted: List[WorkQueueStatusItem]
 
 
 class WorkQueueStatus(BaseModel):
     is_running: bool
     current: Optional[WorkQueueStatusEntry]
+    running: List[WorkQueueStatusEntry]
@@ -28,3 +28,10 @@ class WQItemKind(Enum):
     NONE = 0
     BENCH = 1
     S3TESTS = 2
+
+
+class WQPriority(str, Enum):
+    LOW = "low"
+    NORMAL = "normal"
+    HIGH = "high"
+    URGENT = "urgent"
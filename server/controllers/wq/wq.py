@@ -8,13 +8,18 @@
 import abc
 import asyncio
 import copy
+import heapq
 import logging
-from collections import deque
+import time
 from datetime import datetime as dt
-from typing import Awaitable, Callable, List, Optional
+from enum import Enum
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from uuid import UUID, uuid4
 
+from common.error import NoSuchItemError, ServerError
 from controllers.wq.progress import WQItemProgress
+from controllers.wq.resources import WQResources, WQResourceTracker
 from controllers.wq.status import (
     WorkQueueState,
     WorkQueueStatus,
@@ -25,7 +30,10 @@ from controllers.wq.types import (
     WQItemConfigType,
     WQItemKind,
     WQItemProgressType,
+    WQPriority,
 )
+from libstuff.dbm import DBM, DBMDurability
+from pydantic import BaseModel
 
 
 class WQItem(abc.ABC):
@@ -35,20 +43,43 @@ class WQItem(abc.ABC):
     _time_end: Optional[dt]
     _is_running: bool
     _is_done: bool
+    _stop_reason: Optional[str]
+    _ports: List[int]
     logger: logging.Logger
 
-    def __init__(self, logger: logging.Logger) -> None:
-        self._uuid = uuid4()
+    def __init__(
+        self, logger: logging.Logger, uuid: Optional[UUID] = None
+    ) -> None:
+        self._uuid = uuid if uuid is not None else uuid4()
         self._time_start = None
         self._time_end = None
         self._is_running = False
         self._is_done = False
+        self._stop_reason = None
+        self._ports = []
         self.logger = logger
 
     @property
     def uuid(self) -> UUID:
         return self._uuid
 
+    @property
+    def resources(self) -> WQResources:
+        """
+        What the item needs of the host while running. By default, all of
+        its CPUs, so items that don't say otherwise run one at a time.
+        """
+        return WQResources()
+
+    @property
+    def ports(self) -> List[int]:
+        """Host ports assigned to the item, as its resources asked."""
+        return self._ports
+
+    @ports.setter
+    def ports(self, ports: List[int]) -> None:
+        self._ports = ports
+
     @property
     def time_start(self) -> Optional[dt]:
         return self._time_start
@@ -82,6 +113,11 @@ class WQItem(abc.ABC):
     def is_done(self) -> bool:
         return self._is_done
 
+    @property
+    def stop_reason(self) -> Optional[str]:
+        """Why the item was stopped before it was done, if it was."""
+        return self._stop_reason
+
     async def run(self) -> None:
         assert not self._is_done
         assert self._time_end is None
@@ -89,20 +125,26 @@ class WQItem(abc.ABC):
         self._time_start = dt.now()
 
         self.logger.debug(f"running work item uuid {self.uuid}")
-        await self._run()
+        try:
+            await self._run()
+        finally:
+            # done, even if it failed or its task was cancelled, so its
+            # results can still be handled.
+            self._is_done = True
+            self._is_running = False
+            self._time_end = dt.now()
         self.logger.debug(f"done running work item uuid {self.uuid}")
 
-        self._is_done = True
-        self._is_running = False
-        self._time_end = dt.now()
-
-    async def stop(self) -> None:
+    async def stop(self, reason: str = "stopped") -> None:
+        """
+        Stop the running item as soon as possible. Its `run()` returns
+        shortly after, with whatever results it had so far.
+        """
         if not self._is_running:
             return
 
+        self._stop_reason = reason
         await self._stop()
-        self._is_running = False
-        self._time_end = dt.now()
 
     @abc.abstractmethod
     async def _run(self) -> None:
@@ -122,6 +164,12 @@ class WQItem(abc.ABC):
     def config(self) -> WQItemConfigType:
         pass
 
+    @property
+    @abc.abstractmethod
+    def config_uuid(self) -> UUID:
+        """The config the item runs, by which it's restored."""
+        pass
+
 
 WQItemFinishCB = Callable[[WQItem], Awaitable[None]]
 WQItemStartCB = Callable[[WQItem], Awaitable[None]]
@@ -136,41 +184,211 @@ class WQItemCB:
         self.finish = finish
 
 
+class WQItemState(str, Enum):
+    WAITING = "waiting"
+    RUNNING = "running"
+    # was running when the server stopped; retried, or reported once out
+    # of attempts.
+    INTERRUPTED = "interrupted"
+
+
+class WQItemRecord(BaseModel):
+    """
+    What's kept of a queued item in the database, from when it's put until
+    it finishes; enough to queue it again after a restart.
+    """
+
+    uuid: UUID
+    kind: WQItemKind
+    config: UUID
+    state: WQItemState
+    # order in which items were put.
+    seq: int
+    priority: WQPriority = WQPriority.NORMAL
+    submitter: str = ""
+    # may stop running items of lower priority to start; see WorkQueue.
+    preempt: bool = False
+    # waiting items run lowest rank first; see WorkQueue.
+    rank: float = 0.0
+    time_queued: dt
+    time_start: Optional[dt] = None
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+_PRIORITY_LEVELS: Dict[WQPriority, int] = {
+    WQPriority.LOW: 0,
+    WQPriority.NORMAL: 1,
+    WQPriority.HIGH: 2,
+    WQPriority.URGENT: 3,
+}
+# seconds of queue time each item takes of its flow's share.
+_FAIR_SHARE_QUANTUM = 60.0
+# forget flows idle for a while, once there are this many.
+_FLOWS_MAX = 1024
+# seconds a stopped item has to wrap up before its task is cancelled.
+_STOP_GRACE = 120.0
+
+# a record to write, or None to remove it, by key; and a future done once
+# that's written.
+_RecordWrite = Tuple[str, Optional[WQItemRecord], "asyncio.Future[None]"]
+
+# recreates item `uuid`, of config `config`, for the queue to restore it;
+# raises ServerError if it can't, e.g. if its config is gone.
+WQItemFactory = Callable[[UUID, UUID], Awaitable[Tuple[WQItem, WQItemCB]]]
+
+
 class WQEntry:
     item: WQItem
     kind: WQItemKind
     cb: WQItemCB
-
-    def __init__(self, item: WQItem, kind: WQItemKind, cb: WQItemCB) -> None:
+    resources: WQResources
+    record: WQItemRecord
+    # queue the item's config again once it stops, having been preempted.
+    requeue: bool
+
+    def __init__(
+        self,
+        item: WQItem,
+        kind: WQItemKind,
+        cb: WQItemCB,
+        record: WQItemRecord,
+    ) -> None:
         self.item = item
         self.kind = kind
         self.cb = cb
+        self.resources = item.resources
+        self.record = record
+        self.requeue = False
 
 
 class WorkQueue:
+    """
+    Runs work items, in order of priority and fair share, as many at once as
+    their kinds' slots and the host's resources allow.
+
+    Waiting items are ordered by rank, lowest first, fixed when they're put.
+    Items of each kind and submitter form a flow, and each flow's items are
+    spaced out in time by `_FAIR_SHARE_QUANTUM` seconds divided by their
+    kind's weight: an item's start tag is the later of now and its flow's
+    previous item's tag plus that spacing, so a burst from one flow
+    interleaves with other flows' items instead of going ahead of them all.
+    An item's rank is its start tag minus `aging` seconds per priority
+    level. Higher priority items thus go ahead of lower priority ones put
+    up to `aging` seconds per level before them, but not earlier: waiting
+    ages low priority items up, and nothing starves. Ranks never change
+    while waiting, except when items are bumped, so waiting items are kept
+    in a heap per kind, and picking the next item takes O(log n).
+
+    Each kind of item has a number of slots, at most that many of its items
+    running at once. Each item declares the resources it needs, see
+    `WQResources`: an item starts once a slot of its kind is free and its
+    resources fit alongside those of the running items. Items of other
+    kinds may start ahead of one that doesn't fit yet, except for exclusive
+    items: nothing starts ahead of those, so they get the host once the
+    running items are done.
+
+    Dispatch is event-driven: the dispatcher task sleeps on a condition
+    until an item is put, a running item's task finishes, or the queue is
+    stopped, and only then looks at the queue. Items start as soon as they
+    can, and an idle queue does no work at all. Items' start and finish
+    callbacks are called in order after each round, without the queue's
+    lock held, so their owners may call into the queue while holding
+    locks of their own that the callbacks take.
+
+    Queued items are kept in the database, as `WQItemRecord`, until they
+    finish. On start, the queue restores waiting items through the
+    factories registered for their kinds, with their original ranks. Items
+    found running were interrupted by the server stopping, and are queued
+    again, with theirs, until they run out of `max_attempts`; after that they
+    are reported as interrupted. Records are written by a writer task, in
+    the order they change, batched into a synced transaction per round;
+    never under the queue's lock, so dispatch and status don't wait on the
+    disk. `put()` returns once its item's record is on disk.
+
+    Waiting items can be cancelled, and are then dropped. Running items are
+    stopped instead, see `WQItem.stop()`, and finish as usual with what
+    they did so far; those that don't within `_STOP_GRACE` seconds have
+    their task cancelled. An item put with `preempt` may stop running items
+    of lower priority, that would have run after it, when it's first in
+    line and wouldn't fit otherwise. Those finish with partial results, and
+    their configs are queued again, as new items with the same rank, to
+    run once the host is free again.
+    """
+
+    NS_ITEMS = "workqueue-items"
 
     _lock: asyncio.Lock
+    _cond: asyncio.Condition
     _task: Optional[asyncio.Task[None]]
     _is_shutting_down: bool
     _is_running: bool
 
-    _waiting: deque[WQEntry]
-    _running: Optional[WQEntry]
+    _db: DBM
+    _slots: Dict[WQItemKind, int]
+    _max_attempts: int
+    _weights: Dict[WQItemKind, float]
+    _aging: float
+    # each flow's, by kind and submitter, next start tag.
+    _flows: Dict[Tuple[WQItemKind, str], float]
+    _resources: WQResourceTracker
+    _factories: Dict[WQItemKind, WQItemFactory]
+    _seq: int
+    _interrupted: List[WQItemRecord]
+
+    _waiting: Dict[UUID, WQEntry]
+    # per kind, waiting items' (rank, seq, uuid); stale ones, of items no
+    # longer waiting or since bumped, are dropped as they reach the top.
+    _heaps: Dict[WQItemKind, List[Tuple[float, int, UUID]]]
+    _running: Dict[UUID, WQEntry]
     _finished: List[WQEntry]
 
-    _running_task: Optional[asyncio.Task[None]]
+    _running_tasks: Dict[UUID, asyncio.Task[None]]
+    # running items being stopped, and the tasks stopping them.
+    _stopping: Set[UUID]
+    _stop_tasks: Set[asyncio.Task[None]]
+    _notify_tasks: Set[asyncio.Task[None]]
+
+    # record writes, in the order records changed.
+    _writes: "asyncio.Queue[_RecordWrite]"
+    _writer: Optional[asyncio.Task[None]]
 
     logger: logging.Logger
 
-    def __init__(self, logger: logging.Logger = logging.getLogger()) -> None:
+    def __init__(
+        self,
+        db: DBM,
+        slots: Optional[Dict[WQItemKind, int]] = None,
+        max_attempts: int = 2,
+        weights: Optional[Dict[WQItemKind, float]] = None,
+        aging: float = 600.0,
+        logger: logging.Logger = logging.getLogger(),
+    ) -> None:
         self._lock = asyncio.Lock()
+        self._cond = asyncio.Condition(self._lock)
         self._task = None
         self._is_shutting_down = False
         self._is_running = False
-        self._waiting = deque()
-        self._running = None
+        self._db = db
+        self._slots = {} if slots is None else dict(slots)
+        self._max_attempts = max_attempts
+        self._weights = {} if weights is None else dict(weights)
+        self._aging = aging
+        self._flows = {}
+        self._resources = WQResourceTracker()
+        self._factories = {}
+        self._seq = 0
+        self._interrupted = []
+        self._waiting = {}
+        self._heaps = {}
+        self._running = {}
         self._finished = []
-        self._running_task = None
+        self._running_tasks = {}
+        self._stopping = set()
+        self._stop_tasks = set()
+        self._notify_tasks = set()
+        self._writes = asyncio.Queue()
+        self._writer = None
         self.logger = logger
 
     async def start(self) -> None:
@@ -179,87 +397,501 @@ class WorkQueue:
                 self.logger.info("already shutting down.")
                 return
             self.logger.info("starting workqueue")
-            self._task = asyncio.create_task(self._tick())
+            await self._restore()
+            self._task = asyncio.create_task(self._dispatch())
             self._is_running = True
 
     async def stop(self) -> None:
-        async with self._lock:
+        async with self._cond:
             if self._is_shutting_down:
                 return
             self.logger.info("shutting down.")
             self._is_shutting_down = True
+            self._cond.notify_all()
+
+    def register(self, kind: WQItemKind, factory: WQItemFactory) -> None:
+        """Restore items of kind `kind` with `factory`."""
+        self._factories[kind] = factory
+
+    async def _restore_entry(self, rec: WQItemRecord) -> Optional[WQEntry]:
+        factory = self._factories.get(rec.kind)
+        if factory is None:
+            rec.error = f"no factory for items of kind {rec.kind}"
+            return None
+        try:
+            item, cb = await factory(rec.uuid, rec.config)
+        except ServerError as e:
+            rec.error = f"unable to restore item: {str(e) or type(e).__name__}"
+            return None
+        return WQEntry(item, rec.kind, cb, rec)
+
+    async def _restore(self) -> None:
+        records: List[WQItemRecord] = []
+        async for _, rec in self._db.scan(ns=self.NS_ITEMS, model=WQItemRecord):
+            assert isinstance(rec, WQItemRecord)
+            records.append(rec)
+        records.sort(key=lambda r: r.seq)
+        self._seq = records[-1].seq + 1 if len(records) > 0 else 0
+
+        changed: List[WQItemRecord] = []
+        for rec in records:
+            if rec.state == WQItemState.RUNNING:
+                # the server stopped, or died, while it ran.
+                retry = rec.attempts < self._max_attempts
+                self.logger.info(
+                    f"work item uuid {rec.uuid} interrupted after "
+                    f"{rec.attempts} attempts, "
+                    f"{'retrying' if retry else 'giving up'}."
+                )
+                rec.state = (
+                    WQItemState.WAITING if retry else WQItemState.INTERRUPTED
+                )
+                changed.append(rec)
+            if rec.state == WQItemState.INTERRUPTED:
+                self._interrupted.append(rec)
+                continue
+
+            entry = await self._restore_entry(rec)
+            if entry is None:
+                self.logger.error(
+                    f"unable to restore work item uuid {rec.uuid}: "
+                    f"{rec.error}"
+                )
+                rec.state = WQItemState.INTERRUPTED
+                self._interrupted.append(rec)
+                changed.append(rec)
+                continue
+            self._push(entry)
+            flow = (rec.kind, rec.submitter)
+            tag = rec.rank + _PRIORITY_LEVELS[rec.priority] * self._aging
+            self._flows[flow] = max(
+                self._flows.get(flow, 0.0), tag + self._spacing(rec.kind)
+            )
+
+        async with self._db.transaction(DBMDurability.SYNC) as tx:
+            for rec in changed:
+                tx.put(self.NS_ITEMS, str(rec.uuid), rec)
+        self.logger.info(
+            f"restored {len(self._waiting)} waiting work items, "
+            f"{len(self._interrupted)} interrupted."
+        )
 
-    async def _tick(self) -> None:
+    def _spacing(self, kind: WQItemKind) -> float:
+        return _FAIR_SHARE_QUANTUM / self._weights.get(kind, 1.0)
+
+    def _rank(
+        self, kind: WQItemKind, submitter: str, priority: WQPriority
+    ) -> float:
+        now = time.time()
+        if len(self._flows) > _FLOWS_MAX:
+            self._flows = {f: t for f, t in self._flows.items() if t > now}
+        flow = (kind, submitter)
+        tag = max(now, self._flows.get(flow, 0.0))
+        self._flows[flow] = tag + self._spacing(kind)
+        return tag - _PRIORITY_LEVELS[priority] * self._aging
+
+    def _push(self, entry: WQEntry) -> None:
+        rec = entry.record
+        self._waiting[rec.uuid] = entry
+        heapq.heappush(
+            self._heaps.setdefault(entry.kind, []),
+            (rec.rank, rec.seq, rec.uuid),
+        )
+
+    def _head(self, kind: WQItemKind) -> Optional[WQEntry]:
+        heap = self._heaps[kind]
+        while len(heap) > 0:
+            rank, _, uuid = heap[0]
+            entry = self._waiting.get(uuid)
+            if entry is not None and entry.record.rank == rank:
+                return entry
+            heapq.heappop(heap)
+        return None
+
+    def _heads(self) -> List[WQEntry]:
+        """Each kind's first waiting item, in order."""
+        heads = [self._head(kind) for kind in self._heaps.keys()]
+        return sorted(
+            [e for e in heads if e is not None],
+            key=lambda e: (e.record.rank, e.record.seq),
+        )
+
+    def _write(
+        self, key: str, rec: Optional[WQItemRecord]
+    ) -> "asyncio.Future[None]":
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_records())
+        written: "asyncio.Future[None]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._writes.put_nowait((key, rec, written))
+        return written
+
+    def _persist(self, rec: WQItemRecord) -> "asyncio.Future[None]":
+        """Write `rec`, as it is now; obtain a future done once written."""
+        return self._write(str(rec.uuid), rec.copy())
+
+    def _forget(self, uuid: UUID) -> "asyncio.Future[None]":
+        """Remove item `uuid`'s record; obtain a future done once gone."""
+        return self._write(str(uuid), None)
+
+    async def _write_records(self) -> None:
         while True:
-            async with self._lock:
+            batch = [await self._writes.get()]
+            while not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            try:
+                async with self._db.transaction(DBMDurability.SYNC) as tx:
+                    for key, rec, _ in batch:
+                        if rec is None:
+                            tx.rm(self.NS_ITEMS, key)
+                        else:
+                            tx.put(self.NS_ITEMS, key, rec)
+            except Exception as e:
+                # the items still run, but won't be restored after a
+                # restart.
+                self.logger.error(f"error writing work item records: {e}")
+            for _, _, written in batch:
+                if not written.done():
+                    written.set_result(None)
+                self._writes.task_done()
+
+    def _has_work(self) -> bool:
+        if self._is_shutting_down:
+            return True
+        if any(t.done() for t in self._running_tasks.values()):
+            return True
+        return self._next_runnable() is not None or len(self._victims()) > 0
+
+    async def _dispatch(self) -> None:
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(self._has_work)
                 if self._is_shutting_down:
                     await self._shutdown_queue()
                     break
-                await self._handle_queue()
-
-            await asyncio.sleep(1.0)
-
+                callbacks = await self._handle_queue()
+            # without the lock: callbacks take their owners' locks, which
+            # those may hold while calling into the queue.
+            for cb in callbacks:
+                try:
+                    await cb()
+                except Exception as e:
+                    self.logger.error(f"error in work item callback: {e}")
+
+        if self._writer is not None:
+            await self._writes.join()
+            self._writer.cancel()
         self.logger.info("stopping main task, shutting down.")
         self._is_running = False
 
-    async def _handle_queue(self) -> None:
-        if self._running is None:
-            await self._maybe_promote()
-            return
-
-        if self._running.item.is_done():
-            item = self._running
-            assert self._running_task is not None
-            await self._running_task
-            self._running = None
-            self._running_task = None
-            self._finished.append(item)
-            await item.cb.finish(item.item)
-
-    async def _maybe_promote(self) -> None:
-        assert self._running is None
-        if len(self._waiting) == 0:
-            return
+    async def _notify(self) -> None:
+        async with self._cond:
+            self._cond.notify_all()
+
+    def _on_running_done(self, task: asyncio.Task[None]) -> None:
+        # done callbacks can't take the lock; wake the dispatcher from a
+        # task that can, keeping a reference to it until it's done.
+        notify = asyncio.create_task(self._notify())
+        self._notify_tasks.add(notify)
+        notify.add_done_callback(self._notify_tasks.discard)
+
+    async def _handle_queue(self) -> List[Callable[[], Awaitable[None]]]:
+        """
+        Finish done items and start those that can run; obtain the
+        callbacks to call, in order, once the lock is released.
+        """
+        callbacks: List[Callable[[], Awaitable[None]]] = []
+        for uuid, task in list(self._running_tasks.items()):
+            if task.done():
+                entry = self._finish_entry(uuid, task)
+                callbacks.append(partial(self._handle_finished, entry))
 
-        next = self._waiting.popleft()
-        self.logger.debug(f"promoting entry to running, kind: {next.kind}")
-        await self._run_entry(next)
+        while True:
+            entry = self._next_runnable()
+            if entry is None:
+                break
+            del self._waiting[entry.item.uuid]
+            self.logger.debug(f"promoting entry to running, kind: {entry.kind}")
+            await self._run_entry(entry)
+            callbacks.append(partial(entry.cb.start, entry.item))
+
+        for victim in self._victims():
+            self.logger.info(
+                f"preempting work item uuid {victim.item.uuid} for "
+                f"{self._heads()[0].item.uuid}"
+            )
+            victim.requeue = True
+            self._stop_entry(victim, "preempted")
+        return callbacks
+
+    def _num_running(self, kind: WQItemKind) -> int:
+        return sum(1 for e in self._running.values() if e.kind == kind)
+
+    def _next_runnable(self) -> Optional[WQEntry]:
+        for entry in self._heads():
+            if self._num_running(entry.kind) < self._slots.get(
+                entry.kind, 1
+            ) and self._resources.fits(entry.resources):
+                return entry
+            if entry.resources.exclusive:
+                # nothing jumps ahead of a waiting exclusive item, lest it
+                # never find the host idle.
+                return None
+        return None
+
+    def _victims(self) -> List[WQEntry]:
+        """
+        Running items to stop for the first waiting item to start, if it's
+        put with `preempt` and can't start otherwise: the fewest of those of
+        lower priority, and later rank, lowest priority and latest started
+        first, whose resources would make room for it. None if stopping
+        those wouldn't make room, or if items being stopped already will.
+        """
+        heads = self._heads()
+        if len(heads) == 0 or not heads[0].record.preempt:
+            return []
+        entry = heads[0]
+        level = _PRIORITY_LEVELS[entry.record.priority]
+
+        # as if the items being stopped were done already.
+        resources = copy.deepcopy(self._resources)
+        num_running = 0
+        candidates: List[WQEntry] = []
+        for uuid, e in reversed(self._running.items()):
+            if uuid in self._stopping:
+                resources.release(e.resources, e.item.ports)
+                continue
+            if e.kind == entry.kind:
+                num_running += 1
+            if (
+                _PRIORITY_LEVELS[e.record.priority] < level
+                and e.record.rank > entry.record.rank
+            ):
+                candidates.append(e)
+        candidates.sort(key=lambda e: _PRIORITY_LEVELS[e.record.priority])
+
+        victims: List[WQEntry] = []
+        slots = self._slots.get(entry.kind, 1)
+        while num_running >= slots or not resources.fits(entry.resources):
+            if len(victims) == len(candidates):
+                return []
+            victim = candidates[len(victims)]
+            resources.release(victim.resources, victim.item.ports)
+            if victim.kind == entry.kind:
+                num_running -= 1
+            victims.append(victim)
+        return victims
+
+    def _stop_entry(self, entry: WQEntry, reason: str) -> None:
+        uuid = entry.item.uuid
+        task = self._running_tasks[uuid]
+        self._stopping.add(uuid)
+        stop = asyncio.create_task(self._stop_item(entry.item, task, reason))
+        self._stop_tasks.add(stop)
+        stop.add_done_callback(self._stop_tasks.discard)
+
+    async def _stop_item(
+        self, item: WQItem, task: asyncio.Task[None], reason: str
+    ) -> None:
+        # without the lock: items may take a while to stop, and their task
+        # finishing wakes the dispatcher as usual.
+        self.logger.info(f"stopping work item uuid {item.uuid}: {reason}")
+        try:
+            await item.stop(reason)
+        except Exception as e:
+            self.logger.error(f"error stopping work item uuid {item.uuid}: {e}")
+        done, _ = await asyncio.wait([task], timeout=_STOP_GRACE)
+        if len(done) == 0:
+            self.logger.error(
+                f"work item uuid {item.uuid} still running "
+                f"{_STOP_GRACE} seconds after stopping, cancelling."
+            )
+            task.cancel()
 
     async def _run_entry(self, entry: WQEntry) -> None:
-        self._running = entry
-        self._running_task = asyncio.create_task(entry.item.run())
-        await self._running.cb.start(self._running.item)
+        uuid = entry.item.uuid
+        entry.record.state = WQItemState.RUNNING
+        entry.record.time_start = dt.now()
+        entry.record.attempts += 1
+        self._persist(entry.record)
+        entry.item.ports = self._resources.acquire(entry.resources)
+        self._running[uuid] = entry
+        task = asyncio.create_task(entry.item.run())
+        self._running_tasks[uuid] = task
+        task.add_done_callback(self._on_running_done)
+
+    def _finish_entry(self, uuid: UUID, task: asyncio.Task[None]) -> WQEntry:
+        entry = self._running.pop(uuid)
+        del self._running_tasks[uuid]
+        self._stopping.discard(uuid)
+        self._resources.release(entry.resources, entry.item.ports)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(
+                f"work item uuid {uuid} failed: {task.exception()}"
+            )
+        self._finished.append(entry)
+        return entry
+
+    async def _handle_finished(self, entry: WQEntry) -> None:
+        # the record goes once the item's results are kept, so they're not
+        # lost if the server stops in between; it'd run again instead.
+        await entry.cb.finish(entry.item)
+        await self._forget(entry.item.uuid)
+        if entry.requeue:
+            await self._requeue(entry)
+
+    async def _requeue(self, entry: WQEntry) -> None:
+        """Queue preempted `entry`'s config again, in its place."""
+        rec = entry.record.copy(
+            update={
+                "uuid": uuid4(),
+                "state": WQItemState.WAITING,
+                "time_start": None,
+                "attempts": 0,
+            }
+        )
+        restored = await self._restore_entry(rec)
+        if restored is None:
+            self.logger.error(
+                f"unable to queue preempted work item uuid "
+                f"{entry.item.uuid} again: {rec.error}"
+            )
+            return
+        async with self._cond:
+            if self._is_shutting_down:
+                return
+            written = self._persist(rec)
+            self._push(restored)
+            self._cond.notify_all()
+        await written
 
     async def _shutdown_queue(self) -> None:
+        # records are left as they are, to be restored on the next start.
         self._waiting.clear()
-        if self._running is None:
-            return
-        await self._running.item.stop()
-        self._running = None
-
-    async def put(self, item: WQItem, kind: WQItemKind, cb: WQItemCB) -> None:
-        async with self._lock:
+        self._heaps.clear()
+        for entry in self._running.values():
+            await entry.item.stop("server shutting down")
+        self._running.clear()
+
+    async def put(
+        self,
+        item: WQItem,
+        kind: WQItemKind,
+        cb: WQItemCB,
+        priority: WQPriority = WQPriority.NORMAL,
+        submitter: str = "",
+        preempt: bool = False,
+    ) -> None:
+        async with self._cond:
             if self._is_shutting_down:
                 return
-            self.logger.debug(f"append work item, kind: {kind}")
-            self._waiting.append(WQEntry(item, kind, cb))
+            self.logger.debug(
+                f"append work item, kind: {kind}, priority: {priority.value}"
+            )
+            rec = WQItemRecord(
+                uuid=item.uuid,
+                kind=kind,
+                config=item.config_uuid,
+                state=WQItemState.WAITING,
+                seq=self._seq,
+                priority=priority,
+                submitter=submitter,
+                preempt=preempt,
+                rank=self._rank(kind, submitter, priority),
+                time_queued=dt.now(),
+            )
+            self._seq += 1
+            written = self._persist(rec)
+            self._push(WQEntry(item, kind, cb, rec))
+            self._cond.notify_all()
+        await written
+
+    async def bump(
+        self,
+        uuid: UUID,
+        priority: Optional[WQPriority] = None,
+        first: bool = False,
+    ) -> None:
+        """
+        Change waiting item `uuid`'s priority, keeping the time it waited
+        to its credit; and, if `first`, move it ahead of every other
+        waiting item. Raises NoSuchItemError if no such item is waiting.
+        """
+        async with self._cond:
+            entry = self._waiting.get(uuid)
+            if entry is None:
+                raise NoSuchItemError()
+            rec = entry.record
+            rank = rec.rank
+            if priority is not None:
+                levels = (
+                    _PRIORITY_LEVELS[rec.priority] - _PRIORITY_LEVELS[priority]
+                )
+                rank += levels * self._aging
+                rec.priority = priority
+            if first:
+                heads = self._heads()
+                if len(heads) > 0 and heads[0] is not entry:
+                    rank = min(rank, heads[0].record.rank - 1.0)
+            rec.rank = rank
+            written = self._persist(rec)
+            self._push(entry)
+            self._cond.notify_all()
+        await written
+
+    async def cancel(self, uuid: UUID) -> None:
+        """
+        Cancel item `uuid`: drop it if waiting, or interrupted; stop it, if
+        running, to finish with what it did so far. Raises NoSuchItemError
+        if there's no such item, or it's done.
+        """
+        written: Optional["asyncio.Future[None]"] = None
+        async with self._cond:
+            if self._waiting.pop(uuid, None) is not None:
+                # its heap entry goes once it reaches the top.
+                self.logger.info(f"cancelled waiting work item uuid {uuid}")
+                written = self._forget(uuid)
+                # items queued after it may run now.
+                self._cond.notify_all()
+            elif uuid in [rec.uuid for rec in self._interrupted]:
+                self._interrupted = [
+                    rec for rec in self._interrupted if rec.uuid != uuid
+                ]
+                written = self._forget(uuid)
+            else:
+                entry = self._running.get(uuid)
+                if entry is None:
+                    raise NoSuchItemError()
+                # not to be queued again, even if it's being preempted.
+                entry.requeue = False
+                if uuid not in self._stopping:
+                    self._stop_entry(entry, "cancelled")
+        if written is not None:
+            await written
+
+    def _waiting_in_order(self) -> List[WQEntry]:
+        return sorted(
+            self._waiting.values(),
+            key=lambda e: (e.record.rank, e.record.seq),
+        )
 
     async def waiting(self) -> List[WQEntry]:
+        """Waiting entries, in the order they'd run."""
         async with self._lock:
-            lst = self._waiting.copy()
-        return list(lst)
+            lst = self._waiting_in_order()
+        return lst
 
     async def finished(self) -> List[WQEntry]:
         async with self._lock:
             lst = self._finished.copy()
         return lst
 
-    async def running(self) -> Optional[WQEntry]:
-        ret: Optional[WQEntry] = None
+    async def running(self) -> List[WQEntry]:
+        """Running entries, in the order they started."""
         async with self._lock:
-            if self._running is not None:
-                ret = copy.copy(self._running)
-        return ret
+            lst = [copy.copy(e) for e in self._running.values()]
+        return lst
 
     def _convert_to_status_item(self, entry: WQEntry) -> WorkQueueStatusItem:
         return WorkQueueStatusItem(
@@ -270,38 +902,60 @@ class WorkQueue:
             time_start=entry.item.time_start,
             time_end=entry.item.time_end,
             duration=entry.item.duration,
+            priority=entry.record.priority,
+            submitter=entry.record.submitter,
         )
 
     async def state(self) -> WorkQueueState:
         waiting: List[WorkQueueStatusItem] = []
         finished: List[WorkQueueStatusItem] = []
-        current: Optional[WorkQueueStatusItem] = None
+        running: List[WorkQueueStatusItem] = []
+        interrupted: List[WorkQueueStatusItem] = []
 
         async with self._lock:
-            for entry in self._waiting:
+            for entry in self._waiting_in_order():
                 waiting.append(self._convert_to_status_item(entry))
 
             for entry in self._finished:
                 finished.append(self._convert_to_status_item(entry))
 
-            if self._running is not None:
-                current = self._convert_to_status_item(self._running)
+            for entry in self._running.values():
+                running.append(self._convert_to_status_item(entry))
+
+            for rec in self._interrupted:
+                interrupted.append(
+                    WorkQueueStatusItem(
+                        uuid=rec.uuid,
+                        kind=rec.kind,
+                        is_running=False,
+                        is_done=False,
+                        time_start=rec.time_start,
+                        time_end=None,
+                        duration=0,
+                        error=rec.error,
+                    )
+                )
 
         return WorkQueueState(
-            waiting=waiting, finished=finished, current=current
+            waiting=waiting,
+            finished=finished,
+            current=running[0] if len(running) > 0 else None,
+            running=running,
+            interrupted=interrupted,
         )
 
     async def status(self) -> WorkQueueStatus:
-        current: Optional[WQEntry] = await self.running()
-
-        if current is None:
-            return WorkQueueStatus(is_running=False, current=None)
+        running = [
+            WorkQueueStatusEntry(
+                item=self._convert_to_status_item(entry),
+                progress=entry.item.progress,
+                config=entry.item.config,
+            )
+            for entry in await self.running()
+        ]
 
         return WorkQueueStatus(
-            is_running=True,
-            current=WorkQueueStatusEntry(
-                item=self._convert_to_status_item(current),
-                progress=current.item.progress,
-                config=current.item.config,
-            ),
+            is_running=len(running) > 0,
+            current=running[0] if len(running) > 0 else None,
+            running=running,
         )
@@ -15,8 +15,7 @@ export class WorkQueueSidebarComponent implements OnInit, OnDestroy {
   public constructor(private wqSvc: WorkQueueService) {}
 
   public hasAny: boolean = false;
-  public hasCurrent: boolean = false;
-  public current?: WorkQueueEntry;
+  public running: WorkQueueEntry[] = [];
   public waiting: WorkQueueEntry[] = [];
 
   private wqUpdateInterval = 1000;
@@ -52,9 +51,8 @@ export class WorkQueueSidebarComponent implements OnInit, OnDestroy {
   }
 
   private updateStatus(status: WorkQueueState): void {
-    this.current = status.current;
+    this.running = status.running;
     this.waiting = status.waiting;
-    this.hasCurrent = !!this.current;
-    this.hasAny = this.hasCurrent || this.waiting.length > 0;
+    this.hasAny = this.running.length > 0 || this.waiting.length > 0;
   }
 }
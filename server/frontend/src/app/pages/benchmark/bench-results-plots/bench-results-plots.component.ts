@@ -69,7 +69,7 @@ export class BenchResultsPlotsComponent implements OnInit {
             }
             const entry: HistogramEntry = {
               data: this.getData(res, target, opname),
-              layout: this.getLayout(target, opname),
+              layout: this.getLayout(res, target, opname),
             };
             this.histograms[target][opname] = entry;
             if (!this.hasSelected) {
@@ -125,18 +125,39 @@ export class BenchResultsPlotsComponent implements OnInit {
     op: string,
   ): Plotly.Data[] {
     const hist: Histogram = results[target][op];
+    const x: number[] = [];
+    const width: number[] = [];
+    for (let i = 0; i < hist.counts.length; i++) {
+      const lo = hist.edges[i];
+      const hi = hist.edges[i + 1];
+      x.push(hist.scale === "log" ? Math.sqrt(lo * hi) : (lo + hi) / 2);
+      width.push(hi - lo);
+    }
     const trace: Plotly.Data = {
-      type: "histogram",
-      x: hist.data,
+      type: "bar",
+      x: x,
+      y: hist.counts,
+      width: width,
       name: op,
     };
     return [trace];
   }
 
-  private getLayout(target: string, op: string): Partial<Plotly.Layout> {
+  private getLayout(
+    results: ResultHistograms,
+    target: string,
+    op: string,
+  ): Partial<Plotly.Layout> {
+    const hist: Histogram = results[target][op];
+    const p = (v: number): string => v.toFixed(2);
     return {
-      title: `Latency distribution for ${target}'s ${op}`,
-      xaxis: { title: "milliseconds" },
+      title:
+        `Latency distribution for ${target}'s ${op}<br>` +
+        `<sub>p50 ${p(hist.p50)} ms, p90 ${p(hist.p90)} ms, ` +
+        `p99 ${p(hist.p99)} ms, p99.9 ${p(hist.p999)} ms, ` +
+        `max ${p(hist.max)} ms</sub>`,
+      bargap: 0,
+      xaxis: { title: "milliseconds", type: hist.scale },
       yaxis: { title: "count" },
     };
   }
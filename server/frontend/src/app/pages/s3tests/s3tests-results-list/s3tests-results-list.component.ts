@@ -13,6 +13,7 @@
  * limitations under the License.
  */
 import { Component, Input, OnInit } from "@angular/core";
+import { S3TestsAPIService } from "~/app/shared/services/api/s3tests-api.service";
 import { S3TestsResultEntry } from "~/app/shared/types/s3tests.type";
 
 type TestEntry = {
@@ -30,22 +31,25 @@ type TestEntry = {
 })
 export class S3TestsResultsListComponent implements OnInit {
   @Input()
-  public entry!: S3TestsResultEntry;
+  public uuid!: string;
 
   public tests: { [name: string]: TestEntry } = {};
-  public uuid!: string;
   public selected: string = "all";
   public total: number = 0;
   public passed: number = 0;
   public failed: number = 0;
 
-  public constructor() {}
+  public constructor(private svc: S3TestsAPIService) {}
 
   public ngOnInit(): void {
-    this.uuid = this.entry.uuid;
+    this.svc.getResult(this.uuid).subscribe((entry: S3TestsResultEntry) => {
+      this.setResults(entry);
+    });
+  }
 
-    Object.keys(this.entry.results).forEach((name: string) => {
-      const res = this.entry.results[name];
+  private setResults(entry: S3TestsResultEntry): void {
+    Object.keys(entry.results).forEach((name: string) => {
+      const res = entry.results[name];
       const isError = res !== "ok";
       ++this.total;
       if (isError) {
@@ -27,10 +27,7 @@ import {
   S3TestsAPIService,
   S3TestsResultsAPIResult,
 } from "~/app/shared/services/api/s3tests-api.service";
-import { S3TestsResultEntry } from "~/app/shared/types/s3tests.type";
-
 type S3TestsResultsTableEntry = {
-  result: S3TestsResultEntry;
   uuid: string;
   config_name: string;
   date: Date;
@@ -86,27 +83,18 @@ export class S3TestsResultsComponent implements OnInit, OnDestroy {
         let lst: S3TestsResultsTableEntry[] = [];
         Object.keys(results.results).forEach((k: string) => {
           let res = results.results[k];
-          let cfgName = res.config.desc.name;
           let tstart: Date = new Date(res.time_start);
           let tend: Date = new Date(res.time_end);
           let duration = Math.round((tend.getTime() - tstart.getTime()) / 1000);
-          let success = Object.values(res.results).every((r) => r === "ok");
-          let passed = 0;
-          Object.keys(res.results).forEach((_k: string) => {
-            if (res.results[_k] === "ok") {
-              ++passed;
-            }
-          });
           lst.push({
-            result: res,
             uuid: res.uuid,
-            config_name: cfgName,
+            config_name: res.config_name,
             date: tstart,
             duration: duration,
-            status: success ? "ok" : "error",
+            status: res.passed === res.total ? "ok" : "error",
             collapsed: true,
-            passed: passed,
-            total: Object.keys(res.results).length,
+            passed: res.passed,
+            total: res.total,
           });
         });
         this.resultsList = lst.sort(
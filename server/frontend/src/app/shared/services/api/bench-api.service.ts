@@ -96,7 +96,18 @@ export type BenchRunDesc = {
 
 export type Histogram = {
   op: string;
-  data: number[];
+  count: number;
+  scale: "linear" | "log";
+  edges: number[];
+  counts: number[];
+  below: number;
+  above: number;
+  p50: number;
+  p90: number;
+  p99: number;
+  p999: number;
+  max: number;
+  data?: number[];
 };
 
 export type ResultHistogramMap = { [id: string]: Histogram };
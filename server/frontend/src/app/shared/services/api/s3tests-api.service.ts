@@ -20,6 +20,7 @@ import {
   S3TestsConfigItem,
   S3TestsCurrentRun,
   S3TestsResultEntry,
+  S3TestsRunSummary,
 } from "~/app/shared/types/s3tests.type";
 
 export type S3TestsConfigAPIResult = {
@@ -34,7 +35,12 @@ export type S3TestsConfigAPIPostResult = {
 
 export type S3TestsResultsAPIResult = {
   date: Date;
-  results: { [id: string]: S3TestsResultEntry };
+  results: { [id: string]: S3TestsRunSummary };
+};
+
+type S3TestsResultAPIResult = {
+  date: string;
+  result: S3TestsResultEntry;
 };
 
 export type S3TestsStatusAPIResult = {
@@ -96,6 +102,15 @@ export class S3TestsAPIService {
     return this.svc.get<S3TestsResultsAPIResult>("/s3tests/results");
   }
 
+  public getResult(uuid: string): Observable<S3TestsResultEntry> {
+    return this.svc
+      .get<S3TestsResultAPIResult>(`/s3tests/results/${uuid}`)
+      .pipe(
+        take(1),
+        map((res: S3TestsResultAPIResult) => res.result),
+      );
+  }
+
   public getStatus(): Observable<S3TestsStatusAPIResult> {
     return this.svc.get<S3TestsStatusAPIResult>("/s3tests/status");
   }
@@ -42,12 +42,17 @@ export type WorkQueueEntry = {
   time_start?: string;
   time_end?: string;
   duration: number;
+  priority?: string;
+  submitter?: string;
+  error?: string;
 };
 
 export type WorkQueueState = {
   waiting: WorkQueueEntry[];
   finished: WorkQueueEntry[];
   current?: WorkQueueEntry;
+  running: WorkQueueEntry[];
+  interrupted: WorkQueueEntry[];
 };
 
 export type S3TestsProgress = {
@@ -74,6 +79,7 @@ export type WorkQueueStatusEntry = {
 export type WorkQueueStatus = {
   is_running: boolean;
   current?: WorkQueueStatusEntry;
+  running: WorkQueueStatusEntry[];
 };
 
 type WorkQueueStateAPIResult = {
@@ -89,7 +95,7 @@ type WorkQueueStatusAPIResult = {
 })
 export class WorkQueueService {
   private statusSubject: BehaviorSubject<WorkQueueStatus> =
-    new BehaviorSubject<WorkQueueStatus>({ is_running: false });
+    new BehaviorSubject<WorkQueueStatus>({ is_running: false, running: [] });
 
   private statusRefreshInterval: number = 1000;
   private statusRefreshSubscription?: Subscription;
@@ -61,6 +61,20 @@ export type S3TestsResultEntry = {
   };
 };
 
+export type S3TestsRunSummary = {
+  uuid: string;
+  time_start: string;
+  time_end: string;
+  config_uuid: string;
+  config_name: string;
+  is_error: boolean;
+  error_msg: string;
+  total: number;
+  passed: number;
+  error: number;
+  failed: number;
+};
+
 export type S3TestsCurrentRun = {
   uuid: string;
   time_start: string;
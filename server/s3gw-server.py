@@ -12,7 +12,7 @@ import os
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-from api import bench, containers, s3tests, wq
+from api import bench, containers, s3tests, status, wq
 from common.error import ServerError
 from controllers.config import ServerConfig, ServerConfigError
 from controllers.context import ServerContext
@@ -144,6 +144,7 @@ def server_factory(
     async def on_shutdown():  # type: ignore
         await shutdown(server_app, server_api)
 
+    server_api.include_router(status.router)
     server_api.include_router(containers.router)
     server_api.include_router(s3tests.router)
     server_api.include_router(bench.router)
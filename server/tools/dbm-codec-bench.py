@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+#
+# Compare encode and decode throughput of the JSON and msgpack codecs for the
+# models the server stores. Run from the server's directory, with the common
+# directory in PYTHONPATH, e.g.
+#
+#   PYTHONPATH=.:../common python3 tools/dbm-codec-bench.py
+#
+
+import json
+import random
+import time
+from datetime import datetime as dt
+from typing import Callable, Dict, List, Tuple
+from uuid import uuid4
+
+import click
+from controllers.bench.config import BenchConfig, BenchConfigDesc, BenchTarget
+from controllers.bench.progress import BenchTargetsProgress, TargetProgress
+from controllers.bench.types import BenchResult, BenchTargetError
+from controllers.s3tests.config import (
+    S3TestsConfig,
+    S3TestsConfigDesc,
+    S3TestsConfigEntry,
+)
+from controllers.s3tests.mgr import S3TestRunResult, S3TestsResultSummary
+from controllers.s3tests.progress import S3TestRunProgress
+from controllers.wq.progress import WQItemProgress
+from controllers.wq.types import WQItemProgressType
+from libstuff.bench.runner import BenchmarkParams
+from libstuff.bench.warp import WarpBenchmarkState
+from libstuff.dbm.codec import DBMCodec, decode_model, encode_model
+from libstuff.s3tests.runner import (
+    ContainerConfig,
+    ErrorTestResult,
+    TestsConfig,
+)
+from pydantic import BaseModel
+
+
+def _s3tests_config() -> S3TestsConfigEntry:
+    return S3TestsConfigEntry(
+        uuid=uuid4(),
+        desc=S3TestsConfigDesc(
+            name="default",
+            config=S3TestsConfig(
+                container=ContainerConfig(
+                    image="ghcr.io/aquarist-labs/s3gw:latest", target_port=7480
+                ),
+                tests=TestsConfig(include=[".*_post_object.*"]),
+            ),
+        ),
+    )
+
+
+def _progress(progress: BaseModel) -> WQItemProgress:
+    return WQItemProgress(
+        uuid=uuid4(),
+        is_running=False,
+        is_done=True,
+        time_start=dt.now(),
+        time_end=dt.now(),
+        duration=1234,
+        progress=WQItemProgressType(__root__=progress),
+    )
+
+
+def _s3tests_result(num_tests: int) -> S3TestRunResult:
+    outcomes = ["ok", "ERROR", "FAIL"]
+    return S3TestRunResult(
+        uuid=uuid4(),
+        time_start=dt.now(),
+        config=_s3tests_config(),
+        progress=_progress(
+            S3TestRunProgress(tests_total=num_tests, tests_run=num_tests)
+        ),
+        time_end=dt.now(),
+        results={
+            f"s3tests_boto3.functional.test_s3.test_{i}": random.choice(
+                outcomes
+            )
+            for i in range(num_tests)
+        },
+        is_error=False,
+        error_msg="",
+    )
+
+
+def _s3tests_error() -> ErrorTestResult:
+    return ErrorTestResult(
+        name="s3tests_boto3.functional.test_s3.test_post_object_anonymous",
+        trace=[
+            "Traceback (most recent call last):",
+            '  File "/usr/lib/python3/site-packages/nose/case.py", line 198',
+            "    self.test(*self.arg)",
+            "AssertionError: 403 != 200",
+        ],
+        log=["botocore.hooks: DEBUG: Event before-call.s3.PutObject"] * 40,
+    )
+
+
+def _s3tests_summary() -> S3TestsResultSummary:
+    return S3TestsResultSummary(
+        date=dt.now(),
+        config_uuid=uuid4(),
+        result_uuid=uuid4(),
+        duration=1234,
+        passed=400,
+        error=50,
+        failed=30,
+    )
+
+
+def _bench_config() -> BenchConfig:
+    return BenchConfig(
+        name="default",
+        params=BenchmarkParams(
+            num_objects=100, object_size="10MiB", duration="1m"
+        ),
+        targets={
+            name: BenchTarget(
+                image=f"ghcr.io/aquarist-labs/{name}:latest",
+                args=None,
+                port=7480,
+                access_key="test",
+                secret_key="test",
+            )
+            for name in ["s3gw", "minio"]
+        },
+    )
+
+
+def _bench_config_desc() -> BenchConfigDesc:
+    return BenchConfigDesc(uuid=uuid4(), config=_bench_config())
+
+
+def _bench_result(num_samples: int) -> BenchResult:
+    config = _bench_config()
+    samples = {
+        "op": {str(i): "GET" for i in range(num_samples)},
+        "duration_ns": {
+            str(i): random.randint(10**6, 10**9) for i in range(num_samples)
+        },
+    }
+    return BenchResult(
+        uuid=uuid4(),
+        progress=_progress(
+            BenchTargetsProgress(
+                targets=[
+                    TargetProgress(
+                        name=name,
+                        state=WarpBenchmarkState.DONE,
+                        value=100.0,
+                        has_progress=True,
+                        is_running=False,
+                        is_done=True,
+                        is_error=False,
+                        error_str=None,
+                        time_start=dt.now(),
+                        time_end=dt.now(),
+                        duration=60,
+                    )
+                    for name in config.targets.keys()
+                ]
+            )
+        ),
+        is_error=False,
+        errors=[BenchTargetError(target="minio", error_str="")],
+        config=config,
+        results={name: json.dumps(samples) for name in config.targets.keys()},
+    )
+
+
+_MODELS: Dict[str, Callable[[], BaseModel]] = {
+    "S3TestRunResult": lambda: _s3tests_result(500),
+    "ErrorTestResult": _s3tests_error,
+    "S3TestsResultSummary": _s3tests_summary,
+    "S3TestsConfigEntry": _s3tests_config,
+    "BenchConfigDesc": _bench_config_desc,
+    "BenchResult": lambda: _bench_result(2000),
+}
+
+
+def _rate(fn: Callable[[], object], runs: int) -> float:
+    """Best of 3 rounds of `runs` calls to `fn`, in calls per second."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return runs / best
+
+
+def _bench(
+    value: BaseModel, runs: int
+) -> List[Tuple[DBMCodec, int, float, float]]:
+    model = type(value)
+    res: List[Tuple[DBMCodec, int, float, float]] = []
+    for codec in DBMCodec:
+        raw = encode_model(value, codec)
+        assert decode_model("bench", raw, model) == value
+        enc = _rate(lambda: encode_model(value, codec), runs)
+        dec = _rate(lambda: decode_model("bench", raw, model), runs)
+        res.append((codec, len(raw), enc, dec))
+    return res
+
+
+@click.command()
+@click.option("-r", "--runs", type=int, default=1000, help="Calls per round.")
+def main(runs: int) -> None:
+    """Compare the JSON and msgpack codecs on each stored model type."""
+    for name, gen in _MODELS.items():
+        click.echo(name)
+        for codec, size, enc, dec in _bench(gen(), runs):
+            click.echo(
+                f"  {codec.value:>7}: {size:>8} bytes, "
+                f"encode {enc:>9.0f}/s, decode {dec:>9.0f}/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022 SUSE, LLC
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+
+#
+# Measure how long the s3tests and bench managers take to load their results
+# at startup, and how much memory those take, for a database holding a
+# number of synthetic runs. Run from the server's directory, with the common
+# directory in PYTHONPATH, e.g.
+#
+#   PYTHONPATH=.:../common python3 tools/startup-bench.py -n 1000
+#
+
+import asyncio
+import logging
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime as dt
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from uuid import uuid4
+
+import click
+from controllers.bench.config import BenchConfig, BenchTarget
+from controllers.bench.mgr import BenchmarkMgr
+from controllers.bench.progress import BenchTargetsProgress, TargetProgress
+from controllers.bench.types import BenchDBNS, BenchResult
+from controllers.s3tests.config import (
+    S3TestsConfig,
+    S3TestsConfigDesc,
+    S3TestsConfigEntry,
+)
+from controllers.s3tests.mgr import S3TestRunResult, S3TestsMgr
+from controllers.s3tests.progress import S3TestRunProgress
+from controllers.wq.progress import WQItemProgress
+from controllers.wq.types import WQItemProgressType
+from controllers.wq.wq import WorkQueue
+from libstuff.bench.analytics import AnalyticsPool
+from libstuff.bench.artifacts import ArtifactRef, ArtifactStore
+from libstuff.bench.plots import OpSummary
+from libstuff.bench.runner import BenchmarkParams
+from libstuff.bench.warp import WarpBenchmarkState
+from libstuff.dbm import DBM, DBMEngine
+from libstuff.s3tests.runner import ContainerConfig, TestsConfig
+from pydantic import BaseModel
+
+_logger = logging.getLogger("startup-bench")
+
+
+def _progress(progress: BaseModel) -> WQItemProgress:
+    return WQItemProgress(
+        uuid=uuid4(),
+        is_running=False,
+        is_done=True,
+        time_start=dt.now(),
+        time_end=dt.now(),
+        duration=1234,
+        progress=WQItemProgressType(__root__=progress),
+    )
+
+
+def _s3tests_result(num_tests: int) -> S3TestRunResult:
+    outcomes = ["ok", "ok", "ok", "error", "fail"]
+    return S3TestRunResult(
+        uuid=uuid4(),
+        time_start=dt.now(),
+        config=S3TestsConfigEntry(
+            uuid=uuid4(),
+            desc=S3TestsConfigDesc(
+                name="default",
+                config=S3TestsConfig(
+                    container=ContainerConfig(
+                        image="ghcr.io/aquarist-labs/s3gw:latest",
+                        target_port=7480,
+                    ),
+                    tests=TestsConfig(include=[".*_post_object.*"]),
+                ),
+            ),
+        ),
+        progress=_progress(
+            S3TestRunProgress(tests_total=num_tests, tests_run=num_tests)
+        ),
+        time_end=dt.now(),
+        results={
+            f"s3tests_boto3.functional.test_s3.test_{i}": random.choice(
+                outcomes
+            )
+            for i in range(num_tests)
+        },
+        is_error=False,
+        error_msg="",
+    )
+
+
+def _bench_result() -> BenchResult:
+    config = BenchConfig(
+        name="default",
+        params=BenchmarkParams(
+            num_objects=100, object_size="10MiB", duration="1m"
+        ),
+        targets={
+            name: BenchTarget(
+                image=f"ghcr.io/aquarist-labs/{name}:latest",
+                args=None,
+                port=7480,
+                access_key="test",
+                secret_key="test",
+            )
+            for name in ["s3gw", "minio"]
+        },
+    )
+    ops = ["DELETE", "GET", "PUT", "STAT"]
+    return BenchResult(
+        uuid=uuid4(),
+        progress=_progress(
+            BenchTargetsProgress(
+                targets=[
+                    TargetProgress(
+                        name=name,
+                        state=WarpBenchmarkState.DONE,
+                        value=100.0,
+                        has_progress=True,
+                        is_running=False,
+                        is_done=True,
+                        is_error=False,
+                        error_str=None,
+                        time_start=dt.now(),
+                        time_end=dt.now(),
+                        duration=60,
+                    )
+                    for name in config.targets.keys()
+                ]
+            )
+        ),
+        is_error=False,
+        errors=[],
+        config=config,
+        samples={
+            name: ArtifactRef(
+                digest=f"{random.getrandbits(256):064x}",
+                rows=200000,
+                size=12800000,
+            )
+            for name in config.targets.keys()
+        },
+        summary={
+            name: {
+                op: OpSummary(
+                    op=op,
+                    count=50000,
+                    errors=0,
+                    bytes=50000 * 10485760,
+                    latency_ms_mean=random.uniform(10, 100),
+                    latency_ms_p50=random.uniform(10, 100),
+                    latency_ms_p99=random.uniform(100, 1000),
+                    latency_ms_max=random.uniform(1000, 2000),
+                )
+                for op in ops
+            }
+            for name in config.targets.keys()
+        },
+    )
+
+
+async def _populate(db: DBM, num_runs: int, num_tests: int) -> None:
+    for i in range(num_runs):
+        s3res = _s3tests_result(num_tests)
+        bres = _bench_result()
+        async with db.transaction() as tx:
+            tx.put(S3TestsMgr.NS_TESTS, str(s3res.uuid), s3res)
+            tx.put(BenchDBNS.NS_RESULTS, str(bres.uuid), bres)
+        if (i + 1) % 100 == 0:
+            click.echo(f"  {i + 1}/{num_runs} runs written", err=True)
+
+
+async def _timed(fn: Callable[[], Awaitable[Any]]) -> float:
+    start = time.perf_counter()
+    await fn()
+    return time.perf_counter() - start
+
+
+async def _traced(fn: Callable[[], Awaitable[Any]]) -> Tuple[int, int]:
+    """Memory allocated by `fn` and still kept once done, and at peak."""
+    tracemalloc.start()
+    kept = await fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current, peak
+
+
+async def _full_load(db: DBM) -> Dict[str, Any]:
+    """Load every run in full, like the managers used to at startup."""
+    kept: Dict[str, Any] = {}
+    async for k, v in db.scan(ns=S3TestsMgr.NS_TESTS, model=S3TestRunResult):
+        kept[k] = v
+    async for k, v in db.scan(ns=BenchDBNS.NS_RESULTS, model=BenchResult):
+        kept[k] = v
+    return kept
+
+
+async def _mgrs_load(db: DBM, artifacts: ArtifactStore) -> Tuple[Any, Any]:
+    wq = WorkQueue(db, logger=_logger)
+    s3tests = S3TestsMgr(db, wq)
+    bench = BenchmarkMgr(
+        db, wq, AnalyticsPool(artifacts), 1024**3, logger=_logger
+    )
+    await s3tests._load_results()  # pyright: ignore
+    await bench._load_results()  # pyright: ignore
+    return s3tests, bench
+
+
+def _report(name: str, secs: float, mem: Optional[Tuple[int, int]]) -> None:
+    line = f"  {name:>12}: {secs:7.2f} s"
+    if mem is not None:
+        current, peak = mem
+        line += (
+            f", {current / 2**20:7.1f} MiB kept, "
+            f"{peak / 2**20:7.1f} MiB peak"
+        )
+    click.echo(line)
+
+
+async def _bench(engine: DBMEngine, num_runs: int, num_tests: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir).joinpath("server.db")
+        artifacts = ArtifactStore(Path(tmpdir).joinpath("artifacts"))
+        db = DBM(path, engine)
+        click.echo(f"writing {num_runs} runs of each kind...", err=True)
+        await _populate(db, num_runs, num_tests)
+
+        click.echo(
+            f"{num_runs} s3tests runs of {num_tests} tests each, "
+            f"{num_runs} bench runs of 2 targets each, on {engine.value}"
+        )
+
+        def full() -> Awaitable[Any]:
+            return _full_load(db)
+
+        def mgrs() -> Awaitable[Any]:
+            return _mgrs_load(db, artifacts)
+
+        _report("full load", await _timed(full), await _traced(full))
+        # the first start writes the summaries missing from existing runs.
+        _report("first start", await _timed(mgrs), None)
+        _report("start", await _timed(mgrs), await _traced(mgrs))
+
+        await db.close()
+
+
+@click.command()
+@click.option("-n", "--num-runs", type=int, default=1000)
+@click.option("-t", "--num-tests", type=int, default=500, help="Per run.")
+@click.option(
+    "-e",
+    "--engine",
+    type=click.Choice([e.value for e in DBMEngine]),
+    default=DBMEngine.SQLITE.value,
+)
+def main(num_runs: int, num_tests: int, engine: str) -> None:
+    """Time result loading at startup with synthetic runs."""
+    asyncio.run(_bench(DBMEngine(engine), num_runs, num_tests))
+
+
+if __name__ == "__main__":
+    main()